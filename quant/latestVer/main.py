@@ -7,9 +7,11 @@ import os
 import pandas as pd
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from module.config import setup_logging
-from module.data_loader import load_all_data, load_data_vectorized
+from module.config import setup_logging, source_paths, DATA_LEVEL, VALID_LEVELS
+from module.data_loader import load_level_data, load_panel, trim_warmup
+from module.resample import BASE_LEVEL
 from module.backtest import Backtester
+from module.signal_runner import compute_signals
 from module.visualizer import plot_combined_pnl
 from strategy.Swinger_L import Swinger_L
 
@@ -17,20 +19,14 @@ def main():
     """主函数，执行多品种回测"""
     logger = setup_logging()
     
-    level = 'day'  # 默认值
-    valid_levels = {'min5', 'min15', 'min30', 'min60', 'day'}
-    assert level in valid_levels, f"level必须是以下值之一: {valid_levels}"
+    level = DATA_LEVEL
+    assert level in VALID_LEVELS, f"level必须是以下值之一: {VALID_LEVELS}"
     
-    data_paths = {
-        'open': rf'D:\pythonpro\python_test\quant\Data\{level}\open.csv',
-        'close': rf'D:\pythonpro\python_test\quant\Data\{level}\close.csv',
-        'high': rf'D:\pythonpro\python_test\quant\Data\{level}\high.csv',
-        'low': rf'D:\pythonpro\python_test\quant\Data\{level}\low.csv',
-        'vol': rf'D:\pythonpro\python_test\quant\Data\{level}\vol.csv'
-    }
+    # 只读取min5源文件，其他级别由min5按交易时段合成
+    data_paths = source_paths(BASE_LEVEL)
     
     try:
-        data_cache = load_all_data(data_paths, logger, level)
+        data_cache = load_level_data(data_paths, logger, level)
         futures_codes = list(data_cache['open'].columns)
         
         config = {
@@ -41,28 +37,26 @@ def main():
             'initial_balance': 20000000.0
         }
         
-        data_dict = load_data_vectorized(
+        strategy = Swinger_L()
+        
+        # 面板数据共享一条时间轴，回测时各品种盈亏无需再对齐
+        # 按策略声明的回溯长度在起始日期前多取预热K线
+        panel = load_panel(
             data_cache, 
             config['futures_codes'],
             config['start_date'],
             config['end_date'],
-            logger
+            logger,
+            lookback=strategy.get_lookback()
         )
+        data_dict = panel.to_dict(logger)
 
         # 先计算所有品种的信号
-        strategy = Swinger_L()
-        signals_dict = {}
+        signals_dict = compute_signals(strategy, data_dict, logger, start_date=config['start_date'])
         
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        # 回测只覆盖正式区间，剔除预热K线
+        panel = panel.trim(config['start_date'])
+        data_dict = {code: trim_warmup(data, config['start_date']) for code, data in data_dict.items()}
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -70,7 +64,8 @@ def main():
             data_dict=data_dict,
             config=config,
             logger=logger,
-            use_multiprocessing=True
+            use_multiprocessing=True,
+            panel=panel
         )
         t_pnl_df = backtester.run_backtest()
         
@@ -1,6 +1,15 @@
 from .config import *
+from .validity import *
+from .bar_store import *
+from .cache_manager import *
+from .resample import *
 from .data_loader import *
+from .shared_data import *
 from .backtest import *
 from .visualizer import *
 from .indicators import *
 
+from .live_indicators import *
+from .position_engine import *
+from .signal_runner import *
+from .sweep import *
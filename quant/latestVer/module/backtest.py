@@ -2,12 +2,14 @@
 可开关多进程版本
 '''
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import pandas as pd
 import numpy as np
 import logging
 from strategy.base import StrategyBase
 from .config import FUTURES_PARAMS
+from .data_loader import BarPanel
+from .shared_data import SharedArrays, attach_arrays
 from multiprocessing import Pool
 
 
@@ -25,12 +27,40 @@ class Backtester:
                  data_dict: Dict[str, pd.DataFrame], 
                  config: Dict[str, Any], 
                  logger: logging.Logger,
-                 use_multiprocessing: bool = True):
+                 use_multiprocessing: bool = True,
+                 panel: Optional[BarPanel] = None):
         self.signals_dict = signals_dict
         self.data_dict = data_dict
         self.config = config
         self.logger = logger
         self.use_multiprocessing = use_multiprocessing
+        # 提供面板数据时，各品种盈亏直接写入共享时间轴，无需pd.concat外连接对齐
+        self.panel = panel
+
+    @staticmethod
+    def _pnl_from_arrays(call: np.ndarray, open_arr: np.ndarray, close_arr: np.ndarray,
+                         contract_multiplier: float) -> np.ndarray:
+        """
+        根据信号数组计算逐K线盈亏
+
+        持仓由call前向填充得到；上一根K线持仓发生变化时按开盘价结算，否则按收盘价差结算
+        """
+        pnl = np.zeros(len(call))
+        if len(call) < 2:
+            return pnl
+        
+        # 前向填充信号得到持仓，首个信号之前视为空仓
+        valid = ~np.isnan(call)
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(call)), -1))
+        pos_arr = np.where(last_valid >= 0, call[np.maximum(last_valid, 0)], 0.0)
+        position_change = np.diff(pos_arr)
+        
+        holding_pnl = pos_arr[:-1] * np.diff(close_arr) * contract_multiplier
+        exit_pnl = pos_arr[:-1] * (open_arr[1:] - close_arr[:-1]) * contract_multiplier
+        exit_mask = np.concatenate(([True], position_change[:-1] != 0))
+        
+        pnl[1:] = np.where(exit_mask, exit_pnl, holding_pnl)
+        return pnl
 
     @staticmethod
     def _process_single_futures(args) -> pd.Series:
@@ -39,35 +69,53 @@ class Backtester:
         try:
             if isinstance(signals, pd.DataFrame) and len(signals) > 0:
                 contract_multiplier = FUTURES_PARAMS[code]['contract_multiplier']
-                
-                position = signals['call'].ffill().fillna(0)
-                position_change = position.diff()
-                
-                close_arr = data['close'].values
-                open_arr = data['open'].values
-                pos_arr = position.values
-                
-                holding_pnl = pos_arr[:-1] * np.diff(close_arr) * contract_multiplier
-                exit_mask = position_change.shift() != 0
-                exit_pnl = pos_arr[:-1] * (open_arr[1:] - close_arr[:-1]) * contract_multiplier
-                
-                pnl = pd.Series(0.0, index=data.index)
-                mask_1 = ~exit_mask.iloc[1:]
-                mask_2 = exit_mask.iloc[1:]
-                
-                pnl.loc[pnl.index[1:][mask_1]] = holding_pnl[mask_1]
-                pnl.loc[pnl.index[1:][mask_2]] = exit_pnl[mask_2]
-                
-                return pnl
+                pnl = Backtester._pnl_from_arrays(
+                    signals['call'].to_numpy(dtype=np.float64),
+                    data['open'].values,
+                    data['close'].values,
+                    contract_multiplier
+                )
+                return pd.Series(pnl, index=data.index)
             
             return pd.Series(0.0, index=data.index)
             
         except Exception as e:
             return pd.Series(0.0, index=data.index)
 
+    @staticmethod
+    def _process_shared_futures(args) -> bool:
+        """
+        单品种回测处理函数(共享内存版本)
+
+        子进程只接收共享内存描述符和列号，从共享的面板和信号矩阵中取出该品种的有效K线，
+        盈亏直接写回共享的结果矩阵，不经过序列化返回
+        """
+        code, col, specs = args
+        arrays, blocks = attach_arrays(specs)
+        try:
+            rows = np.flatnonzero(arrays['mask'][:, col])
+            arrays['pnl'][rows, col] = Backtester._pnl_from_arrays(
+                arrays['call'][rows, col],
+                arrays['open'][rows, col],
+                arrays['close'][rows, col],
+                FUTURES_PARAMS[code]['contract_multiplier']
+            )
+            return True
+        except Exception as e:
+            return False
+        finally:
+            arrays = None
+            for block in blocks:
+                block.close()
+
     def run_backtest(self) -> pd.DataFrame:
         """执行回测"""
         try:
+            if self.panel is not None and self.use_multiprocessing:
+                t_pnl_df = self._run_shared_memory()
+                self.logger.info("回测完成")
+                return t_pnl_df
+            
             process_args = [(code, self.data_dict[code], self.signals_dict[code]) 
                           for code in self.signals_dict.keys()]
             
@@ -79,8 +127,11 @@ class Backtester:
                 self.logger.info("开始单进程多品种回测")
                 all_pnl = [self._process_single_futures(args) for args in process_args]
             
-            combined_pnl = pd.concat([pnl for pnl in all_pnl if not pnl.empty], axis=1).sum(axis=1)
-            t_pnl_df = pd.DataFrame(combined_pnl, columns=['pnl'])
+            if self.panel is not None:
+                t_pnl_df = self._combine_on_panel(list(self.signals_dict.keys()), all_pnl)
+            else:
+                combined_pnl = pd.concat([pnl for pnl in all_pnl if not pnl.empty], axis=1).sum(axis=1)
+                t_pnl_df = pd.DataFrame(combined_pnl, columns=['pnl'])
             
             self.logger.info("回测完成")
             return t_pnl_df
@@ -88,3 +139,65 @@ class Backtester:
         except Exception as e:
             self.logger.error(f"回测执行错误: {e}")
             raise
+
+    def _panel_rows(self, code: str, index: pd.Index) -> np.ndarray:
+        """品种数据在面板共享时间轴上的行号"""
+        rows = self.panel.valid_rows(code)
+        if len(rows) != len(index) or not self.panel.index[rows].equals(index):
+            # 数据不是由该面板生成(长度或时间戳不一致)时退回按时间戳定位
+            rows = self.panel.index.get_indexer(index)
+        return rows
+
+    def _combine_on_panel(self, codes, all_pnl) -> pd.DataFrame:
+        """将各品种盈亏按面板的有效K线行号写入 (时间 × 品种) 矩阵后按行求和"""
+        panel = self.panel
+        pnl_matrix = np.zeros((len(panel.index), len(codes)))
+        used_rows = np.zeros(len(panel.index), dtype=bool)
+        for j, (code, pnl) in enumerate(zip(codes, all_pnl)):
+            if pnl.empty:
+                continue
+            rows = self._panel_rows(code, pnl.index)
+            pnl_matrix[rows, j] = pnl.values
+            used_rows[rows] = True
+        return pd.DataFrame({'pnl': pnl_matrix[used_rows].sum(axis=1)}, index=panel.index[used_rows])
+
+    def _run_shared_memory(self) -> pd.DataFrame:
+        """
+        共享内存多进程回测
+
+        面板的开盘价、收盘价、有效掩码以及对齐到面板时间轴的信号矩阵只发布一次，
+        子进程按描述符映射，结果写入共享的 (时间 × 品种) 盈亏矩阵
+        """
+        self.logger.info("开始共享内存并行多品种回测")
+        panel = self.panel
+        codes = [code for code in self.signals_dict.keys()
+                 if isinstance(self.signals_dict[code], pd.DataFrame) and len(self.signals_dict[code]) > 0]
+        panel_cols = [panel.symbol_loc(code) for code in codes]
+        
+        # 信号按面板行号写入 (时间 × 品种) 矩阵，未给出信号的位置为NaN
+        call_matrix = np.full((len(panel.index), len(codes)), np.nan)
+        used_rows = np.zeros(len(panel.index), dtype=bool)
+        for j, code in enumerate(codes):
+            signals = self.signals_dict[code]
+            rows = self._panel_rows(code, signals.index)
+            call_matrix[rows, j] = signals['call'].to_numpy(dtype=np.float64)
+            used_rows[rows] = True
+        
+        with SharedArrays() as shared:
+            specs = {
+                'open': shared.publish(panel.field('open')[:, panel_cols]),
+                'close': shared.publish(panel.field('close')[:, panel_cols]),
+                'mask': shared.publish(panel.mask[:, panel_cols]),
+                'call': shared.publish(call_matrix),
+            }
+            specs['pnl'], pnl_matrix = shared.allocate(call_matrix.shape, np.float64)
+            
+            with Pool() as pool:
+                results = pool.map(self._process_shared_futures,
+                                   [(code, j, specs) for j, code in enumerate(codes)])
+            failed = [code for code, ok in zip(codes, results) if not ok]
+            if failed:
+                self.logger.warning(f"以下品种回测出错，盈亏按0处理: {failed}")
+            
+            t_pnl_df = pd.DataFrame({'pnl': pnl_matrix[used_rows].sum(axis=1)}, index=panel.index[used_rows])
+        return t_pnl_df
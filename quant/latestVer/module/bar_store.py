@@ -0,0 +1,351 @@
+import os
+import json
+import uuid
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from .validity import ValidityIndex
+
+
+class BarStore:
+    """
+    列式行情存储
+
+    每个字段(open/close/high/low/vol)保存为一个按 (时间 × 品种) 排列的float32
+    内存映射文件，所有字段共享同一份时间索引和品种表。热启动时只需读取元数据和
+    时间索引，字段数据按需由操作系统分页载入，按日期或品种切片均为零拷贝视图。
+    写入时同时以open字段建立各品种的有效性索引(见ValidityIndex)。
+    """
+    META_FILE = 'meta.json'
+    INDEX_FILE = 'index.i8'
+    VALIDITY_FILE = 'validity.npz'
+    VALIDITY_FIELD = 'open'
+    VERSION = 1
+    DTYPE = np.float32
+
+    def __init__(self, root: str, meta: Dict):
+        self.root = root
+        self.meta = meta
+        self._index = None
+        self._symbol_pos = {code: i for i, code in enumerate(meta['symbols'])}
+        self._arrays = {}
+        self._validity = None
+
+    # ------------------------------------------------------------------
+    # 创建与打开
+    # ------------------------------------------------------------------
+    @classmethod
+    def exists(cls, root: str) -> bool:
+        """判断存储目录是否存在完整的数据(元数据最后写入，存在即代表写入完成)"""
+        meta_path = os.path.join(root, cls.META_FILE)
+        if not os.path.exists(meta_path):
+            return False
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('version') == cls.VERSION
+        except (OSError, ValueError):
+            return False
+
+    @classmethod
+    def open(cls, root: str) -> 'BarStore':
+        """打开已有的存储目录"""
+        with open(os.path.join(root, cls.META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(root, meta)
+
+    @classmethod
+    def from_frames(cls, root: str, frames: Dict[str, pd.DataFrame],
+                    sources: Optional[Dict[str, Dict]] = None) -> 'BarStore':
+        """
+        将宽表数据写入存储
+
+        参数:
+            root (str): 存储目录
+            frames (Dict[str, pd.DataFrame]): 字段名 -> (时间 × 品种) 宽表
+            sources (Dict[str, Dict]): 字段名 -> 源文件的读取进度记录，用于增量刷新
+
+        返回:
+            BarStore: 写入完成后的存储对象
+        """
+        fields = list(frames.keys())
+        base = frames[fields[0]]
+        index = base.index
+
+        cls.prepare(root)
+
+        for field, df in frames.items():
+            # 各字段按基准字段的时间轴和品种表对齐
+            if not df.index.equals(index) or list(df.columns) != list(base.columns):
+                df = df.reindex(index=index, columns=base.columns)
+            values = np.ascontiguousarray(df.to_numpy(dtype=cls.DTYPE))
+            values.tofile(cls.field_path(root, field))
+
+        return cls.finalize(root, fields, index, list(base.columns), sources)
+
+    @classmethod
+    def finalize(cls, root: str, fields: List[str], index: pd.DatetimeIndex, symbols: List[str],
+                 sources: Optional[Dict[str, Dict]] = None) -> 'BarStore':
+        """
+        字段文件已按 (时间 × 品种) 写入 field_path 后，写入时间索引和元数据完成存储
+
+        供子进程直接把解析结果写入字段文件的场景使用，字段数据无需经主进程中转
+        """
+        _to_int64_index(index).tofile(os.path.join(root, cls.INDEX_FILE))
+
+        validity_field = cls.VALIDITY_FIELD if cls.VALIDITY_FIELD in fields else fields[0]
+        if len(index):
+            values = np.memmap(cls.field_path(root, validity_field), dtype=cls.DTYPE, mode='r',
+                               shape=(len(index), len(symbols)))
+            validity = ValidityIndex.from_values(values)
+            del values
+        else:
+            validity = ValidityIndex.empty(len(symbols))
+        validity.save(os.path.join(root, cls.VALIDITY_FILE))
+
+        meta = {
+            'version': cls.VERSION,
+            'dtype': np.dtype(cls.DTYPE).name,
+            'fields': list(fields),
+            'symbols': [str(col) for col in symbols],
+            'n_rows': int(len(index)),
+            'index_name': index.name,
+            'sources': sources or {},
+            # 每次全量写入生成新的代号，追加K线时保持不变；合成级别据此判断基础数据是否被重建
+            'generation': uuid.uuid4().hex,
+        }
+        cls._write_meta(root, meta)
+        return cls(root, meta)
+
+    def append(self, frames: Dict[str, pd.DataFrame], sources: Optional[Dict[str, Dict]] = None):
+        """
+        在存储末尾追加新的K线
+
+        数据按 (时间 × 品种) 行优先排列，追加新行只需在各字段文件末尾写入字节，
+        已有数据无需改动。
+
+        参数:
+            frames (Dict[str, pd.DataFrame]): 字段名 -> 新增K线宽表，时间须晚于已有数据
+            sources (Dict[str, Dict]): 更新后的源文件读取进度记录
+        """
+        index = frames[self.fields[0]].index
+        if len(index) and self.n_rows and _to_int64_index(index)[0] <= _to_int64_index(self.index)[-1]:
+            raise ValueError("追加数据的时间必须晚于存储中已有的最后一根K线")
+
+        # 追加前取得有效性索引(旧版本存储在此补建)，并释放字段文件的内存映射
+        validity = self.validity()
+        self._arrays = {}
+
+        # 先删除元数据，中断时存储会被视为无效而整体重建
+        self._remove_meta(self.root)
+        row_bytes = len(self.symbols) * np.dtype(self.DTYPE).itemsize
+        for field in self.fields:
+            df = frames[field]
+            if not df.index.equals(index) or list(df.columns) != self.symbols:
+                df = df.reindex(index=index, columns=self.symbols)
+            values = np.ascontiguousarray(df.to_numpy(dtype=self.DTYPE))
+            _append_bytes(self.field_path(self.root, field), values, self.n_rows * row_bytes)
+            if field == self._validity_field:
+                validity.extend(~np.isnan(values))
+        validity.save(os.path.join(self.root, self.VALIDITY_FILE))
+        _append_bytes(os.path.join(self.root, self.INDEX_FILE), _to_int64_index(index),
+                      self.n_rows * np.dtype(np.int64).itemsize)
+
+        self.meta['n_rows'] = self.n_rows + len(index)
+        if sources is not None:
+            self.meta['sources'] = sources
+        self._write_meta(self.root, self.meta)
+
+        # 丢弃旧的映射，下次访问时按新的行数重新映射
+        self._index = None
+        self._arrays = {}
+
+    @classmethod
+    def field_path(cls, root: str, field: str) -> str:
+        """字段数据文件路径"""
+        return os.path.join(root, f"{field}.f32")
+
+    @classmethod
+    def prepare(cls, root: str):
+        """创建存储目录并使已有存储失效，准备重新写入字段文件"""
+        os.makedirs(root, exist_ok=True)
+        cls._remove_meta(root)
+
+    @classmethod
+    def _remove_meta(cls, root: str):
+        meta_path = os.path.join(root, cls.META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+    @classmethod
+    def _write_meta(cls, root: str, meta: Dict):
+        # 先写临时文件再替换，避免中断时留下半截元数据
+        tmp_path = os.path.join(root, cls.META_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(root, cls.META_FILE))
+
+    # ------------------------------------------------------------------
+    # 元数据
+    # ------------------------------------------------------------------
+    @property
+    def fields(self) -> List[str]:
+        return self.meta['fields']
+
+    @property
+    def symbols(self) -> List[str]:
+        return self.meta['symbols']
+
+    @property
+    def n_rows(self) -> int:
+        return self.meta['n_rows']
+
+    @property
+    def generation(self) -> Optional[str]:
+        """全量写入的代号，追加K线不改变；旧版本存储没有代号时为None"""
+        return self.meta.get('generation')
+
+    @property
+    def sources(self) -> Dict[str, Dict]:
+        """源文件读取进度记录"""
+        return self.meta.get('sources', {})
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        """共享时间索引"""
+        if self._index is None:
+            raw = np.fromfile(os.path.join(self.root, self.INDEX_FILE), dtype=np.int64, count=self.n_rows)
+            self._index = pd.DatetimeIndex(raw.view('datetime64[ns]'), name=self.meta.get('index_name'))
+        return self._index
+
+    def symbol_loc(self, code: str) -> int:
+        """品种在品种表中的列号，不存在时返回-1"""
+        return self._symbol_pos.get(code, -1)
+
+    @property
+    def _validity_field(self) -> str:
+        return self.VALIDITY_FIELD if self.VALIDITY_FIELD in self.fields else self.fields[0]
+
+    def validity(self) -> ValidityIndex:
+        """
+        各品种的有效性索引
+
+        写入存储时已建立；旧版本存储缺少索引文件或行数不一致时由字段数据重新建立并保存
+        """
+        if self._validity is None:
+            path = os.path.join(self.root, self.VALIDITY_FILE)
+            validity = ValidityIndex.load(path) if os.path.exists(path) else None
+            if validity is None or validity.n_rows != self.n_rows or validity.n_symbols != len(self.symbols):
+                validity = ValidityIndex.from_values(self.field(self._validity_field))
+                validity.save(path)
+            self._validity = validity
+        return self._validity
+
+    # ------------------------------------------------------------------
+    # 数据访问
+    # ------------------------------------------------------------------
+    def field(self, name: str) -> np.ndarray:
+        """返回字段的 (时间 × 品种) 只读内存映射数组"""
+        arr = self._arrays.get(name)
+        if arr is None:
+            if self.n_rows == 0:
+                arr = np.empty((0, len(self.symbols)), dtype=self.DTYPE)
+            else:
+                arr = np.memmap(self.field_path(self.root, name), dtype=self.DTYPE, mode='r',
+                                shape=(self.n_rows, len(self.symbols)))
+            self._arrays[name] = arr
+        return arr
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """返回字段的宽表，底层直接引用内存映射数组，不复制数据"""
+        return pd.DataFrame(self.field(name), index=self.index, columns=self.symbols, copy=False)
+
+    def frames(self) -> 'StoreFrames':
+        """返回全部字段的宽表字典，与旧版缓存格式兼容"""
+        return StoreFrames({name: self.frame(name) for name in self.fields}, self)
+
+    def row_slice(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> slice:
+        """
+        在有序时间索引上二分查找日期区间对应的行范围
+
+        参数:
+            start_date (str): 起始日期(含)，None表示从头开始
+            end_date (str): 结束日期(含)，None表示到末尾
+
+        返回:
+            slice: 行切片
+        """
+        return date_slice(self.index, start_date, end_date)
+
+    def view(self, name: str, code: Optional[str] = None,
+             start_date: Optional[str] = None, end_date: Optional[str] = None) -> np.ndarray:
+        """
+        按品种和日期区间取字段数据的零拷贝视图
+
+        参数:
+            name (str): 字段名
+            code (str): 品种代码，None表示全部品种
+            start_date (str): 起始日期(含)
+            end_date (str): 结束日期(含)
+
+        返回:
+            np.ndarray: code为None时为 (时间 × 品种) 视图，否则为一维视图
+        """
+        rows = self.row_slice(start_date, end_date)
+        arr = self.field(name)[rows]
+        if code is None:
+            return arr
+        col = self.symbol_loc(code)
+        if col < 0:
+            raise KeyError(f"品种 {code} 不在存储中")
+        return arr[:, col]
+
+
+class StoreFrames(dict):
+    """
+    字段名 -> 宽表 的字典，可通过validity属性取得来源存储的有效性索引
+
+    行为与普通字典一致，索引在首次访问时才读取
+    """
+    def __init__(self, frames: Dict[str, pd.DataFrame], store: BarStore):
+        super().__init__(frames)
+        self._store = store
+
+    @property
+    def validity(self) -> ValidityIndex:
+        return self._store.validity()
+
+    @property
+    def generation(self) -> Optional[str]:
+        return self._store.generation
+
+
+def _append_bytes(path: str, values: np.ndarray, expected_size: int):
+    """截断到预期长度后在文件末尾追加数组字节，清除上次中断遗留的残余数据"""
+    with open(path, 'r+b') as f:
+        if os.path.getsize(path) != expected_size:
+            f.truncate(expected_size)
+        f.seek(expected_size)
+        values.tofile(f)
+
+
+def _to_int64_index(index: pd.Index) -> np.ndarray:
+    """将时间索引统一为纳秒精度的int64数组"""
+    return np.asarray(pd.DatetimeIndex(index), dtype='datetime64[ns]').view(np.int64)
+
+
+def date_slice(index: pd.DatetimeIndex, start_date: Optional[str] = None,
+               end_date: Optional[str] = None) -> slice:
+    """
+    在有序时间索引上二分查找 [start_date, end_date] 对应的行切片
+
+    参数:
+        index (pd.DatetimeIndex): 升序时间索引
+        start_date (str): 起始日期(含)
+        end_date (str): 结束日期(含)
+
+    返回:
+        slice: 行切片
+    """
+    start = 0 if start_date is None else int(index.searchsorted(pd.Timestamp(start_date), side='left'))
+    stop = len(index) if end_date is None else int(index.searchsorted(pd.Timestamp(end_date), side='right'))
+    return slice(start, max(start, stop))
@@ -0,0 +1,227 @@
+'''
+行情缓存目录管理
+
+缓存目录下每个条目是一个以内容键命名的子目录(键由源文件内容、数据类型和级别计算)，
+manifest.json 记录各条目的大小、最近访问时间和命中次数。写入或访问条目后按
+最近最少使用(LRU)顺序淘汰旧条目，使缓存目录总大小不超过配置的磁盘预算。
+source_digests.json 按 (路径, 大小, 修改时间) 记录源文件全部内容的sha1，文件未变化时
+计算缓存键不需要重新读取文件。
+'''
+
+import os
+import json
+import hashlib
+import time
+import shutil
+import logging
+from typing import Dict, Iterable, List, Optional
+
+
+class CacheManager:
+    """
+    内容寻址的缓存目录
+
+    参数:
+        cache_dir (str): 缓存根目录
+        logger (logging.Logger): 日志记录器
+        max_bytes (int): 磁盘预算(字节)，None表示不限制
+    """
+    MANIFEST_FILE = 'manifest.json'
+    DIGEST_FILE = 'source_digests.json'
+    VERSION = 1
+    HASH_BLOCK_BYTES = 1 << 24
+
+    def __init__(self, cache_dir: str, logger: logging.Logger, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_root(self, key: str) -> str:
+        """条目目录"""
+        return os.path.join(self.cache_dir, key)
+
+    # ------------------------------------------------------------------
+    # 清单读写
+    # ------------------------------------------------------------------
+    def _manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, self.MANIFEST_FILE)
+
+    def load_manifest(self) -> Dict:
+        """读取清单，不存在或损坏时返回空清单"""
+        try:
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == self.VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': self.VERSION, 'hits': 0, 'misses': 0, 'entries': {}}
+
+    def _save_manifest(self, manifest: Dict):
+        self._save_json(self._manifest_path(), manifest)
+
+    # ------------------------------------------------------------------
+    # 源文件内容摘要
+    # ------------------------------------------------------------------
+    def file_digest(self, path: str) -> str:
+        """
+        源文件全部内容的sha1
+
+        按 (绝对路径, 大小, 修改时间) 记忆，三者不变时直接返回上次的结果，否则重新读取整个文件
+
+        参数:
+            path (str): 文件路径
+
+        返回:
+            str: sha1十六进制摘要
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        digests = self._load_digests()
+        known = digests.get(path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha1']
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.HASH_BLOCK_BYTES), b''):
+                sha1.update(block)
+        digests[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1.hexdigest()}
+        self._save_json(self._digest_path(), digests)
+        return digests[path]['sha1']
+
+    def _digest_path(self) -> str:
+        return os.path.join(self.cache_dir, self.DIGEST_FILE)
+
+    def _load_digests(self) -> Dict:
+        try:
+            with open(self._digest_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_json(self, path: str, data: Dict):
+        # 先写临时文件再替换；多个进程共用缓存目录时各自使用独立的临时文件
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------------------------------
+    # 条目查询与删除
+    # ------------------------------------------------------------------
+    def find_entries(self, **info) -> List[str]:
+        """
+        清单附加描述与info各项都相同的条目，按最近访问时间从新到旧排列
+
+        用于找到同一组源文件的旧版本条目(源文件追加或改写后内容键已变化)
+        """
+        entries = self.load_manifest()['entries']
+        matched = [key for key, entry in entries.items()
+                   if all(entry.get(name) == value for name, value in info.items())
+                   and os.path.isdir(self.entry_root(key))]
+        return sorted(matched, key=lambda k: entries[k].get('last_access', 0), reverse=True)
+
+    def remove(self, key: str) -> bool:
+        """删除条目，其他进程仍在使用而无法删除时返回False"""
+        try:
+            shutil.rmtree(self.entry_root(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"删除缓存条目 {key} 失败: {e}")
+            return False
+        manifest = self.load_manifest()
+        if manifest['entries'].pop(key, None) is not None:
+            self._save_manifest(manifest)
+        return True
+
+    # ------------------------------------------------------------------
+    # 访问记录与淘汰
+    # ------------------------------------------------------------------
+    def record(self, key: str, hit: bool, info: Optional[Dict] = None,
+               keep: Iterable[str] = ()) -> List[str]:
+        """
+        记录一次条目访问并按预算淘汰旧条目
+
+        参数:
+            key (str): 条目键
+            hit (bool): 是否命中(未命中表示条目刚被重建)
+            info (Dict): 写入清单的附加描述(级别、数据类型、源文件等)
+            keep (Iterable[str]): 本次不能淘汰的其他条目(如正在使用的基础级别)
+
+        返回:
+            List[str]: 被淘汰的条目键
+        """
+        manifest = self.load_manifest()
+        entry = manifest['entries'].setdefault(key, {'hits': 0, 'created': time.time()})
+        if info:
+            entry.update(info)
+        entry['last_access'] = time.time()
+        entry['size'] = _dir_size(self.entry_root(key))
+        if hit:
+            entry['hits'] += 1
+            manifest['hits'] += 1
+        else:
+            manifest['misses'] += 1
+        evicted = self._evict(manifest, {key, *keep})
+        self._save_manifest(manifest)
+        self.logger.info(f"缓存{'命中' if hit else '未命中'}: {key} "
+                         f"(累计命中 {manifest['hits']} 次，未命中 {manifest['misses']} 次)")
+        return evicted
+
+    def _evict(self, manifest: Dict, keep: set) -> List[str]:
+        """按最近访问时间从旧到新删除条目，直到总大小不超过预算"""
+        entries = manifest['entries']
+        # 清理已被手动删除的条目
+        for key in [key for key in entries if not os.path.isdir(self.entry_root(key))]:
+            del entries[key]
+        if self.max_bytes is None:
+            return []
+
+        total = sum(entry.get('size', 0) for entry in entries.values())
+        evicted = []
+        for key in sorted(entries, key=lambda k: entries[k].get('last_access', 0)):
+            if total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            try:
+                shutil.rmtree(self.entry_root(key))
+            except OSError as e:
+                # 其他进程仍在使用(Windows下内存映射文件无法删除)时保留
+                self.logger.warning(f"淘汰缓存条目 {key} 失败: {e}")
+                continue
+            total -= entries.pop(key).get('size', 0)
+            evicted.append(key)
+            self.logger.info(f"淘汰缓存条目 {key}")
+        if total > self.max_bytes:
+            self.logger.warning(f"缓存目录大小 {total / 2**20:.1f}MB 仍超过预算 {self.max_bytes / 2**20:.1f}MB")
+        return evicted
+
+    def stats(self) -> Dict:
+        """
+        缓存统计
+
+        返回:
+            Dict: hits/misses 为清单记录的累计命中和未命中次数，entries/bytes 为当前条目数和总大小
+        """
+        manifest = self.load_manifest()
+        return {
+            'hits': manifest['hits'],
+            'misses': manifest['misses'],
+            'entries': len(manifest['entries']),
+            'bytes': sum(entry.get('size', 0) for entry in manifest['entries'].values()),
+        }
+
+
+def _dir_size(root: str) -> int:
+    """目录下所有文件的总字节数"""
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
@@ -27,6 +27,27 @@ def setup_logging(log_file: str = os.path.join("logs", "trading_strategy.log"))
     logger.info("日志系统初始化完成")
     return logger
 
+# 行情数据根目录，其下按级别分子目录(min5、min15、min30、min60、day)，各含每个字段一个CSV文件
+DATA_ROOT = r'D:\pythonpro\python_test\quant\Data'
+
+# 回测使用的K线级别；min5以外的级别由min5源文件按交易时段合成
+DATA_LEVEL = 'day'
+VALID_LEVELS = {'min5', 'min15', 'min30', 'min60', 'day'}
+DATA_FIELDS = ['open', 'close', 'high', 'low', 'vol']
+
+def source_paths(level: str, data_root: str = DATA_ROOT) -> Dict[str, str]:
+    """
+    某一级别各字段源文件的路径
+
+    参数:
+        level (str): 级别目录名
+        data_root (str): 行情数据根目录
+
+    返回:
+        Dict[str, str]: 字段名 -> CSV文件路径
+    """
+    return {field: os.path.join(data_root, level, f"{field}.csv") for field in DATA_FIELDS}
+
 '''
 #从akshare获取期货合约参数
 def get_futures_params():
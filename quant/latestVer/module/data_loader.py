@@ -1,113 +1,644 @@
 import pandas as pd
 import os
+import io
+import shutil
+import hashlib
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import numpy as np
-import pickle
-from multiprocessing import Pool
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .bar_store import BarStore, date_slice
+from .validity import ValidityIndex
+from .cache_manager import CacheManager
+from .resample import BASE_LEVEL, resample_bars
 
-def load_single_file(args):
-    """单个文件加载函数"""
-    data_type, path, dtype = args
-    # 使用内存映射读取大文件
+# 全量解析时每个分块的目标字节数，分块在换行处切开后由线程池并行解析
+INGEST_CHUNK_BYTES = 16 << 20
+# 解析一个分块时的峰值内存约为分块字节数的倍数(原始文本、分词缓冲区、日期解析和float32结果)
+PARSE_MEMORY_FACTOR = 8
+# 限制内存时分块的最小字节数，过小的分块会让解析开销占主导
+MIN_CHUNK_BYTES = 1 << 20
+# 字段文件重新对齐时每次处理的行数
+REALIGN_BLOCK_ROWS = 1 << 16
+
+def _read_header(path: str) -> Tuple[List[str], int]:
+    """读取表头，返回列名列表(首列为时间索引)和表头占用的字节数"""
+    with open(path, 'rb') as f:
+        line = f.readline()
+    return line.decode('utf-8').rstrip('\r\n').split(','), len(line)
+
+def _split_ranges(path: str, start: int, stop: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """把 [start, stop) 字节区间按chunk_bytes切分，每个分块都在换行符处结束"""
+    ranges = []
+    with open(path, 'rb') as f:
+        pos = start
+        while pos < stop:
+            if pos + chunk_bytes >= stop:
+                ranges.append((pos, stop))
+                break
+            f.seek(pos + chunk_bytes)
+            f.readline()
+            end = min(f.tell(), stop)
+            ranges.append((pos, end))
+            pos = end
+    return ranges
+
+def _parse_csv_bytes(buf: bytes, columns: List[str]) -> pd.DataFrame:
+    """解析不含表头的CSV字节块，数值列直接转为float32"""
     df = pd.read_csv(
-        path,
-        dtype=dtype,
+        io.BytesIO(buf),
+        header=None,
+        names=['__index__'] + columns[1:],
+        dtype={col: np.float32 for col in columns[1:]},
         index_col=0,
         parse_dates=True,
-        memory_map=True,  # 使用内存映射
         cache_dates=True
     )
-    return data_type, df
+    df.index.name = columns[0] or None
+    return df
 
-def load_all_data(data_paths: Dict[str, str], logger: logging.Logger, level: str) -> Dict[str, pd.DataFrame]:
-    """一次性加载所有数据文件，支持缓存和内存映射"""
+def _parse_range(path: str, start: int, stop: int, columns: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """解析源文件的一个字节分块，返回纳秒时间戳数组和 (行 × 品种) float32数组"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        buf = f.read(stop - start)
+    if not buf.strip():
+        return np.empty(0, dtype=np.int64), np.empty((0, len(columns) - 1), dtype=np.float32)
+    df = _parse_csv_bytes(buf, columns)
+    stamps = np.asarray(df.index, dtype='datetime64[ns]').view(np.int64)
+    return stamps, np.ascontiguousarray(df.to_numpy(dtype=np.float32))
+
+def _ingest_plan(n_workers: int, max_memory_mb: Optional[float]) -> Tuple[int, Optional[int]]:
+    """
+    根据内存上限确定分块字节数和同时在途(解析中或等待写入)的分块数
+
+    返回:
+        Tuple[int, Optional[int]]: (分块字节数, 在途分块数上限)，不限制内存时上限为None
+    """
+    if max_memory_mb is None:
+        return INGEST_CHUNK_BYTES, None
+    budget = int(max_memory_mb * (1 << 20))
+    window = max(1, n_workers)
+    chunk_bytes = budget // (window * PARSE_MEMORY_FACTOR)
+    if chunk_bytes < MIN_CHUNK_BYTES:
+        # 内存上限较小时减少并行度，保证单个分块不小于下限
+        window = max(1, budget // (MIN_CHUNK_BYTES * PARSE_MEMORY_FACTOR))
+        chunk_bytes = max(MIN_CHUNK_BYTES, budget // (window * PARSE_MEMORY_FACTOR))
+    return min(chunk_bytes, INGEST_CHUNK_BYTES), window
+
+def _ingest_files(data_paths: Dict[str, str], offsets: Dict[str, int], store_root: str,
+                  max_workers: Optional[int] = None,
+                  max_memory_mb: Optional[float] = None) -> Dict[str, Tuple[pd.DatetimeIndex, List[str]]]:
+    """
+    多线程分块解析全部源文件，直接写入存储的字段文件
+
+    每个文件在读取表头的同时确定列名，数据部分在换行处切成若干分块提交给线程池解析；
+    主线程按分块顺序把解析结果写入字段文件，写入与其余分块的解析重叠进行。
+    指定max_memory_mb时按内存上限缩小分块并限制在途分块数，峰值内存只取决于分块大小
+
+    返回:
+        Dict[str, Tuple[pd.DatetimeIndex, List[str]]]: 字段名 -> (时间索引, 品种列表)
+    """
+    n_workers = max_workers or os.cpu_count() or 1
+    chunk_bytes, window = _ingest_plan(n_workers, max_memory_mb)
+    
+    tasks, headers = [], {}
+    for data_type, path in data_paths.items():
+        columns, header_end = _read_header(path)
+        headers[data_type] = columns
+        for start, stop in _split_ranges(path, header_end, offsets[data_type], chunk_bytes):
+            tasks.append((data_type, path, start, stop, columns))
+    window = window or max(1, len(tasks))
+    
+    index_parts = {data_type: [] for data_type in data_paths}
+    outputs = {data_type: open(BarStore.field_path(store_root, data_type), 'wb') for data_type in data_paths}
     try:
-        logger.info("开始加载所有数据文件")
-        cache_dir = "data_cache"
-        os.makedirs(cache_dir, exist_ok=True)
-        data_cache = {}
-        
-        # 检查缓存 - 修改缓存文件名以包含级别
-        cache_valid = True
-        for data_type, path in data_paths.items():
-            cache_path = os.path.join(cache_dir, f"{data_type}_{level}_cache.pkl")
-            if not os.path.exists(cache_path) or os.path.getmtime(path) > os.path.getmtime(cache_path):
-                cache_valid = False
+        with ThreadPoolExecutor(max_workers=min(n_workers, window)) as executor:
+            pending = deque()
+            next_task = 0
+            while next_task < len(tasks) or pending:
+                # 补充在途分块，最多window个
+                while next_task < len(tasks) and len(pending) < window:
+                    data_type, path, start, stop, columns = tasks[next_task]
+                    pending.append((data_type, executor.submit(_parse_range, path, start, stop, columns)))
+                    next_task += 1
+                # 按提交顺序写入，保证各字段文件内的行序与源文件一致
+                data_type, future = pending.popleft()
+                stamps, values = future.result()
+                values.tofile(outputs[data_type])
+                index_parts[data_type].append(stamps)
+    finally:
+        for f in outputs.values():
+            f.close()
+    
+    layouts = {}
+    for data_type, columns in headers.items():
+        parts = index_parts[data_type]
+        stamps = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        index = pd.DatetimeIndex(stamps.view('datetime64[ns]'), name=columns[0] or None)
+        layouts[data_type] = (index, columns[1:])
+    return layouts
+
+def _realign_field(path: str, index: pd.DatetimeIndex, columns: List[str],
+                   base_index: pd.DatetimeIndex, base_columns: List[str]):
+    """
+    将字段文件按基准时间轴和品种表重新排列，缺失位置填NaN
+
+    按行分块在内存映射上进行，不把整个字段载入内存
+    """
+    src = np.memmap(path, dtype=np.float32, mode='r', shape=(len(index), len(columns)))
+    src_rows = index.get_indexer(base_index)
+    src_cols = pd.Index(columns).get_indexer(base_columns)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for start in range(0, len(base_index), REALIGN_BLOCK_ROWS):
+            rows = src_rows[start:start + REALIGN_BLOCK_ROWS]
+            block = np.full((len(rows), len(base_columns)), np.nan, dtype=np.float32)
+            row_ok = rows >= 0
+            col_ok = src_cols >= 0
+            block[np.ix_(row_ok, col_ok)] = src[rows[row_ok]][:, src_cols[col_ok]]
+            block.tofile(f)
+    del src
+    os.replace(tmp_path, path)
+
+# 增量刷新时校验的文件开头字节数和已读取区域末尾字节数
+PREFIX_CHECK_BYTES = 1 << 20
+BOUNDARY_CHECK_BYTES = 1 << 16
+
+def _source_key(data_paths: Dict[str, str], level: str, cache: CacheManager) -> str:
+    """
+    由源文件全部内容、数据类型和级别计算缓存键
+
+    内容的sha1由缓存目录按 (路径, 大小, 修改时间) 记忆，文件未变化时不重新读取。
+    源文件任何改动(包括末尾追加)都会得到新的键；追加时由load_all_data找到同一组源文件的
+    旧条目增量刷新后改用新键。路径不同但内容相同的源文件共用同一个缓存条目
+    """
+    digest = hashlib.sha1(f"{level}|{np.dtype(BarStore.DTYPE).name}".encode())
+    for data_type in sorted(data_paths):
+        digest.update(f"{data_type}|{cache.file_digest(data_paths[data_type])}".encode())
+    return f"{level}-{digest.hexdigest()[:16]}"
+
+def _derived_key(base_key: str, level: str) -> str:
+    """由基础级别缓存键计算合成级别的缓存键"""
+    digest = hashlib.sha1(f"{base_key}|{level}|{np.dtype(BarStore.DTYPE).name}".encode())
+    return f"{level}_from_{BASE_LEVEL}-{digest.hexdigest()[:16]}"
+
+def _budget_bytes(cache_budget_mb: Optional[float]) -> Optional[int]:
+    return None if cache_budget_mb is None else int(cache_budget_mb * (1 << 20))
+
+def _sha1_range(f, start: int, stop: int) -> str:
+    """计算文件 [start, stop) 字节区间的sha1"""
+    f.seek(start)
+    return hashlib.sha1(f.read(max(0, stop - start))).hexdigest()
+
+def _last_timestamp(index: pd.DatetimeIndex) -> Optional[int]:
+    """时间索引最后一个时间戳(纳秒整数)，空索引返回None"""
+    if len(index) == 0:
+        return None
+    return int(np.asarray(index[-1:], dtype='datetime64[ns]').view(np.int64)[0])
+
+def _content_sha1(path: str, offset: int, cache: CacheManager) -> str:
+    """源文件前offset字节的sha1，offset为文件大小时使用缓存目录记忆的全文摘要"""
+    if os.path.getsize(path) == offset:
+        return cache.file_digest(path)
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        remaining = offset
+        while remaining > 0:
+            block = f.read(min(remaining, CacheManager.HASH_BLOCK_BYTES))
+            if not block:
                 break
+            sha1.update(block)
+            remaining -= len(block)
+    return sha1.hexdigest()
+
+def _source_record(path: str, offset: int, last_ts: Optional[int], cache: CacheManager) -> Dict:
+    """
+    记录源文件的读取进度
+
+    除读取到的字节偏移和最后时间戳外，还记录表头、文件开头和已读取区域末尾的校验和，
+    以及已读取区域全部内容的sha1，下次刷新时据此判断已读取部分是否被改写
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        record = {
+            'path': os.path.abspath(path),
+            'offset': int(offset),
+            'last_ts': last_ts,
+            'header_sha1': hashlib.sha1(header).hexdigest(),
+            'prefix_sha1': _sha1_range(f, 0, min(offset, PREFIX_CHECK_BYTES)),
+            'boundary_sha1': _sha1_range(f, max(0, offset - BOUNDARY_CHECK_BYTES), offset),
+        }
+    record['content_sha1'] = _content_sha1(path, offset, cache)
+    return record
+
+def _source_unchanged(path: str, record: Dict, cache: CacheManager) -> bool:
+    """
+    判断源文件已读取的部分是否保持不变(只允许在末尾追加)
+
+    先比较表头、开头和读取边界的校验和，快速排除大多数改写；通过后再比较已读取区域
+    全部内容的sha1
+    """
+    offset = record['offset']
+    if os.path.getsize(path) < offset or 'content_sha1' not in record:
+        return False
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if (hashlib.sha1(header).hexdigest() != record['header_sha1']
+                or _sha1_range(f, 0, min(offset, PREFIX_CHECK_BYTES)) != record['prefix_sha1']
+                or _sha1_range(f, max(0, offset - BOUNDARY_CHECK_BYTES), offset) != record['boundary_sha1']):
+            return False
+    return _content_sha1(path, offset, cache) == record['content_sha1']
+
+def _read_tail(path: str, offset: int) -> Tuple[Optional[pd.DataFrame], int]:
+    """
+    只解析源文件中offset之后新追加的完整行
+
+    返回:
+        Tuple[Optional[pd.DataFrame], int]: 新增数据(无新增时为None)及新的读取偏移
+    """
+    columns, _ = _read_header(path)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        tail = f.read()
+    # 只处理到最后一个换行符，写入中的半行留到下次
+    end = tail.rfind(b'\n') + 1
+    tail = tail[:end]
+    if not tail.strip():
+        return None, offset
+    return _parse_csv_bytes(tail, columns), offset + end
+
+def _refresh_store(store: BarStore, data_paths: Dict[str, str], logger: logging.Logger,
+                   cache: CacheManager) -> bool:
+    """
+    按源文件的追加内容增量刷新存储
+
+    返回:
+        bool: 存储已是最新(无变化或已追加)时为True，需要全量重建时为False
+    """
+    sources = store.sources
+    if set(sources.keys()) != set(data_paths.keys()):
+        return False
+    for data_type, path in data_paths.items():
+        if not _source_unchanged(path, sources[data_type], cache):
+            logger.info(f"{data_type} 源文件已读取的内容发生变化，需要全量重建缓存")
+            return False
+    
+    last_ts = store.index[-1] if store.n_rows else None
+    tails, new_sources = {}, {}
+    for data_type, path in data_paths.items():
+        tail, offset = _read_tail(path, sources[data_type]['offset'])
+        if tail is not None and last_ts is not None:
+            # 读取进度之后仍可能包含已入库的K线(全量解析期间文件被追加)，直接丢弃
+            tail = tail[tail.index > last_ts]
+        tails[data_type] = tail
+        new_sources[data_type] = offset
+    
+    lengths = {0 if tail is None else len(tail) for tail in tails.values()}
+    if lengths == {0}:
+        return True
+    
+    base_index = tails[store.fields[0]].index if tails[store.fields[0]] is not None else None
+    for tail in tails.values():
+        if tail is None or base_index is None or not tail.index.equals(base_index):
+            logger.info("各字段新增数据的时间轴不一致，需要全量重建缓存")
+            return False
+    
+    new_last_ts = _last_timestamp(base_index)
+    store.append(tails, {
+        data_type: _source_record(path, new_sources[data_type], new_last_ts, cache)
+        for data_type, path in data_paths.items()
+    })
+    logger.info(f"增量追加 {len(base_index)} 根K线到缓存")
+    return True
+
+def load_all_data(data_paths: Dict[str, str], logger: logging.Logger, level: str,
+                  cache_dir: str = "data_cache",
+                  max_memory_mb: Optional[float] = None,
+                  cache_budget_mb: Optional[float] = None) -> Dict[str, pd.DataFrame]:
+    """
+    一次性加载所有数据文件，使用列式内存映射存储作为缓存
+
+    热启动时只打开内存映射文件，返回的宽表直接引用映射内存，不做反序列化。
+    源文件只在末尾追加时仅解析新增部分并追加到存储，已读取内容被改写时才全量重建。
+    全量解析时指定max_memory_mb(MB)可限制解析过程的峰值内存，数据边解析边写入存储。
+    缓存条目按源文件全部内容、数据类型和级别寻址，指定cache_budget_mb(MB)时按最近最少
+    使用淘汰旧条目，使缓存目录不超过该大小。
+    """
+    try:
+        logger.info("开始加载所有数据文件")
+        cache = CacheManager(cache_dir, logger, _budget_bytes(cache_budget_mb))
+        key = _source_key(data_paths, level, cache)
+        store_root = cache.entry_root(key)
+        info = {
+            'level': level,
+            'dtype': np.dtype(BarStore.DTYPE).name,
+            'sources': {data_type: os.path.abspath(path) for data_type, path in data_paths.items()},
+        }
         
-        # 如果缓存有效，直接从缓存加载
-        if cache_valid:
+        # 检查缓存 - 内容键未命中时，同一组源文件的旧条目已读取部分未被改写则增量刷新后改用新键
+        candidates = [key] if BarStore.exists(store_root) else []
+        candidates += [old for old in cache.find_entries(**info) if old != key and BarStore.exists(cache.entry_root(old))]
+        for candidate in candidates:
+            store = BarStore.open(cache.entry_root(candidate))
+            if set(store.fields) != set(data_paths.keys()) or not _refresh_store(store, data_paths, logger, cache):
+                continue
+            if candidate != key:
+                store = _promote_entry(cache, candidate, key)
+                if store is None:
+                    continue
             logger.info("从缓存加载数据")
-            for data_type in data_paths.keys():
-                cache_path = os.path.join(cache_dir, f"{data_type}_{level}_cache.pkl")
-                with open(cache_path, 'rb') as f:
-                    data_cache[data_type] = pickle.load(f)
+            data_cache = store.frames()
+            cache.record(key, hit=True, info=info)
             logger.info("缓存数据加载完成")
             return data_cache
         
-        # 定义数据类型字典
-        dtypes = {
-            'open': np.float32,
-            'close': np.float32,
-            'high': np.float32,
-            'low': np.float32,
-            'vol': np.float32
-        }
+        # 记录解析前的文件大小，只解析到该位置，作为下次增量刷新的起点
+        offsets = {data_type: os.path.getsize(path) for data_type, path in data_paths.items()}
+        
+        # 多线程分块解析，各字段直接写入存储
+        BarStore.prepare(store_root)
+        layouts = _ingest_files(data_paths, offsets, store_root, max_memory_mb=max_memory_mb)
         
-        # 准备并行加载参数
-        load_args = []
-        for data_type, path in data_paths.items():
-            # 首先读取少量数据来获取列名
-            sample_df = pd.read_csv(path, nrows=5)
-            columns = sample_df.columns
-            dtype_dict = {col: dtypes[data_type] for col in columns if col != sample_df.index.name}
-            load_args.append((data_type, path, dtype_dict))
-        
-        # 使用进程池并行加载
-        with Pool() as pool:
-            results = pool.map(load_single_file, load_args)
-        
-        # 整理结果
-        for data_type, df in results:
-            data_cache[data_type] = df
-            # 保存到缓存 - 修改缓存文件名以包含级别
-            cache_path = os.path.join(cache_dir, f"{data_type}_{level}_cache.pkl")
-            with open(cache_path, 'wb') as f:
-                pickle.dump(df, f)
+        # 以第一个字段的时间轴和品种表为准，对不齐的字段重新对齐后覆盖写入
+        fields = list(data_paths.keys())
+        base_index, base_columns = layouts[fields[0]]
+        for data_type in fields[1:]:
+            index, columns = layouts[data_type]
+            if not index.equals(base_index) or columns != base_columns:
+                _realign_field(BarStore.field_path(store_root, data_type), index, columns, base_index, base_columns)
+        
+        last_ts = _last_timestamp(base_index)
+        sources = {
+            data_type: _source_record(path, offsets[data_type], last_ts, cache)
+            for data_type, path in data_paths.items()
+        }
+        store = BarStore.finalize(store_root, fields, base_index, base_columns, sources)
+        for data_type in store.fields:
             logger.info(f"已加载并缓存 {data_type} 数据")
+        cache.record(key, hit=False, info=info)
+        # 同一组源文件的旧条目已被改写，不会再命中
+        for old in cache.find_entries(**info):
+            if old != key:
+                cache.remove(old)
         
-        return data_cache
+        return store.frames()
         
     except Exception as e:
         logger.error(f"加载数据文件时发生错误: {e}")
         raise
 
+def _promote_entry(cache: CacheManager, old_key: str, key: str) -> Optional[BarStore]:
+    """把增量刷新后的旧条目移到新的内容键下，移动失败(如文件仍被占用)时返回None"""
+    store_root = cache.entry_root(key)
+    try:
+        if os.path.isdir(store_root):
+            shutil.rmtree(store_root)
+        os.replace(cache.entry_root(old_key), store_root)
+    except OSError as e:
+        cache.logger.warning(f"缓存条目 {old_key} 改用新键 {key} 失败: {e}")
+        return None
+    cache.remove(old_key)
+    return BarStore.open(store_root)
+
+def load_level_data(base_paths: Dict[str, str], logger: logging.Logger, level: str,
+                    cache_dir: str = "data_cache",
+                    max_memory_mb: Optional[float] = None,
+                    cache_budget_mb: Optional[float] = None) -> Dict[str, pd.DataFrame]:
+    """
+    由最细级别(min5)数据合成任意级别的宽表
+
+    只需维护一份min5源文件。合成结果缓存在独立的存储中，并记录合成时基础级别的
+    行数、最后时间戳和存储代号；基础级别增长或被全量重建(如历史K线被修正)后自动重新合成
+
+    参数:
+        base_paths (Dict[str, str]): 字段名 -> min5源文件路径
+        logger (logging.Logger): 日志记录器
+        level (str): 目标级别，min5/min15/min30/min60/day
+        cache_dir (str): 缓存目录
+        max_memory_mb (float): 解析min5源文件时的内存上限(MB)，None表示不限制
+        cache_budget_mb (float): 缓存目录的磁盘预算(MB)，None表示不限制
+
+    返回:
+        Dict[str, pd.DataFrame]: 字段名 -> 目标级别宽表
+    """
+    base_cache = load_all_data(base_paths, logger, BASE_LEVEL, cache_dir, max_memory_mb, cache_budget_mb)
+    if level == BASE_LEVEL:
+        return base_cache
+    
+    try:
+        base_index = base_cache['open'].index
+        base_state = {
+            'level': BASE_LEVEL,
+            'n_rows': int(len(base_index)),
+            'last_ts': _last_timestamp(base_index),
+            'symbols': [str(col) for col in base_cache['open'].columns],
+            # 已读取的历史K线被修正时基础存储会全量重建，行数和最后时间戳可能不变
+            'generation': getattr(base_cache, 'generation', None),
+        }
+        cache = CacheManager(cache_dir, logger, _budget_bytes(cache_budget_mb))
+        base_key = _source_key(base_paths, BASE_LEVEL, cache)
+        key = _derived_key(base_key, level)
+        store_root = cache.entry_root(key)
+        dataset = {
+            'level': level,
+            'dtype': np.dtype(BarStore.DTYPE).name,
+            'sources': {data_type: os.path.abspath(path) for data_type, path in base_paths.items()},
+        }
+        info = {**dataset, 'base': base_key}
+        
+        if BarStore.exists(store_root):
+            store = BarStore.open(store_root)
+            if store.sources.get('base') == base_state:
+                logger.info(f"从缓存加载 {level} 合成数据")
+                cache.record(key, hit=True, info=info, keep=[base_key])
+                return store.frames()
+        
+        logger.info(f"由 {BASE_LEVEL} 合成 {level} 数据")
+        frames = resample_bars(base_cache, level)
+        store = BarStore.from_frames(store_root, frames, {'base': base_state})
+        logger.info(f"{level} 数据合成完成，共有 {store.n_rows} 根K线")
+        # 基础级别条目刚被使用且下次合成仍需要，淘汰时保留
+        cache.record(key, hit=False, info=info, keep=[base_key])
+        # 由旧版本基础数据合成的条目不会再命中
+        for old in cache.find_entries(**dataset):
+            if old != key:
+                cache.remove(old)
+        return store.frames()
+        
+    except Exception as e:
+        logger.error(f"合成 {level} 数据时发生错误: {e}")
+        raise
+
+FIELDS = ['open', 'close', 'high', 'low', 'vol']
+
+def _validity_of(data_cache: Dict[str, pd.DataFrame]) -> ValidityIndex:
+    """
+    取得宽表字典对应的品种有效性索引
+
+    load_all_data返回的字典直接使用存储写入时建立的索引；其他来源的字典按open字段现场建立
+    """
+    validity = getattr(data_cache, 'validity', None)
+    open_df = data_cache['open']
+    if validity is None or validity.n_rows != len(open_df) or validity.n_symbols != open_df.shape[1]:
+        validity = ValidityIndex.from_values(open_df.to_numpy())
+    return validity
+
+def trim_warmup(df: pd.DataFrame, start_date: str) -> pd.DataFrame:
+    """
+    剔除start_date之前的预热K线
+
+    对含call列的信号数据框，预热期内最后形成的持仓会写入第一根保留的K线(该处没有信号时)，
+    保证裁剪后前向填充得到的持仓与完整计算一致
+
+    参数:
+        df (pd.DataFrame): 行情或信号数据框
+        start_date (str): 正式区间起始日期
+
+    返回:
+        pd.DataFrame: 裁剪后的数据框
+    """
+    start = int(df.index.searchsorted(pd.Timestamp(start_date), side='left'))
+    if start == 0:
+        return df
+    trimmed = df.iloc[start:].copy()
+    if 'call' in df.columns and len(trimmed) > 0 and pd.isna(trimmed['call'].iloc[0]):
+        carried = df['call'].iloc[:start].dropna()
+        if len(carried) > 0:
+            trimmed.iloc[0, trimmed.columns.get_loc('call')] = carried.iloc[-1]
+    return trimmed
+
+class BarPanel:
+    """
+    (字段 × 时间 × 品种) 面板数据
+
+    所有品种共享同一条时间轴和同一块连续的float32数组，mask记录每个品种在每根K线上
+    是否有有效数据。按字段或按品种取数据均返回视图，不复制也不重新对齐时间索引。
+    """
+    def __init__(self, values: np.ndarray, mask: np.ndarray, index: pd.DatetimeIndex,
+                 symbols: List[str], fields: List[str]):
+        self.values = values          # (字段 × 时间 × 品种)
+        self.mask = mask              # (时间 × 品种)，True表示该K线有效
+        self.index = index
+        self.symbols = list(symbols)
+        self.fields = list(fields)
+        self._symbol_pos = {code: i for i, code in enumerate(self.symbols)}
+        self._field_pos = {name: i for i, name in enumerate(self.fields)}
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def symbol_loc(self, code: str) -> int:
+        """品种在面板中的列号"""
+        return self._symbol_pos[code]
+
+    def field(self, name: str) -> np.ndarray:
+        """单个字段的 (时间 × 品种) 视图"""
+        return self.values[self._field_pos[name]]
+
+    def symbol(self, code: str) -> np.ndarray:
+        """单个品种的 (字段 × 时间) 视图，包含无效K线(NaN)"""
+        return self.values[:, :, self.symbol_loc(code)]
+
+    def valid_rows(self, code: str) -> np.ndarray:
+        """单个品种有效K线在共享时间轴上的行号"""
+        return np.flatnonzero(self.mask[:, self.symbol_loc(code)])
+
+    def frame(self, code: str) -> pd.DataFrame:
+        """单个品种的有效K线数据框，与load_data_vectorized的输出格式一致"""
+        col = self.symbol_loc(code)
+        valid_mask = self.mask[:, col]
+        return pd.DataFrame(
+            {name: self.values[i, valid_mask, col] for i, name in enumerate(self.fields)},
+            index=self.index[valid_mask]
+        )
+
+    def trim(self, start_date: str) -> 'BarPanel':
+        """剔除start_date之前的预热K线，返回共享底层数组的新面板"""
+        start = int(self.index.searchsorted(pd.Timestamp(start_date), side='left'))
+        return BarPanel(self.values[:, start:], self.mask[start:], self.index[start:], self.symbols, self.fields)
+
+    def to_dict(self, logger: Optional[logging.Logger] = None) -> Dict[str, pd.DataFrame]:
+        """转换为 品种 -> 数据框 的字典，跳过没有有效数据的品种"""
+        data_dict = {}
+        has_data = self.mask.any(axis=0)
+        for col, code in enumerate(self.symbols):
+            if has_data[col]:
+                data_dict[code] = self.frame(code)
+                if logger is not None:
+                    logger.info(f"{code} 数据加载完成，共有 {len(data_dict[code])} 条记录")
+        return data_dict
+
+def load_panel(data_cache: Dict[str, pd.DataFrame], futures_codes: List[str],
+               start_date: str, end_date: str, logger: logging.Logger,
+               lookback: int = 0) -> BarPanel:
+    """
+    加载多个品种的面板数据
+
+    参数:
+        data_cache (Dict[str, pd.DataFrame]): load_all_data返回的宽表字典
+        futures_codes (List[str]): 品种代码列表，不存在的品种会被跳过
+        start_date (str): 起始日期(含)
+        end_date (str): 结束日期(含)
+        logger (logging.Logger): 日志记录器
+        lookback (int): 指标预热K线数，面板会向前扩展到每个品种都有这么多根有效K线
+
+    返回:
+        BarPanel: 面板数据，可用BarPanel.trim剔除预热部分
+    """
+    try:
+        index = data_cache['open'].index
+        rows = date_slice(index, start_date, end_date)
+        
+        col_positions = data_cache['open'].columns.get_indexer(futures_codes)
+        missing = [code for code, col in zip(futures_codes, col_positions) if col < 0]
+        if missing:
+            logger.warning(f"期货品种 {missing} 在数据中不存在，跳过加载")
+        symbols = [code for code, col in zip(futures_codes, col_positions) if col >= 0]
+        cols = col_positions[col_positions >= 0]
+        
+        # 向前扩展到所有品种都有足够的预热K线
+        if lookback > 0 and len(cols) > 0:
+            validity = _validity_of(data_cache)
+            first_row = min(validity.warmup_start(col, rows.start, lookback) for col in cols)
+            rows = slice(first_row, rows.stop)
+        
+        # 一次性拷贝日期区间内所需品种的数据，组成连续的三维数组
+        values = np.empty((len(FIELDS), rows.stop - rows.start, len(symbols)), dtype=np.float32)
+        for i, field in enumerate(FIELDS):
+            np.take(data_cache[field].to_numpy()[rows], cols, axis=1, out=values[i])
+        mask = ~np.isnan(values[FIELDS.index('open')])
+        
+        return BarPanel(values, mask, index[rows], symbols, FIELDS)
+        
+    except Exception as e:
+        logger.error(f"加载面板数据时发生错误: {e}")
+        raise
+
 def load_data(data_cache: Dict[str, pd.DataFrame], futures_code: str, logger: logging.Logger) -> pd.DataFrame:
     """从缓存中提取特定期货品种的数据"""
     try:
         # 使用更高效的方式检查列是否存在
-        if futures_code not in set(data_cache['open'].columns):
+        col = data_cache['open'].columns.get_indexer([futures_code])[0]
+        if col < 0:
             logger.warning(f"期货品种 {futures_code} 在数据中不存在，跳过加载")
             return pd.DataFrame()
         
-        # 使用向量化操作检查是否全为空值
-        open_data = data_cache['open'][futures_code]
-        if open_data.isna().all():
+        # 有效K线由有效性索引给出，不扫描开盘价列
+        validity = _validity_of(data_cache)
+        if validity.count[col] == 0:
             logger.warning(f"期货品种 {futures_code} 的开盘价数据全为空值，跳过加载")
             return pd.DataFrame()
         
-        # 使用布尔索引代替loc，提高性能
-        valid_mask = ~open_data.isna()
-        
-        # 一次性创建数据框
-        data = pd.DataFrame({
-            'open': data_cache['open'].loc[valid_mask, futures_code],
-            'close': data_cache['close'].loc[valid_mask, futures_code],
-            'high': data_cache['high'].loc[valid_mask, futures_code],
-            'low': data_cache['low'].loc[valid_mask, futures_code],
-            'vol': data_cache['vol'].loc[valid_mask, futures_code],
-        })
+        # 只取首末有效K线之间的行，直接取底层数组的列视图，避免pandas的逐列复制
+        rows = slice(int(validity.first[col]), int(validity.last[col]) + 1)
+        valid_mask = validity.valid_mask(col, rows.start, rows.stop)
+        data = pd.DataFrame(
+            {field: data_cache[field].to_numpy()[rows, col][valid_mask] for field in FIELDS},
+            index=data_cache['open'].index[rows][valid_mask]
+        )
         
         logger.info(f"{futures_code} 数据加载完成，共有 {len(data)} 条记录")
         return data
@@ -117,53 +648,49 @@ def load_data(data_cache: Dict[str, pd.DataFrame], futures_code: str, logger: lo
         raise
 
 def load_data_vectorized(data_cache: Dict[str, pd.DataFrame], futures_codes: List[str], 
-                        start_date: str, end_date: str, logger: logging.Logger) -> Dict[str, pd.DataFrame]:
+                        start_date: str, end_date: str, logger: logging.Logger,
+                        lookback: int = 0) -> Dict[str, pd.DataFrame]:
     """
     向量化加载多个品种的数据
+
+    日期区间通过在有序时间索引上二分查找得到行切片，区间内是否有数据、有效K线位置和
+    预热起点都由有效性索引给出，各字段按切片和列号取零拷贝视图，
+    只有最终输出的单品种数据框才会复制数据。lookback大于0时每个品种额外包含起始日期
+    之前的lookback根有效K线用于指标预热，可用trim_warmup剔除
     """
     try:
-        # 预先创建日期掩码以避免重复计算
-        date_mask = (data_cache['open'].index >= start_date) & (data_cache['open'].index <= end_date)
-        
-        # 一次性获取所有需要的数据，使用numpy操作代替pandas
-        open_data = data_cache['open'].loc[date_mask, futures_codes].values
-        close_data = data_cache['close'].loc[date_mask, futures_codes].values
-        high_data = data_cache['high'].loc[date_mask, futures_codes].values
-        low_data = data_cache['low'].loc[date_mask, futures_codes].values
-        vol_data = data_cache['vol'].loc[date_mask, futures_codes].values
+        index = data_cache['open'].index
+        rows = date_slice(index, start_date, end_date)
         
-        # 获取日期索引
-        dates = data_cache['open'].loc[date_mask].index
-        
-        # 使用numpy的nansum检查非空数据
-        valid_codes_mask = ~np.isnan(open_data).all(axis=0)
-        valid_futures = np.array(futures_codes)[valid_codes_mask]
+        # 品种列号，缺失的品种跳过
+        col_positions = data_cache['open'].columns.get_indexer(futures_codes)
+        validity = _validity_of(data_cache)
         
         # 预分配字典空间
         data_dict = {}
         
-        # 使用numpy的列视图避免复制
-        valid_data = open_data[:, valid_codes_mask]
-        for i, code in enumerate(valid_futures):
-            # 创建有效数据掩码
-            valid_mask = ~np.isnan(valid_data[:, i])
+        for code, col in zip(futures_codes, col_positions):
+            if col < 0:
+                logger.warning(f"期货品种 {code} 在数据中不存在，跳过加载")
+                continue
+            
+            # 由首末有效行和缺失段判断区间内是否有数据，不扫描整列
+            if not validity.has_valid(col, rows.start, rows.stop):
+                continue
+            
+            # 有效数据掩码从预热起始行开始
+            first_row = validity.warmup_start(col, rows.start, lookback)
+            valid_mask = validity.valid_mask(col, first_row, rows.stop)
+            
+            # 使用布尔索引一次性创建数据框
+            df_data = {field: data_cache[field].to_numpy()[first_row:rows.stop, col][valid_mask] for field in FIELDS}
+            
+            data_dict[code] = pd.DataFrame(
+                df_data,
+                index=index[first_row:rows.stop][valid_mask]
+            )
             
-            if np.any(valid_mask):
-                # 使用布尔索引一次性创建数据框
-                df_data = {
-                    'open': open_data[valid_mask, i],
-                    'close': close_data[valid_mask, i],
-                    'high': high_data[valid_mask, i],
-                    'low': low_data[valid_mask, i],
-                    'vol': vol_data[valid_mask, i]
-                }
-                
-                data_dict[code] = pd.DataFrame(
-                    df_data,
-                    index=dates[valid_mask]
-                )
-                
-                logger.info(f"{code} 数据加载完成，共有 {len(data_dict[code])} 条记录")
+            logger.info(f"{code} 数据加载完成，共有 {len(data_dict[code])} 条记录")
             
         return data_dict
         
@@ -1,6 +1,483 @@
+import os
+import pickle
+import logging
+import hashlib
+import weakref
+import functools
+import contextlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
 import pandas as pd
 import numpy as np
+from pandas.api.indexers import BaseIndexer
 
+
+# ----------------------------------------------------------------------
+# 指标缓存
+#
+# 默认关闭。开启后相同函数、相同参数、内容相同的输入序列只计算一次：
+# 键由函数名、标量参数和输入数据(数值、索引、列名、Series名称)的sha1摘要组成，
+# 结果保存在按字节数限制的内存LRU中，可选再写入磁盘目录供后续运行复用；
+# 磁盘目录同样按字节数限制，超出时删除最久未使用的结果文件。
+#
+# 每次调用都要对输入计算摘要，长序列上与重新计算简单指标的耗时相当。对同一份数据
+# 反复计算指标时(如参数扫描)，可在indicator_inputs中登记该数据：各列及登记期间的
+# 指标结果保留原样副本，输入与其逐字节相同时直接使用记下的摘要，比较比计算sha1快数倍。
+# ----------------------------------------------------------------------
+
+class _IndicatorCache:
+    def __init__(self, max_memory_mb: float, disk_dir: Optional[str], max_disk_mb: Optional[float] = None):
+        self.max_bytes = int(max_memory_mb * (1 << 20))
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = None if max_disk_mb is None else int(max_disk_mb * (1 << 20))
+        self.entries = OrderedDict()    # 键 -> (结果, 字节数)
+        self.n_bytes = 0
+        self.disk_files = OrderedDict() # 键 -> 文件字节数，按最近使用排列
+        self.disk_bytes = 0
+        self.stats = {}                 # 函数名 -> [内存命中, 磁盘命中, 未命中]
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            # 已有的结果文件按修改时间(读取命中时会更新)从旧到新排列
+            found = []
+            for entry in os.scandir(disk_dir):
+                if entry.name.endswith('.pkl') and entry.is_file():
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+            for _, key, size in sorted(found):
+                self.disk_files[key] = size
+                self.disk_bytes += size
+
+    def get(self, name: str, key: str):
+        counter = self.stats.setdefault(name, [0, 0, 0])
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            counter[0] += 1
+            return True, self.entries[key][0]
+        if self.disk_dir:
+            path = os.path.join(self.disk_dir, key + '.pkl')
+            try:
+                with open(path, 'rb') as f:
+                    result = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                counter[1] += 1
+                self._remember(key, result)
+                self._touch_disk(key, path)
+                return True, result
+        counter[2] += 1
+        return False, None
+
+    def put(self, key: str, result):
+        self._remember(key, result)
+        if self.disk_dir:
+            path = os.path.join(self.disk_dir, key + '.pkl')
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._touch_disk(key, path)
+            self._trim_disk()
+
+    def _touch_disk(self, key: str, path: str):
+        """把结果文件记为最近使用(同时更新修改时间，供下次开启缓存时排序)"""
+        try:
+            os.utime(path)
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self.disk_bytes += size - self.disk_files.pop(key, 0)
+        self.disk_files[key] = size
+
+    def _trim_disk(self):
+        """
+        删除最久未使用的结果文件，直到磁盘占用不超过上限
+
+        多个进程共用目录时，每个进程按开启缓存时已有的文件和自己读写过的文件计算占用
+        """
+        if self.max_disk_bytes is None:
+            return
+        while self.disk_bytes > self.max_disk_bytes and self.disk_files:
+            key, size = self.disk_files.popitem(last=False)
+            self.disk_bytes -= size
+            try:
+                os.remove(os.path.join(self.disk_dir, key + '.pkl'))
+            except OSError:
+                pass
+
+    def _remember(self, key: str, result):
+        size = _result_nbytes(result)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (result, size)
+        self.n_bytes += size
+        while self.n_bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.n_bytes -= evicted
+
+
+_indicator_cache: Optional[_IndicatorCache] = None
+
+
+def enable_indicator_cache(max_memory_mb: float = 512, disk_dir: Optional[str] = None,
+                           max_disk_mb: Optional[float] = 2048):
+    """
+    开启指标缓存
+
+    参数:
+        max_memory_mb (float): 内存缓存上限(MB)，超出时淘汰最久未使用的结果
+        disk_dir (str): 磁盘缓存目录，None表示只使用内存缓存
+        max_disk_mb (float): 磁盘缓存上限(MB)，超出时删除最久未使用的结果文件，None表示不限制
+    """
+    global _indicator_cache
+    _indicator_cache = _IndicatorCache(max_memory_mb, disk_dir, max_disk_mb)
+
+
+def disable_indicator_cache():
+    """关闭指标缓存并释放内存中的结果(磁盘缓存保留)"""
+    global _indicator_cache
+    _indicator_cache = None
+
+
+@contextlib.contextmanager
+def indicator_cache_scope(max_memory_mb: float = 512, disk_dir: Optional[str] = None,
+                          max_disk_mb: Optional[float] = 2048):
+    """
+    在with语句内开启指标缓存，退出时关闭
+
+    缓存已开启时沿用现有缓存，不做任何改变；用于对同一份数据多次计算指标时复用相同的结果
+
+    参数:
+        max_memory_mb (float): 内存缓存上限(MB)
+        disk_dir (str): 磁盘缓存目录，None表示只使用内存缓存
+        max_disk_mb (float): 磁盘缓存上限(MB)，None表示不限制
+    """
+    global _indicator_cache
+    if _indicator_cache is not None:
+        yield
+        return
+    _indicator_cache = _IndicatorCache(max_memory_mb, disk_dir, max_disk_mb)
+    try:
+        yield
+    finally:
+        _indicator_cache = None
+
+
+def indicator_cache_stats() -> Dict:
+    """
+    指标缓存的命中统计
+
+    返回:
+        Dict: hits/disk_hits/misses/hit_rate 为合计，entries/memory_mb 为当前内存占用，
+        by_function 为各函数的 (内存命中, 磁盘命中, 未命中)；缓存未开启时返回空字典
+    """
+    cache = _indicator_cache
+    if cache is None:
+        return {}
+    hits = sum(counter[0] for counter in cache.stats.values())
+    disk_hits = sum(counter[1] for counter in cache.stats.values())
+    misses = sum(counter[2] for counter in cache.stats.values())
+    total = hits + disk_hits + misses
+    return {
+        'hits': hits,
+        'disk_hits': disk_hits,
+        'misses': misses,
+        'hit_rate': (hits + disk_hits) / total if total else 0.0,
+        'entries': len(cache.entries),
+        'memory_mb': cache.n_bytes / (1 << 20),
+        'by_function': {name: tuple(counter) for name, counter in cache.stats.items()},
+    }
+
+
+def cached_indicator(func):
+    """
+    指标函数装饰器：缓存开启时按函数、参数和输入内容复用计算结果
+
+    返回的是缓存结果的副本，调用方修改结果不会影响缓存
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = _indicator_cache
+        if cache is None:
+            return func(*args, **kwargs)
+        digest = hashlib.sha1(name.encode())
+        for arg in args:
+            _fingerprint(digest, arg)
+        for key in sorted(kwargs):
+            digest.update(key.encode())
+            _fingerprint(digest, kwargs[key])
+        key = digest.hexdigest()
+        found, result = cache.get(name, key)
+        if not found:
+            result = func(*args, **kwargs)
+            cache.put(key, result)
+        if _known_arrays is not None:
+            # 缓存中的结果不会被修改(调用方得到的是副本)，可直接作为原样副本登记
+            _register_arrays(result)
+        return _copy_result(result)
+
+    return wrapper
+
+
+def _fingerprint(digest, value):
+    """将参数的类型和内容写入摘要"""
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        digest.update(type(value).__name__.encode())
+        _fingerprint(digest, value.index)
+        if isinstance(value, pd.DataFrame):
+            _fingerprint(digest, value.columns)
+            for _, column in value.items():
+                _fingerprint(digest, column.to_numpy())
+        else:
+            # 结果通常沿用输入的名称，名称不同的输入不能共用结果
+            digest.update(f"name|{value.name!r}".encode())
+            _fingerprint(digest, value.to_numpy())
+    elif isinstance(value, pd.RangeIndex):
+        digest.update(f"range|{value.start}|{value.stop}|{value.step}".encode())
+    elif isinstance(value, pd.Index):
+        digest.update(_index_digest(value))
+    elif isinstance(value, np.ndarray):
+        digest.update(_array_digest(value))
+    elif isinstance(value, (tuple, list)):
+        digest.update(f"{type(value).__name__}|{len(value)}".encode())
+        for item in value:
+            _fingerprint(digest, item)
+    else:
+        digest.update(f"{type(value).__name__}|{value!r}".encode())
+
+
+def _hash_array(value: np.ndarray) -> bytes:
+    """数组的类型、形状和内容的sha1摘要"""
+    digest = hashlib.sha1(f"{value.dtype.str}|{value.shape}".encode())
+    if value.dtype.hasobject:
+        digest.update(pickle.dumps(value.tolist(), protocol=pickle.HIGHEST_PROTOCOL))
+    else:
+        digest.update(np.ascontiguousarray(value).view(np.uint8).data)
+    return digest.digest()
+
+
+# 索引的数据不可变，其摘要按底层数组缓存(同一索引的浅拷贝、DataFrame.copy()后的索引共用)，
+# 底层数组被回收时清除
+_index_digests: Dict[tuple, bytes] = {}
+
+
+def _index_digest(index: pd.Index) -> bytes:
+    values = index.to_numpy()
+    owner = values
+    while isinstance(owner.base, np.ndarray):
+        owner = owner.base
+    key = (id(owner), values.__array_interface__['data'][0], values.dtype.str, values.shape, values.strides,
+           type(index).__name__)
+    cached = _index_digests.get(key)
+    if cached is None:
+        digest = hashlib.sha1(type(index).__name__.encode())
+        _fingerprint(digest, values)
+        cached = _index_digests[key] = digest.digest()
+        weakref.finalize(owner, _index_digests.pop, key, None)
+    return cached
+
+
+# indicator_inputs登记的数组：(类型, 形状, 抽样元素) -> [[原样副本, 摘要(首次用到时计算)], ...]
+_known_arrays: Optional[Dict[tuple, list]] = None
+_known_bytes = 0
+# 抽样元素个数，用于筛选候选数组
+_PROBE_SIZE = 16
+
+
+def _probe_key(value: np.ndarray) -> tuple:
+    flat = value.reshape(-1)
+    picks = flat[np.linspace(0, flat.size - 1, _PROBE_SIZE).astype(np.int64)] if flat.size else flat
+    return value.dtype.str, value.shape, picks.tobytes()
+
+
+def _as_words(value: np.ndarray) -> np.ndarray:
+    """按字节比较用的无符号整数视图"""
+    flat = np.ascontiguousarray(value).reshape(-1)
+    size = flat.dtype.itemsize
+    return flat.view(np.dtype(f'u{size}') if size in (1, 2, 4, 8) else np.uint8)
+
+
+def _array_digest(value: np.ndarray) -> bytes:
+    """数组的摘要，与登记的数组逐字节相同时使用其摘要"""
+    if _known_arrays is None or value.dtype.hasobject:
+        return _hash_array(value)
+    key = _probe_key(value)
+    words = None
+    for entry in _known_arrays.get(key, ()):
+        words = _as_words(value) if words is None else words
+        if np.array_equal(_as_words(entry[0]), words):
+            if entry[1] is None:
+                entry[1] = _hash_array(entry[0])
+            return entry[1]
+    return _hash_array(value)
+
+
+def _register_arrays(value):
+    """登记数组(或Series、DataFrame各列、元组各项)的原样副本，总字节数不超过内存缓存上限"""
+    global _known_bytes
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        columns = [value] if isinstance(value, pd.Series) else [column for _, column in value.items()]
+        for column in columns:
+            _register_arrays(column.to_numpy())
+    elif isinstance(value, tuple):
+        for item in value:
+            _register_arrays(item)
+    elif isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        cache = _indicator_cache
+        if cache is None or _known_bytes + value.nbytes > cache.max_bytes:
+            return
+        entries = _known_arrays.setdefault(_probe_key(value), [])
+        # 同一结果再次命中时to_numpy()得到的是新的视图，按数据地址判断是否已登记
+        address = value.__array_interface__['data'][0]
+        if not any(entry[0].__array_interface__['data'][0] == address for entry in entries):
+            entries.append([value, None])
+            _known_bytes += value.nbytes
+
+
+@contextlib.contextmanager
+def indicator_inputs(data: pd.DataFrame):
+    """
+    在with语句内登记一份输入数据，用于对同一份数据反复计算指标(如参数扫描中同一品种的多组参数)
+
+    data各列的原样副本在此登记，期间的指标结果也一并登记；指标的输入与登记的数组逐字节
+    相同时不再计算sha1，直接使用该数组的摘要(每个数组只计算一次)。缓存键与未登记时相同。
+    缓存未开启或已在登记中时不做任何改变
+
+    参数:
+        data (pd.DataFrame): 输入数据
+    """
+    global _known_arrays, _known_bytes
+    if _indicator_cache is None or _known_arrays is not None:
+        yield
+        return
+    _known_arrays, _known_bytes = {}, 0
+    try:
+        for _, column in data.items():
+            values = column.to_numpy()
+            _register_arrays(values.copy() if isinstance(values, np.ndarray) else values)
+        yield
+    finally:
+        _known_arrays, _known_bytes = None, 0
+
+
+def _copy_result(result):
+    if isinstance(result, (pd.Series, pd.DataFrame, np.ndarray)):
+        return result.copy()
+    if isinstance(result, tuple):
+        return tuple(_copy_result(item) for item in result)
+    return result
+
+
+def _result_nbytes(result) -> int:
+    if isinstance(result, (pd.Series, pd.DataFrame)):
+        return int(np.sum(result.memory_usage(index=True, deep=False)))
+    if isinstance(result, np.ndarray):
+        return int(result.nbytes)
+    if isinstance(result, tuple):
+        return sum(_result_nbytes(item) for item in result)
+    return 0
+
+
+# ----------------------------------------------------------------------
+# 二维面板输入
+#
+# 各指标除单个Series外，也接受 (时间 × 品种) 的宽表或二维数组，全部品种在一次
+# 调用中计算。每列结果等价于只取该品种的有效K线(所有浮点输入均非NaN的行)单独
+# 计算后放回原位置：先按列把有效行依次移到顶部(打包)，在打包后的面板上计算，再按
+# 原位置取回，缺失位置为NaN(布尔结果为False)。各指标只依赖当前及之前的K线，打包
+# 后末尾的填充行不影响有效行。布尔输入不含缺失信息，视为全部有效。
+# ----------------------------------------------------------------------
+
+_panel_state = threading.local()
+
+
+def _panel_indicator(func):
+    """指标函数装饰器：支持一维数组和二维面板输入，一维Series按原逻辑计算"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # 指标内部调用其他指标时输入已是打包后的面板
+        if getattr(_panel_state, 'active', False):
+            return func(*args, **kwargs)
+        inputs = [v for v in (*args, *kwargs.values()) if isinstance(v, (pd.Series, pd.DataFrame, np.ndarray))]
+        template = next((v for v in inputs if not isinstance(v, pd.Series)), None)
+        if template is None:
+            return func(*args, **kwargs)
+        
+        if np.ndim(template) == 1:
+            convert = lambda v: pd.Series(v) if isinstance(v, np.ndarray) else v
+            result = func(*[convert(v) for v in args], **{k: convert(v) for k, v in kwargs.items()})
+            return _as_array(result)
+        
+        shape = np.shape(template)
+        for v in inputs:
+            if np.shape(v) != shape:
+                raise ValueError(f"{func.__name__} 的面板输入形状不一致: {np.shape(v)} 与 {shape}")
+        
+        # 面板在内部按 (品种 × 时间) 连续排列，与pandas宽表的列存储一致
+        transposed = {id(v): _symbol_major(_as_array(v)) for v in inputs}
+        valid_t = np.ones(shape[::-1], dtype=bool)
+        for arr_t in transposed.values():
+            if arr_t.dtype.kind == 'f':
+                valid_t &= ~np.isnan(arr_t)
+        
+        # packed_t为打包后各品种有效K线所在的位置，全部有效时无需打包
+        if valid_t.all():
+            valid_t = packed_t = None
+        else:
+            packed_t = np.arange(shape[0]) < valid_t.sum(axis=1)[:, None]
+        
+        def pack(v):
+            if not isinstance(v, (pd.DataFrame, np.ndarray)):
+                return v
+            arr_t = transposed[id(v)]
+            if valid_t is not None:
+                # 缺失行(包括其他输入缺失的行)作为填充排在末尾
+                fill = np.nan if arr_t.dtype.kind == 'f' else 0
+                out_t = np.full(arr_t.shape, fill, dtype=arr_t.dtype)
+                out_t[packed_t] = arr_t[valid_t]
+                arr_t = out_t
+            return pd.DataFrame(arr_t.T, copy=False)
+        
+        _panel_state.active = True
+        try:
+            result = func(*[pack(v) for v in args], **{k: pack(v) for k, v in kwargs.items()})
+        finally:
+            _panel_state.active = False
+        
+        out = _as_array(result)
+        if valid_t is not None:
+            if out.dtype.kind == 'b':
+                out_t = np.zeros(valid_t.shape, dtype=bool)
+            else:
+                out_t = np.full(valid_t.shape, np.nan, dtype=np.result_type(out.dtype, np.float32))
+            out_t[valid_t] = _symbol_major(out)[packed_t]
+            out = out_t.T
+        return _like(template, out)
+
+    return wrapper
+
+
+# 分块转置时每块的行数
+_TRANSPOSE_BLOCK_ROWS = 1024
+
+
+def _symbol_major(arr: np.ndarray) -> np.ndarray:
+    """(时间 × 品种) 数组转为按品种连续的 (品种 × 时间) 数组，已是该布局时不复制"""
+    arr_t = arr.T
+    if arr_t.flags.c_contiguous:
+        return arr_t
+    # 分块转置，访存比整体转置连续
+    out = np.empty(arr_t.shape, dtype=arr.dtype)
+    for start in range(0, arr.shape[0], _TRANSPOSE_BLOCK_ROWS):
+        out[:, start:start + _TRANSPOSE_BLOCK_ROWS] = arr[start:start + _TRANSPOSE_BLOCK_ROWS].T
+    return out
+
+
+@cached_indicator
+@_panel_indicator
 def Momentum(series: pd.Series, length: int) -> pd.Series:
     """
     计算价格动量。
@@ -15,6 +492,8 @@ def Momentum(series: pd.Series, length: int) -> pd.Series:
     return series - series.shift(length)
 
 
+@cached_indicator
+@_panel_indicator
 def XAverage(series: pd.Series, length: int) -> pd.Series:
     """
     计算指数加权移动平均。
@@ -29,6 +508,8 @@ def XAverage(series: pd.Series, length: int) -> pd.Series:
     return series.ewm(span=length, adjust=False).mean()
 
 
+@cached_indicator
+@_panel_indicator
 def AvgTrueRange(length: int, high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
     """
     计算平均真实波幅(ATR)
@@ -46,14 +527,20 @@ def AvgTrueRange(length: int, high: pd.Series, low: pd.Series, close: pd.Series)
     return Average(tr, length)
 
 
+@cached_indicator
+@_panel_indicator
 def CrossOver(series1: pd.Series, series2: pd.Series) -> pd.Series:
     return (series1.shift(1) <= series2.shift(1)) & (series1 > series2)
 
 
+@cached_indicator
+@_panel_indicator
 def CrossUnder(series1: pd.Series, series2: pd.Series) -> pd.Series:
     return (series1.shift(1) >= series2.shift(1)) & (series1 < series2)
 
 
+@cached_indicator
+@_panel_indicator
 def TrueRange(high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
     """
     计算真实波幅(True Range)
@@ -69,11 +556,14 @@ def TrueRange(high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
     # 其他K线用TrueHigh - TrueLow
     true_high = TrueHigh(high, close)
     true_low = TrueLow(low, close)
-    tr[1:] = true_high[1:] - true_low[1:]
+    if len(tr) > 1:
+        tr.iloc[1:] = (true_high - true_low).iloc[1:].to_numpy()
     
     return tr
 
 
+@cached_indicator
+@_panel_indicator
 def TrueHigh(high: pd.Series, close: pd.Series) -> pd.Series:
     """
     计算真实高点
@@ -86,9 +576,11 @@ def TrueHigh(high: pd.Series, close: pd.Series) -> pd.Series:
         pd.Series: 真实高点序列
     """
     prev_close = close.shift(1)
-    return pd.Series(np.where(high >= prev_close, high, prev_close), index=high.index)
+    return _like(high, np.where(high >= prev_close, high, prev_close))
 
 
+@cached_indicator
+@_panel_indicator
 def TrueLow(low: pd.Series, close: pd.Series) -> pd.Series:
     """
     计算真实低点
@@ -101,9 +593,11 @@ def TrueLow(low: pd.Series, close: pd.Series) -> pd.Series:
         pd.Series: 真实低点序列
     """
     prev_close = close.shift(1)
-    return pd.Series(np.where(low <= prev_close, low, prev_close), index=low.index)
+    return _like(low, np.where(low <= prev_close, low, prev_close))
 
 
+@cached_indicator
+@_panel_indicator
 def Highest(series: pd.Series, length: int) -> pd.Series:
     """
     因为懒得再到每个策略里改了，所以Highest和HighestFC都通过向量化计算
@@ -120,6 +614,8 @@ def Highest(series: pd.Series, length: int) -> pd.Series:
     return series.rolling(window=length, min_periods=1).max()
 
 
+@cached_indicator
+@_panel_indicator
 def Lowest(series: pd.Series, length: int) -> pd.Series:
     """
     因为懒得再到每个策略里改了，所以Lowest和LowestFC都通过向量化计算
@@ -136,6 +632,8 @@ def Lowest(series: pd.Series, length: int) -> pd.Series:
     return series.rolling(window=length, min_periods=1).min()
 
 
+@cached_indicator
+@_panel_indicator
 def HighestFC(series: pd.Series, length: int) -> pd.Series:
     """
     计算过去N个周期的最高值(Fast Calculation版本)
@@ -147,6 +645,8 @@ def HighestFC(series: pd.Series, length: int) -> pd.Series:
     return series.rolling(window=length, min_periods=1).max()
 
 
+@cached_indicator
+@_panel_indicator
 def LowestFC(series: pd.Series, length: int) -> pd.Series:
     """
     计算过去N个周期的最低值(Fast Calculation版本)
@@ -158,6 +658,8 @@ def LowestFC(series: pd.Series, length: int) -> pd.Series:
     return series.rolling(window=length, min_periods=1).min()
 
 
+@cached_indicator
+@_panel_indicator
 def AverageFC(series: pd.Series, length: int) -> pd.Series:
     """
     计算快速算术平均值(Fast Calculation版本)
@@ -172,6 +674,8 @@ def AverageFC(series: pd.Series, length: int) -> pd.Series:
     return series.rolling(window=length, min_periods=1).mean()
 
 
+@cached_indicator
+@_panel_indicator
 def Average(price: pd.Series, length: int) -> pd.Series:
     """
     计算简单移动平均
@@ -186,6 +690,8 @@ def Average(price: pd.Series, length: int) -> pd.Series:
     return Summation(price, length) / length
 
 
+@cached_indicator
+@_panel_indicator
 def PriceOscillator(price: pd.Series, FastLength: int, SlowLength: int) -> pd.Series:
     """
     计算价格震荡指标
@@ -206,6 +712,8 @@ def PriceOscillator(price: pd.Series, FastLength: int, SlowLength: int) -> pd.Se
     return fast_ma - slow_ma
 
 
+@cached_indicator
+@_panel_indicator
 def Summation(price: pd.Series, length: int) -> pd.Series:
     """
     计算指定周期内数值的总和
@@ -220,60 +728,65 @@ def Summation(price: pd.Series, length: int) -> pd.Series:
     return price.rolling(window=length, min_periods=1).sum()
 
 
-def VariancePS(price: pd.Series, length: int, data_type: int = 1) -> pd.Series:
+@cached_indicator
+@_panel_indicator
+def VariancePS(price, length: int, data_type: int = 1):
     """
-    计算估计方差（向量化版本）
+    计算估计方差
+
+    单遍滚动计算：由窗口内有效值的个数、总和以及关于窗口自身均值的离差平方和
+    (pandas滚动方差的Welford增量更新)推出关于length周期均值的离差平方和，
+    不再构造length列的移位矩阵。窗口内的NaN不参与求和，均值仍按length取平均，
+    前length-1根K线为0，与逐列展开的算法结果一致
     
     参数:
-        price (pd.Series): 价格序列
+        price (pd.Series | pd.DataFrame | np.ndarray): 价格序列，二维时每列为一个品种
         length (int): 计算周期
         data_type (int): 1-总体方差, 2-样本方差
         
     返回:
-        pd.Series: 方差序列
+        与price同类型的方差序列
     """
-    # 初始化结果序列
-    result = pd.Series(0.0, index=price.index)
-    
-    # 计算移动平均
-    mean = Average(price, length)
+    values = _as_pandas(price)
+    rolling = values.rolling(window=length, min_periods=1)
+    count = rolling.count()
+    total = rolling.sum()
     
-    # 创建移位矩阵，每行包含length个历史值
-    shifted_matrix = pd.concat([price.shift(i) for i in range(length)], axis=1)
-    
-    # 计算每个时间点的均值矩阵（广播mean到每一列）
-    mean_matrix = mean.values.reshape(-1, 1).repeat(length, axis=1)
-    
-    # 计算差值的平方和
-    squared_diff = (shifted_matrix.sub(mean_matrix)) ** 2
-    sum_squared_diff = squared_diff.sum(axis=1)
+    # 离差平方和 = 关于窗口有效值均值的离差平方和 + 个数 × (有效值均值 - length周期均值)²
+    mean = total / length
+    m2 = rolling.var(ddof=0) * count
+    sum_squared_diff = (m2 + count * (total / count - mean) ** 2).where(count > 0, 0.0)
     
     # 根据data_type选择除数
     divisor = length if data_type == 1 else length - 1
     
     # 只在有足够数据的位置计算方差
-    valid_mask = price.index >= price.index[length - 1]
-    result[valid_mask] = sum_squared_diff[valid_mask] / divisor
+    result = sum_squared_diff / divisor
+    result.iloc[:length - 1] = 0.0
     
-    return result
+    return _like(price, result.to_numpy())
 
 
-def StandardDev(price: pd.Series, length: int, data_type: int = 1) -> pd.Series:
+@cached_indicator
+@_panel_indicator
+def StandardDev(price, length: int, data_type: int = 1):
     """
     计算标准差
     
     参数:
-        price (pd.Series): 价格序列
+        price (pd.Series | pd.DataFrame | np.ndarray): 价格序列，二维时每列为一个品种
         length (int): 计算周期
         data_type (int): 1-总体标准差, 2-样本标准差
         
     返回:
-        pd.Series: 标准差序列
+        与price同类型的标准差序列
     """
-    var_ps = VariancePS(price, length, data_type)
-    return pd.Series(np.where(var_ps > 0, np.sqrt(var_ps), 0), index=price.index)
+    var_ps = _as_array(VariancePS(price, length, data_type))
+    return _like(price, np.sqrt(np.where(var_ps > 0, var_ps, 0.0)))
 
 
+@cached_indicator
+@_panel_indicator
 def Cum(price: pd.Series) -> pd.Series:
     """
     计算累计值
@@ -287,41 +800,48 @@ def Cum(price: pd.Series) -> pd.Series:
     return price.cumsum()
 
 
-def NthCon(condition: pd.Series, n: int) -> pd.Series:
+@cached_indicator
+def NthCon(condition, n: int):
     """
     计算第N个满足条件的Bar距当前的Bar数目
+
+    由满足条件的累计个数直接定位第n个最近满足条件的位置，线性时间、无逐Bar循环。
+    当前Bar满足条件时计为第1个；此前满足条件的Bar不足n个时返回当前Bar序号+1
     
     参数:
-        condition (pd.Series): 条件序列(布尔值)
+        condition (pd.Series | pd.DataFrame | np.ndarray): 条件序列(布尔值)，二维时每列为一个品种
         n (int): 向前查找第n个满足条件的bar
         
     返回:
-        pd.Series: 距离序列
+        与condition同类型的距离序列(int64)
     """
-    bar_nums = pd.Series(0, index=condition.index)
-    pre_con_index = pd.Series(0, index=condition.index)
+    flags = _as_array(condition).astype(bool)
+    one_dim = flags.ndim == 1
+    if one_dim:
+        flags = flags[:, None]
+    n_rows, n_cols = flags.shape
+    n = max(n, 1)
     
-    # 计算基础距离
-    for i in range(len(condition)):
-        if condition.iloc[i]:
-            bar_nums.iloc[i] = 0
-            pre_con_index.iloc[i] = bar_nums.iloc[i-1] + 1 if i > 0 else 1
-        else:
-            bar_nums.iloc[i] = bar_nums.iloc[i-1] + 1 if i > 0 else 1
-            pre_con_index.iloc[i] = bar_nums.iloc[i]
-    
-    # 计算第N个满足条件的距离
-    result = bar_nums.copy()
-    for i in range(len(condition)):
-        re_bars = result.iloc[i]
-        for j in range(2, n + 1):
-            if i - int(re_bars) >= 0:  # 确保索引有效
-                re_bars += pre_con_index.iloc[i - int(re_bars)]
-        result.iloc[i] = re_bars
-        
-    return result
+    # 按列展开后满足条件的位置，列内按时间升序
+    hits = np.flatnonzero(flags.T)
+    # 截至每根Bar(含)满足条件的个数，以及每列之前各列满足条件的总数
+    counts = np.cumsum(flags, axis=0)
+    col_offsets = np.concatenate(([0], np.cumsum(counts[-1])[:-1])) if n_rows else np.zeros(n_cols, dtype=np.int64)
+    
+    rank = counts - n
+    found = rank >= 0
+    rows = np.arange(n_rows)[:, None]
+    nth_pos = np.full(flags.shape, -1, dtype=np.int64)
+    if hits.size:
+        nth_hit = hits[np.where(found, rank + col_offsets, 0)]
+        nth_pos = np.where(found, nth_hit - np.arange(n_cols) * n_rows, -1)
+    result = (rows - nth_pos).astype(np.int64)
+    
+    return _like(condition, result[:, 0] if one_dim else result)
 
 
+@cached_indicator
+@_panel_indicator
 def CountIf(condition: pd.Series, length: int) -> pd.Series:
     """
     计算最近N个周期内条件满足的次数(Fast Calculation版本)
@@ -331,3 +851,776 @@ def CountIf(condition: pd.Series, length: int) -> pd.Series:
         length (int): 计算周期
     """
     return condition.rolling(window=length, min_periods=1).sum()
+
+
+@cached_indicator
+@_panel_indicator
+def RankCount(series: pd.Series, length: int) -> pd.Series:
+    """
+    计算当前值在前N个周期中的排名计数：满足 series[i] >= series[i-j] (1 <= j <= N) 的个数
+    
+    开头不足N个周期时只比较已有的K线，任一方为NaN时不计数。除以比较的K线数即为
+    当前值在回看窗口中的百分位
+    
+    参数:
+        series (pd.Series): 输入序列
+        length (int): 回看周期
+        
+    返回:
+        pd.Series: 排名计数序列(整数)
+    """
+    values = _as_array(series)
+    count = np.zeros(values.shape, dtype=np.int64)
+    for j in range(1, min(length, len(values) - 1) + 1):
+        count[j:] += values[j:] >= values[:-j]
+    return _like(series, count)
+
+
+# ----------------------------------------------------------------------
+# TB递推平滑指标
+#
+# DMI/ADX与TB版RSI都由Wilder平滑(avg = avg + (x - avg) / N)逐Bar递推得到。
+# 只有递推本身需要循环，方向移动、比值等都按数组计算。递推按指定的数值类型逐步
+# 舍入，与逐Bar标量计算的结果逐位一致。
+#
+# numba是可选依赖：安装时递推循环由numba.njit编译执行；未安装时同一段循环按Python
+# 逐元素执行，结果相同但长序列上慢得多，首次调用时记录一次警告。
+# ----------------------------------------------------------------------
+
+_NUMBA_FALLBACK_LOGGED = False
+
+try:
+    from numba import njit as _njit
+except ImportError:
+    def _njit(func):
+        """未安装numba时的替代：原样按Python执行，首次调用时记录一次警告"""
+        @functools.wraps(func)
+        def run(*args):
+            global _NUMBA_FALLBACK_LOGGED
+            if not _NUMBA_FALLBACK_LOGGED:
+                _NUMBA_FALLBACK_LOGGED = True
+                logging.getLogger(__name__).warning(
+                    "未安装numba，指标与仓位的逐Bar循环按Python执行，长序列上较慢(pip install numba)")
+            return func(*args)
+        return run
+
+
+@_njit
+def _wilder_kernel(values, seed, start, alpha, out):
+    """out[start] = seed，之后 out[i] = out[i-1] + alpha * (values[i] - out[i-1])"""
+    out[start] = seed
+    for i in range(start + 1, len(values)):
+        prev = out[i - 1]
+        out[i] = prev + alpha * (values[i] - prev)
+    return out
+
+
+def _wilder_smooth(values: np.ndarray, seed, start: int, length: int, dtype=None) -> np.ndarray:
+    """从第start根Bar起以seed为初值做Wilder平滑，之前为NaN；dtype为递推使用的数值类型，默认与values相同"""
+    dtype = np.dtype(values.dtype if dtype is None else dtype)
+    values = values.astype(dtype, copy=False)
+    out = np.full(len(values), np.nan, dtype=dtype)
+    if 0 <= start < len(values):
+        _wilder_kernel(values, dtype.type(seed), start, dtype.type(1.0 / length), out)
+    return out
+
+
+def _sequential_sum(values: np.ndarray):
+    """按顺序逐个累加(与逐Bar循环累加的舍入一致)，保持values的数值类型"""
+    total = values.dtype.type(0)
+    for value in values:
+        total = total + value
+    return total
+
+
+@cached_indicator
+def DMI(high, low, close, length: int, adxr_length: int,
+        smooth_dtype=None, running_adx: bool = True) -> pd.DataFrame:
+    """
+    计算TB方式的趋向指标DMI及ADX/ADXR
+
+    第length根Bar以前length根的方向移动、真实波幅之和的均值为初值，之后做Wilder平滑；
+    DI为平滑后的方向移动占真实波幅的百分比，DX为两条DI之差占两者之和的百分比，
+    ADX为DX的Wilder平滑，ADXR为ADX与adxr_length根Bar前ADX的均值
+    
+    参数:
+        high (pd.Series): 最高价序列
+        low (pd.Series): 最低价序列
+        close (pd.Series): 收盘价序列
+        length (int): DMI周期
+        adxr_length (int): ADXR回看周期
+        smooth_dtype: 方向移动与真实波幅平滑使用的数值类型，None表示与输入相同
+        running_adx (bool): True时从第2根Bar起输出(第length根之前DI和DX为0)，
+            ADX在前length根Bar取DX的累计均值；False时从第length根Bar起输出，
+            ADX以DX/(length+1)为初值
+        
+    返回:
+        pd.DataFrame: DMIPlus、DMIMinus、DX、ADX、ADXR以及平滑后的AvgPlusDM、AvgMinusDM、Volty
+    """
+    h, l = _as_array(high), _as_array(low)
+    n = len(h)
+    dtype = np.result_type(h.dtype, l.dtype)
+    tr = _as_array(TrueRange(high, low, close))
+    
+    # 方向移动：上涨幅度大于下跌幅度且为正时计入+DM，反之计入-DM
+    upper = np.zeros(n, dtype=dtype)
+    lower = np.zeros(n, dtype=dtype)
+    upper[1:] = h[1:] - h[:-1]
+    lower[1:] = l[:-1] - l[1:]
+    plus_dm = np.where((upper > lower) & (upper > 0), upper, 0).astype(dtype)
+    minus_dm = np.where((lower > upper) & (lower > 0), lower, 0).astype(dtype)
+    
+    # 初值：第length根Bar起向前length根逐根累加后取均值
+    seeds = [_sequential_sum(x[length:0:-1]) / length if length < n else 0 for x in (plus_dm, minus_dm, tr)]
+    avg_plus = _wilder_smooth(plus_dm, seeds[0], length, length, smooth_dtype)
+    avg_minus = _wilder_smooth(minus_dm, seeds[1], length, length, smooth_dtype)
+    volty = _wilder_smooth(tr, seeds[2], length, length, smooth_dtype)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        di_plus = np.where(volty > 0, 100 * avg_plus / volty, 0).astype(np.float64)
+        di_minus = np.where(volty > 0, 100 * avg_minus / volty, 0).astype(np.float64)
+        divisor = di_plus + di_minus
+        dx = np.where(divisor > 0, 100 * np.abs(di_plus - di_minus) / divisor, 0)
+    first = min(1 if running_adx else length, n)
+    for arr in (di_plus, di_minus, dx):
+        arr[:first] = np.nan
+    
+    adx = np.full(n, np.nan)
+    if running_adx:
+        stop = min(length, n - 1)
+        adx[1:stop + 1] = np.cumsum(dx[1:stop + 1]) / np.arange(1, stop + 1)
+    elif length < n:
+        adx[length] = dx[length] / (length + 1)
+    if length < n:
+        _wilder_kernel(dx, adx[length], length, 1.0 / length, adx)
+    
+    # ADXR：第length根Bar(含)之前与前一根ADX平均，之后与adxr_length根前的ADX平均
+    adxr = np.full(n, np.nan)
+    head = np.arange(max(first, 1), min(length + 1, n))
+    adxr[head] = (adx[head] + adx[head - 1]) * 0.5
+    tail = np.arange(length + 1, n)
+    lagged = np.where(tail >= adxr_length, adx[np.maximum(tail - adxr_length, 0)], np.nan)
+    adxr[tail] = (adx[tail] + lagged) * 0.5
+    
+    return pd.DataFrame({
+        'DMIPlus': di_plus, 'DMIMinus': di_minus, 'DX': dx, 'ADX': adx, 'ADXR': adxr,
+        'AvgPlusDM': avg_plus, 'AvgMinusDM': avg_minus, 'Volty': volty,
+    }, index=high.index if isinstance(high, pd.Series) else None)
+
+
+@cached_indicator
+def RSI(price, length: int, zero_seed: bool = False) -> pd.DataFrame:
+    """
+    计算TB方式的相对强弱指标RSI
+
+    NetChgAvg和TotChgAvg分别为价格变化及其绝对值的Wilder平滑，
+    RSI = 50 × (NetChgAvg / TotChgAvg + 1)，TotChgAvg为0时取50
+    
+    参数:
+        price (pd.Series): 价格序列
+        length (int): 计算周期
+        zero_seed (bool): False时以第length根Bar相对首根Bar的平均变化和前length根变化
+            绝对值的均值为初值，之前为NaN；True时前length根Bar的平均值均取0，
+            从第length+1根起直接平滑
+        
+    返回:
+        pd.DataFrame: NetChgAvg、TotChgAvg、ChgRatio、RSIValue
+    """
+    values = _as_array(price)
+    n = len(values)
+    change = np.full(n, np.nan, dtype=values.dtype)
+    change[1:] = values[1:] - values[:-1]
+    
+    if zero_seed:
+        start, net_seed, tot_seed = length - 1, 0.0, 0.0
+    else:
+        start = length
+        net_seed = (values[length] - values[0]) / length if length < n else np.nan
+        tot_seed = pd.Series(values).diff().abs().iloc[1:length + 1].mean()
+    net = _wilder_smooth(change, net_seed, start, length, np.float64)
+    tot = _wilder_smooth(np.abs(change), tot_seed, start, length, np.float64)
+    if zero_seed:
+        net[:start] = 0.0
+        tot[:start] = 0.0
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(tot != 0, net / tot, 0.0)
+    return pd.DataFrame({
+        'NetChgAvg': net, 'TotChgAvg': tot, 'ChgRatio': ratio, 'RSIValue': 50 * (ratio + 1),
+    }, index=price.index if isinstance(price, pd.Series) else None)
+
+
+# ----------------------------------------------------------------------
+# 路径相关止损
+#
+# 抛物线、ATR跟踪、吊灯和保本止损都依赖入场后的持仓路径，只能逐Bar递推。以下函数
+# 接收价格数组和入场事件(空仓时该Bar入场)，在同一个循环里维护持仓和止损价，
+# 触及止损的Bar出场且不在当根重新入场；循环经_njit包装，安装numba时编译执行，
+# 否则按Python执行。
+#
+# 返回的DataFrame中Position为每根Bar结束时的持仓(side或0，出场Bar为0)，
+# StopPrice为持仓期间该Bar上用于判断出场的止损价，入场Bar及空仓时为NaN。
+# 价格与偏移量统一转为输入中精度最高的浮点类型计算；止损价与下限、追踪止损与
+# 保本价的取舍遵循Python内置max/min的规则(前者为NaN时结果为NaN)。
+# ----------------------------------------------------------------------
+
+@_njit
+def _parabolic_kernel(high, low, entries, initial_stop, acceleration, max_acceleration,
+                      side, hold, tradable, position, stop_out):
+    pos = 0
+    stop = extreme = initial_stop[0]
+    af = acceleration
+    for i in range(len(high)):
+        if pos == 0:
+            if entries[i]:
+                pos = side
+                stop = initial_stop[i]
+                extreme = high[i] if side > 0 else low[i]
+                af = acceleration
+        elif hold[i]:
+            stop_out[i] = stop
+        else:
+            in_force = stop
+            price = high[i] if side > 0 else low[i]
+            if (side > 0 and price > extreme) or (side < 0 and price < extreme):
+                extreme = price
+                if af < max_acceleration:
+                    af = af + min(acceleration, max_acceleration - af)
+            stop = stop + af * (extreme - stop)
+            stop_out[i] = in_force
+            hit = low[i] <= in_force if side > 0 else high[i] >= in_force
+            if hit and tradable[i]:
+                pos = 0
+        position[i] = pos
+
+
+@_njit
+def _atr_trailing_kernel(high, low, close, entries, offset, side, position, stop_out):
+    pos = 0
+    stop = close[0]
+    for i in range(len(high)):
+        if pos == 0:
+            if entries[i]:
+                pos = side
+                stop = close[i] - side * offset[i]
+        else:
+            stop_out[i] = stop
+            if (low[i] <= stop) if side > 0 else (high[i] >= stop):
+                pos = 0
+            else:
+                candidate = close[i] - side * offset[i]
+                if stop != stop or (side > 0 and candidate > stop) or (side < 0 and candidate < stop):
+                    stop = candidate
+        position[i] = pos
+
+
+@_njit
+def _chandelier_kernel(high, low, entries, offset, floor, side, position, stop_out):
+    pos = 0
+    extreme = high[0]
+    for i in range(len(high)):
+        if pos == 0:
+            if entries[i]:
+                pos = side
+                extreme = high[i] if side > 0 else low[i]
+        else:
+            price = high[i] if side > 0 else low[i]
+            if (side > 0 and price > extreme) or (side < 0 and price < extreme):
+                extreme = price
+            stop = extreme - offset[i] if side > 0 else extreme + offset[i]
+            if (side > 0 and floor[i] > stop) or (side < 0 and floor[i] < stop):
+                stop = floor[i]
+            stop_out[i] = stop
+            if (low[i] <= stop) if side > 0 else (high[i] >= stop):
+                pos = 0
+        position[i] = pos
+
+
+@_njit
+def _breakeven_kernel(high, low, entries, entry_price, trigger, initial_stop, trail_offset,
+                      use_trail, side, position, stop_out):
+    pos = 0
+    extreme = entry_value = protect = high[0]
+    for i in range(len(high)):
+        if pos == 0:
+            if entries[i]:
+                pos = side
+                extreme = high[i] if side > 0 else low[i]
+                entry_value = entry_price[i]
+                protect = initial_stop[i]
+        else:
+            if side > 0:
+                if high[i] > extreme:
+                    extreme = high[i]
+                reached = extreme >= entry_value + trigger[i]
+            else:
+                if low[i] < extreme:
+                    extreme = low[i]
+                reached = extreme <= entry_value - trigger[i]
+            base = entry_value if reached else protect
+            if use_trail:
+                stop = extreme - trail_offset[i] if side > 0 else extreme + trail_offset[i]
+                if (side > 0 and base > stop) or (side < 0 and base < stop):
+                    stop = base
+            else:
+                stop = base
+            stop_out[i] = stop
+            if (low[i] <= stop) if side > 0 else (high[i] >= stop):
+                pos = 0
+        position[i] = pos
+
+
+def _stop_arrays(*arrays):
+    """转为同一浮点类型的数组，None转为全NaN"""
+    n = len(arrays[0])
+    values = [None if x is None else _as_array(x) for x in arrays]
+    dtype = np.result_type(*[x.dtype for x in values if x is not None], np.float32)
+    return [np.full(n, np.nan, dtype=dtype) if x is None else x.astype(dtype, copy=False) for x in values]
+
+
+def _bool_array(values, n: int, default: bool) -> np.ndarray:
+    if values is None:
+        return np.full(n, default)
+    return _as_array(values).astype(bool)
+
+
+def _run_stop(kernel, template, side: int, *args) -> pd.DataFrame:
+    """执行止损递推，整理为Position/StopPrice两列"""
+    if side not in (1, -1):
+        raise ValueError(f"side必须是1(多头)或-1(空头)，而不是{side}")
+    n = len(template)
+    position = np.zeros(n, dtype=np.int8)
+    stop = np.full(n, np.nan, dtype=args[0].dtype if n else np.float64)
+    if n:
+        kernel(*args, position, stop)
+    return pd.DataFrame({'Position': position, 'StopPrice': stop},
+                        index=template.index if isinstance(template, pd.Series) else None)
+
+
+@cached_indicator
+def ParabolicStop(high, low, entries, initial_stop, acceleration: float = 0.02,
+                  max_acceleration: float = 0.2, side: int = 1, hold=None, tradable=None) -> pd.DataFrame:
+    """
+    抛物线(SAR)止损
+
+    入场Bar以initial_stop为止损价、该Bar最高价(空头为最低价)为极值点；之后每根Bar
+    先以上一根Bar的止损价判断出场，再更新：价格创新极值时加速因子增加acceleration
+    (不超过max_acceleration)，止损价向极值点移动 加速因子 × (极值点 - 止损价)
+    
+    参数:
+        high (pd.Series): 最高价序列
+        low (pd.Series): 最低价序列
+        entries (pd.Series): 布尔序列，空仓时为True的Bar入场
+        initial_stop (pd.Series): 入场Bar的初始止损价
+        acceleration (float): 加速因子的初值和增量
+        max_acceleration (float): 加速因子上限
+        side (int): 1-多头, -1-空头
+        hold (pd.Series): 布尔序列，持仓时为True的Bar止损价不更新也不判断出场，None表示无
+        tradable (pd.Series): 布尔序列，只有为True的Bar才能止损出场(如成交量大于0)，None表示全部可以
+        
+    返回:
+        pd.DataFrame: Position、StopPrice
+    """
+    h, l, stop = _stop_arrays(high, low, initial_stop)
+    n = len(h)
+    return _run_stop(_parabolic_kernel, high, side, h, l, _bool_array(entries, n, False), stop,
+                     float(acceleration), float(max_acceleration), side,
+                     _bool_array(hold, n, False), _bool_array(tradable, n, True))
+
+
+@cached_indicator
+def ATRTrailingStop(high, low, close, entries, offset, side: int = 1) -> pd.DataFrame:
+    """
+    ATR跟踪止损
+
+    入场Bar及之后每根Bar收盘后以 收盘价 - offset(空头为加) 上移止损价(只向有利方向移动)，
+    下一根Bar最低价(空头为最高价)触及止损价时出场
+    
+    参数:
+        high (pd.Series): 最高价序列
+        low (pd.Series): 最低价序列
+        close (pd.Series): 收盘价序列
+        entries (pd.Series): 布尔序列，空仓时为True的Bar入场
+        offset (pd.Series): 止损距离，通常为ATR的倍数
+        side (int): 1-多头, -1-空头
+        
+    返回:
+        pd.DataFrame: Position、StopPrice
+    """
+    h, l, c, off = _stop_arrays(high, low, close, offset)
+    return _run_stop(_atr_trailing_kernel, high, side, h, l, c,
+                     _bool_array(entries, len(h), False), off, side)
+
+
+@cached_indicator
+def ChandelierStop(high, low, entries, offset, floor=None, side: int = 1) -> pd.DataFrame:
+    """
+    吊灯止损
+
+    止损价为入场以来(含当根Bar)的最高价 - offset(空头为最低价 + offset)，与floor取
+    较有利者；从入场后的下一根Bar起，最低价(空头为最高价)触及止损价时出场
+    
+    参数:
+        high (pd.Series): 最高价序列
+        low (pd.Series): 最低价序列
+        entries (pd.Series): 布尔序列，空仓时为True的Bar入场
+        offset (pd.Series): 止损距离，通常为ATR的倍数
+        floor (pd.Series): 止损价的下限(空头为上限)，如通道线，None表示不设
+        side (int): 1-多头, -1-空头
+        
+    返回:
+        pd.DataFrame: Position、StopPrice
+    """
+    h, l, off, fl = _stop_arrays(high, low, offset, floor)
+    return _run_stop(_chandelier_kernel, high, side, h, l,
+                     _bool_array(entries, len(h), False), off, fl, side)
+
+
+@cached_indicator
+def BreakevenStop(high, low, entries, entry_price, trigger, initial_stop,
+                  trail_offset=None, side: int = 1) -> pd.DataFrame:
+    """
+    保本止损
+
+    入场后最高价(空头为最低价)达到 入场价 + trigger(空头为减)时止损价为入场价，否则为
+    入场Bar的initial_stop；每根Bar按当根的trigger重新判断。给出trail_offset时再与
+    吊灯止损(入场以来极值 - trail_offset)取较有利者。从入场后的下一根Bar起判断出场
+    
+    参数:
+        high (pd.Series): 最高价序列
+        low (pd.Series): 最低价序列
+        entries (pd.Series): 布尔序列，空仓时为True的Bar入场
+        entry_price (pd.Series): 入场价，取入场Bar的值
+        trigger (pd.Series): 启用保本止损所需的有利价格变动
+        initial_stop (pd.Series): 保护性止损价，取入场Bar的值
+        trail_offset (pd.Series): 吊灯止损距离，None表示不使用
+        side (int): 1-多头, -1-空头
+        
+    返回:
+        pd.DataFrame: Position、StopPrice
+    """
+    h, l, price, trig, stop, trail = _stop_arrays(high, low, entry_price, trigger, initial_stop, trail_offset)
+    return _run_stop(_breakeven_kernel, high, side, h, l, _bool_array(entries, len(h), False),
+                     price, trig, stop, trail, trail_offset is not None, side)
+
+
+# ----------------------------------------------------------------------
+# 多周期批量计算
+#
+# 参数寻优时同一序列要按几十个周期分别计算同一指标。以下函数接收周期向量，
+# 一次返回 (时间 × 周期) 矩阵，每列与对应周期单独调用的结果一致。
+# ----------------------------------------------------------------------
+
+@cached_indicator
+def AverageBatch(price, lengths):
+    """
+    一次计算多个周期的简单移动平均(Average)
+
+    所有周期的窗口和都由同一次累计求和相减得到，窗口内的NaN不参与求和，
+    窗口全为NaN时结果为NaN，与逐个调用Average(price, L)一致(浮点舍入误差内)
+    
+    参数:
+        price (pd.Series | np.ndarray): 一维价格序列
+        lengths (Sequence[int]): 周期列表
+        
+    返回:
+        pd.DataFrame: 行为时间、列为周期的移动平均矩阵，price为数组时返回二维数组
+    """
+    values = _as_array(price).astype(np.float64)
+    lengths = _batch_lengths(lengths)
+    valid = ~np.isnan(values)
+    
+    # 以第一个有效值为基准累计，减小长序列上累计和的舍入误差
+    ref = values[valid][0] if valid.any() else 0.0
+    csum = np.concatenate(([0.0], np.cumsum(np.where(valid, values - ref, 0.0))))
+    ccount = np.concatenate(([0], np.cumsum(valid)))
+    
+    # 周期L的窗口和为累计和错开L位相减，开头不足L根时从第一根累计
+    n = len(values)
+    has_gaps = not valid.all()
+    bars = np.arange(1, n + 1)
+    # 按 (周期 × 时间) 连续分配，每列连续写入，返回其转置
+    result = np.empty((len(lengths), n))
+    for j, length in enumerate(lengths):
+        length = int(length)
+        head = min(length, n)
+        col = result[j]
+        col[:head] = csum[1:head + 1]
+        np.subtract(csum[head + 1:], csum[1:n - head + 1], out=col[head:])
+        if has_gaps:
+            count = ccount[1:].copy()
+            count[head:] -= ccount[1:n - head + 1]
+        else:
+            count = np.minimum(bars, length)
+        col += count * ref
+        col /= length
+        if has_gaps:
+            col[count == 0] = np.nan
+    return _batch_like(price, result.T, lengths)
+
+
+@cached_indicator
+def HighestBatch(series, lengths):
+    """
+    一次计算多个周期的最高值(Highest)
+
+    由一张共享的稀疏表(各级2^k窗口的最大值)对每个周期做两次查表，结果与逐个调用
+    Highest(series, L)完全一致
+    
+    参数:
+        series (pd.Series | np.ndarray): 一维输入序列
+        lengths (Sequence[int]): 周期列表
+        
+    返回:
+        pd.DataFrame: 行为时间、列为周期的最高值矩阵，series为数组时返回二维数组
+    """
+    return _rolling_extreme_batch(series, lengths, np.fmax)
+
+
+@cached_indicator
+def LowestBatch(series, lengths):
+    """
+    一次计算多个周期的最低值(Lowest)
+
+    由一张共享的稀疏表(各级2^k窗口的最小值)对每个周期做两次查表，结果与逐个调用
+    Lowest(series, L)完全一致
+    
+    参数:
+        series (pd.Series | np.ndarray): 一维输入序列
+        lengths (Sequence[int]): 周期列表
+        
+    返回:
+        pd.DataFrame: 行为时间、列为周期的最低值矩阵，series为数组时返回二维数组
+    """
+    return _rolling_extreme_batch(series, lengths, np.fmin)
+
+
+@cached_indicator
+def XAverageBatch(series, lengths):
+    """
+    一次计算多个周期的指数移动平均(XAverage)
+
+    指数平均的递推系数随周期变化，各周期之间没有可共享的中间结果，这里逐个周期
+    计算后拼成矩阵，便于与其他批量函数统一使用
+    
+    参数:
+        series (pd.Series | np.ndarray): 一维输入序列
+        lengths (Sequence[int]): 周期列表
+        
+    返回:
+        pd.DataFrame: 行为时间、列为周期的指数移动平均矩阵，series为数组时返回二维数组
+    """
+    lengths = _batch_lengths(lengths)
+    values = pd.Series(_as_array(series))
+    result = np.empty((len(lengths), len(values)))
+    for j, length in enumerate(lengths):
+        result[j] = values.ewm(span=int(length), adjust=False).mean().to_numpy()
+    return _batch_like(series, result.T, lengths)
+
+
+def _batch_lengths(lengths) -> np.ndarray:
+    lengths = np.atleast_1d(np.asarray(lengths, dtype=np.int64))
+    if lengths.ndim != 1 or (lengths < 1).any():
+        raise ValueError(f"周期必须是正整数列表: {lengths}")
+    return lengths
+
+
+def _batch_like(template, result: np.ndarray, lengths: np.ndarray):
+    """批量结果按输入类型包装，Series输入时以周期为列名"""
+    if isinstance(template, pd.Series):
+        return pd.DataFrame(result, index=template.index, columns=[int(L) for L in lengths], copy=False)
+    return result
+
+
+def _rolling_extreme_batch(series, lengths, op):
+    """
+    稀疏表批量计算滚动极值
+
+    第k级表保存以每根K线结尾、长度为2^k的窗口(开头不足时截断)的极值，周期L取
+    k = floor(log2(L))，窗口极值为第k级表在t和t-(L-2^k)两处的极值
+    """
+    values = _as_array(series).astype(np.float64)
+    lengths = _batch_lengths(lengths)
+    n = len(values)
+    levels = _sparse_levels(values, int(lengths.max()), op)
+    
+    result = np.empty((len(lengths), n))
+    for j, length in enumerate(lengths):
+        k = int(length).bit_length() - 1
+        level, shift = levels[k], int(length) - 2 ** k
+        result[j] = level
+        if 0 < shift < n:
+            op(level[shift:], level[:-shift], out=result[j, shift:])
+    return _batch_like(series, result.T, lengths)
+
+
+def _sparse_levels(values: np.ndarray, max_length: int, op) -> list:
+    """稀疏表各级：第k级为以每根K线结尾、长度2^k的窗口(开头不足时截断)的极值，fmax/fmin忽略NaN"""
+    levels = [values]
+    while 2 ** len(levels) <= max_length:
+        prev, span = levels[-1], 2 ** (len(levels) - 1)
+        level = prev.copy()
+        op(prev[span:], prev[:-span], out=level[span:])
+        levels.append(level)
+    return levels
+
+
+# ----------------------------------------------------------------------
+# 可变周期滚动统计
+#
+# 自适应周期的策略每根K线使用不同的回看长度。以下函数接收与序列等长的周期数组，
+# 均值和标准差由按周期给出窗口边界的pandas滚动窗口算出(求和带补偿，方差为Welford
+# 增量更新，与VariancePS相同)，极值查稀疏表。窗口超出序列开头的位置为NaN；窗口内
+# 的NaN不参与计算，语义与对应的固定周期函数一致。
+#
+# 耗时：窗口起点单调不减(周期不变或每根K线至多增加1)时pandas逐根增减一个值，
+# 与固定周期相同；周期增加超过1时起点后退，pandas对所有窗口逐个从头累加，
+# 耗时为O(n × 平均周期)。200000根K线上周期在20-60间随机跳动约0.09秒，
+# 200-600间约1秒(固定周期约0.02秒)。极值不受影响。
+# ----------------------------------------------------------------------
+
+@cached_indicator
+def AdaptiveAverage(price, lengths, by_count: bool = False):
+    """
+    按每根K线各自的周期计算简单移动平均(Average)
+    
+    参数:
+        price (pd.Series | np.ndarray): 一维输入序列
+        lengths (Sequence[int]): 每根K线的计算周期，与price等长
+        by_count (bool): False-总和除以周期(同Average)，True-除以窗口内有效值个数(同Series.mean)
+        
+    返回:
+        与price同类型的移动平均序列
+    """
+    lengths, full, count, total, _ = _window_moments(price, lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(count > 0, total / (count if by_count else lengths), np.nan)
+    return _like(price, np.where(full, result, np.nan))
+
+
+@cached_indicator
+def AdaptiveStandardDev(price, lengths, data_type: int = 1):
+    """
+    按每根K线各自的周期计算标准差(StandardDev)
+    
+    参数:
+        price (pd.Series | np.ndarray): 一维输入序列
+        lengths (Sequence[int]): 每根K线的计算周期，与price等长
+        data_type (int): 1-总体标准差, 2-样本标准差
+        
+    返回:
+        与price同类型的标准差序列
+    """
+    lengths, full, count, total, m2 = _window_moments(price, lengths)
+    
+    # 均值按周期长度计算(同VariancePS)：
+    # 离差平方和 = 关于窗口有效值均值的离差平方和 + 个数 × (有效值均值 - length周期均值)²
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sum_squared_diff = np.where(count > 0, m2 + count * (total / count - total / lengths) ** 2, 0.0)
+    sum_squared_diff = np.maximum(sum_squared_diff, 0.0)
+    divisor = lengths if data_type == 1 else lengths - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_ps = sum_squared_diff / divisor
+    result = np.sqrt(np.where(var_ps > 0, var_ps, 0.0))
+    return _like(price, np.where(full, result, np.nan))
+
+
+@cached_indicator
+def AdaptiveHighest(series, lengths):
+    """
+    按每根K线各自的周期计算最高值(Highest/HighestFC)
+    
+    参数:
+        series (pd.Series | np.ndarray): 一维输入序列
+        lengths (Sequence[int]): 每根K线的计算周期，与series等长
+        
+    返回:
+        与series同类型的最高值序列
+    """
+    return _adaptive_extreme(series, lengths, np.fmax)
+
+
+@cached_indicator
+def AdaptiveLowest(series, lengths):
+    """
+    按每根K线各自的周期计算最低值(Lowest/LowestFC)
+    
+    参数:
+        series (pd.Series | np.ndarray): 一维输入序列
+        lengths (Sequence[int]): 每根K线的计算周期，与series等长
+        
+    返回:
+        与series同类型的最低值序列
+    """
+    return _adaptive_extreme(series, lengths, np.fmin)
+
+
+def _adaptive_lengths(series, lengths):
+    """校验周期数组，返回 (周期, 窗口起点, 窗口是否完整)"""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n = len(series)
+    if lengths.shape != (n,):
+        raise ValueError(f"周期数组长度{lengths.shape}与序列长度{n}不一致")
+    if (lengths < 1).any():
+        raise ValueError("周期必须是正整数")
+    starts = np.arange(n) - lengths + 1
+    return lengths, np.maximum(starts, 0), starts >= 0
+
+
+class _LengthIndexer(BaseIndexer):
+    """按每根K线的周期给出滚动窗口边界：第t根K线的窗口为 [max(t-length+1, 0), t]"""
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        return np.maximum(end - self.lengths, 0), end
+
+
+def _window_moments(price, lengths):
+    """
+    各窗口有效值的个数、总和以及关于有效值均值的离差平方和
+
+    不使用整段序列的前缀和之差：序列有趋势时前缀和的量级远大于窗口内的离散程度，
+    相减会损失有效位数；pandas的滚动求和带补偿，滚动方差按窗口做Welford增量更新。
+    窗口起点不单调时pandas对每个窗口重新累加，耗时随周期线性增长(见本节说明)
+    """
+    values = pd.Series(_as_array(price).astype(np.float64))
+    lengths, _, full = _adaptive_lengths(values, lengths)
+    rolling = values.rolling(_LengthIndexer(lengths=lengths), min_periods=1)
+    count = rolling.count().to_numpy()
+    m2 = rolling.var(ddof=0).to_numpy() * count
+    return lengths, full, count, rolling.sum().to_numpy(), m2
+
+
+def _adaptive_extreme(series, lengths, op):
+    values = _as_array(series).astype(np.float64)
+    lengths, starts, full = _adaptive_lengths(values, lengths)
+    if len(values) == 0:
+        return _like(series, values)
+    levels = np.stack(_sparse_levels(values, int(lengths.max()), op))
+    
+    # 长度L的窗口由两段长度2^k(k = floor(log2(L)))的窗口覆盖，分别结束于t和起点+2^k-1
+    k = np.frexp(lengths)[1] - 1
+    stops = np.arange(len(values))
+    result = op(levels[k, stops], levels[k, np.minimum(starts + 2 ** k - 1, stops)])
+    return _like(series, np.where(full, result, np.nan))
+
+
+def _as_pandas(data):
+    """一维/二维数组转换为Series/DataFrame，pandas对象原样返回"""
+    if isinstance(data, (pd.Series, pd.DataFrame)):
+        return data
+    data = np.asarray(data)
+    return pd.Series(data) if data.ndim == 1 else pd.DataFrame(data)
+
+
+def _as_array(data) -> np.ndarray:
+    """取出底层数组"""
+    return data.to_numpy() if isinstance(data, (pd.Series, pd.DataFrame)) else np.asarray(data)
+
+
+def _like(template, values: np.ndarray):
+    """将计算结果包装成与输入相同的类型，Series/DataFrame沿用输入的索引和列"""
+    if isinstance(template, pd.Series):
+        return pd.Series(values, index=template.index, copy=False)
+    if isinstance(template, pd.DataFrame):
+        return pd.DataFrame(values, index=template.index, columns=template.columns, copy=False)
+    return values
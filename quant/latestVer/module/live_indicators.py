@@ -0,0 +1,427 @@
+'''
+逐K线增量更新的指标
+
+实盘中每来一根新K线，indicators 中的函数都要在整段历史上重新计算。这里为常用指标
+提供有状态的增量版本：每个对象只保存窗口内必要的状态，update() 传入一根K线返回
+最新值，耗时与历史长度无关。
+
+为保证与批量版本逐位一致，滚动求和与滚动方差按 pandas 滚动窗口相同的顺序做
+增量更新(先移出窗口外的值、再加入新值，带Kahan补偿)，inf与pandas一样按NaN处理；
+指数平均按 pandas ewm(adjust=False) 的递推公式计算。
+
+snapshot() 返回可pickle的状态字典，restore() 由其恢复出一个新对象，用于实盘进程
+重启或在同一状态上试算。
+'''
+
+import copy
+import math
+from collections import deque
+from typing import Dict
+
+
+# 一次更新后离差平方和只剩约3位有效数字时视为数值不稳定(与pandas滚动方差相同)
+_INV_COND_TOL = 2.0 ** -52 * 1e3
+
+
+class LiveIndicator:
+    """增量指标基类"""
+
+    def update(self, *values) -> float:
+        """传入一根新K线的数据，返回更新后的指标值"""
+        raise NotImplementedError
+
+    @property
+    def value(self) -> float:
+        """最近一次更新后的指标值，尚未更新时为NaN"""
+        return self._value
+
+    def feed(self, *series) -> float:
+        """
+        依次用历史序列更新，用于实盘开始前预热
+
+        参数:
+            *series: 与update参数一一对应的等长序列
+
+        返回:
+            float: 最后一根K线的指标值
+        """
+        for values in zip(*series):
+            self.update(*values)
+        return self._value
+
+    def snapshot(self) -> Dict:
+        """当前状态的深拷贝"""
+        return {'type': type(self).__name__, 'state': copy.deepcopy(self.__dict__)}
+
+    @classmethod
+    def restore(cls, snapshot: Dict) -> 'LiveIndicator':
+        """
+        由snapshot()的结果恢复指标对象
+
+        参数:
+            snapshot (Dict): snapshot()返回的状态
+
+        返回:
+            LiveIndicator: 新的指标对象，与快照时的对象互不影响
+        """
+        if snapshot.get('type') != cls.__name__:
+            raise ValueError(f"快照类型 {snapshot.get('type')} 与 {cls.__name__} 不一致")
+        obj = cls.__new__(cls)
+        obj.__dict__.update(copy.deepcopy(snapshot['state']))
+        return obj
+
+
+class LiveSummation(LiveIndicator):
+    """
+    最近length根K线的总和，对应 Summation
+
+    参数:
+        length (int): 计算周期
+    """
+    def __init__(self, length: int):
+        self.length = int(length)
+        self._window = deque()
+        self._nobs = 0
+        self._sum = 0.0
+        self._comp_add = 0.0
+        self._comp_remove = 0.0
+        # 窗口末尾连续相同值的个数，全部相同时直接用 值 × 个数，避免浮点误差累积
+        self._same = 0
+        self._prev = math.nan
+        self._value = math.nan
+
+    def update(self, value) -> float:
+        value = _prep(value)
+        if not self._window or self.length <= 1:
+            # 第一个窗口(以及周期为1时的每个窗口)从零开始累加
+            self._window.clear()
+            self._nobs, self._sum, self._comp_add, self._comp_remove = 0, 0.0, 0.0, 0.0
+            self._same, self._prev = 0, value
+        elif len(self._window) == self.length:
+            self._remove(self._window.popleft())
+        self._window.append(value)
+        self._add(value)
+
+        if self._nobs == 0:
+            self._value = math.nan
+        elif self._same >= self._nobs:
+            self._value = self._prev * self._nobs
+        else:
+            self._value = self._sum
+        return self._value
+
+    def _add(self, value: float):
+        if value != value:
+            return
+        self._nobs += 1
+        y = value - self._comp_add
+        t = self._sum + y
+        self._comp_add = t - self._sum - y
+        self._sum = t
+        self._same = self._same + 1 if value == self._prev else 1
+        self._prev = value
+
+    def _remove(self, value: float):
+        if value != value:
+            return
+        self._nobs -= 1
+        y = -value - self._comp_remove
+        t = self._sum + y
+        self._comp_remove = t - self._sum - y
+        self._sum = t
+
+
+class LiveAverage(LiveIndicator):
+    """
+    简单移动平均，对应 Average
+
+    参数:
+        length (int): 计算周期
+    """
+    def __init__(self, length: int):
+        self.length = int(length)
+        self._summation = LiveSummation(length)
+        self._value = math.nan
+
+    def update(self, value) -> float:
+        self._value = self._summation.update(value) / self.length
+        return self._value
+
+
+class LiveCountIf(LiveIndicator):
+    """
+    最近length根K线中条件满足的次数，对应 CountIf
+
+    参数:
+        length (int): 计算周期
+    """
+    def __init__(self, length: int):
+        self._summation = LiveSummation(length)
+        self._value = math.nan
+
+    def update(self, condition) -> float:
+        self._value = self._summation.update(1.0 if condition else 0.0)
+        return self._value
+
+
+class LiveXAverage(LiveIndicator):
+    """
+    指数移动平均，对应 XAverage
+
+    参数:
+        length (int): 计算周期
+    """
+    def __init__(self, length: int):
+        self._com = (length - 1) / 2.0
+        self._alpha = 1.0 / (1.0 + self._com)
+        self._decay = 1.0 - self._alpha
+        self._old_weight = 1.0
+        self._started = False
+        self._value = math.nan
+
+    def update(self, value) -> float:
+        value = _prep(value)
+        if not self._started:
+            self._started = True
+            self._value = value
+        elif self._value == self._value:
+            # 缺失值期间旧值的权重继续衰减
+            self._old_weight *= self._decay
+            if value == value:
+                if self._value != value:
+                    # 周期为3时pandas按 1 - 旧权重 计算新值权重
+                    new_weight = 1.0 - self._old_weight if self._com == 1 else self._alpha
+                    self._value = (self._old_weight * self._value + new_weight * value) / (self._old_weight + new_weight)
+                self._old_weight = 1.0
+        elif value == value:
+            self._value = value
+        return self._value
+
+
+class LiveTrueRange(LiveIndicator):
+    """
+    真实波幅，对应 TrueRange，第一根K线为 high - low
+
+    计算保持输入的数值类型(float32输入得到float32结果)，与批量版本一致
+    """
+    def __init__(self):
+        self._prev_close = None
+        self._value = math.nan
+
+    def update(self, high, low, close):
+        if self._prev_close is None:
+            self._value = high - low
+        else:
+            prev_close = self._prev_close
+            true_high = high if high >= prev_close else prev_close
+            true_low = low if low <= prev_close else prev_close
+            self._value = true_high - true_low
+        self._prev_close = close
+        return self._value
+
+
+class LiveAvgTrueRange(LiveIndicator):
+    """
+    平均真实波幅，对应 AvgTrueRange
+
+    参数:
+        length (int): 计算周期
+    """
+    def __init__(self, length: int):
+        self._true_range = LiveTrueRange()
+        self._average = LiveAverage(length)
+        self._value = math.nan
+
+    def update(self, high, low, close) -> float:
+        self._value = self._average.update(self._true_range.update(high, low, close))
+        return self._value
+
+
+class _LiveExtreme(LiveIndicator):
+    """单调队列维护的滚动极值，队首为窗口极值，NaN不入队"""
+    def __init__(self, length: int):
+        self.length = int(length)
+        self._queue = deque()      # (序号, 值)，值单调
+        self._n = 0
+        self._value = math.nan
+
+    def _dominates(self, new: float, old: float) -> bool:
+        raise NotImplementedError
+
+    def update(self, value) -> float:
+        value = _prep(value)
+        queue = self._queue
+        if value == value:
+            while queue and self._dominates(value, queue[-1][1]):
+                queue.pop()
+            queue.append((self._n, value))
+        while queue and queue[0][0] <= self._n - self.length:
+            queue.popleft()
+        self._n += 1
+        self._value = queue[0][1] if queue else math.nan
+        return self._value
+
+
+class LiveHighest(_LiveExtreme):
+    """
+    最近length根K线的最高值，对应 Highest/HighestFC
+
+    参数:
+        length (int): 计算周期
+    """
+    def _dominates(self, new: float, old: float) -> bool:
+        return new >= old
+
+
+class LiveLowest(_LiveExtreme):
+    """
+    最近length根K线的最低值，对应 Lowest/LowestFC
+
+    参数:
+        length (int): 计算周期
+    """
+    def _dominates(self, new: float, old: float) -> bool:
+        return new <= old
+
+
+class LiveVariancePS(LiveIndicator):
+    """
+    估计方差，对应 VariancePS
+
+    窗口内有效值的个数、总和与Welford离差平方和增量更新，再换算为关于length周期
+    均值的离差平方和；前length-1根K线为0。离差平方和在一次更新中损失3位以上
+    有效数字时与pandas一样按窗口重新累加
+
+    参数:
+        length (int): 计算周期
+        data_type (int): 1-总体方差, 2-样本方差
+    """
+    def __init__(self, length: int, data_type: int = 1):
+        self.length = int(length)
+        self.divisor = self.length if data_type == 1 else self.length - 1
+        self._summation = LiveSummation(length)
+        self._window = deque()     # 原始值，count需要把inf计为有效
+        self._count = 0            # 非NaN个数(inf也计入，与pandas的count一致)
+        self._nobs = 0.0
+        self._mean = 0.0
+        self._ssqdm = 0.0
+        self._comp_add = 0.0
+        self._comp_remove = 0.0
+        self._unstable = False
+        self._n = 0
+        self._value = math.nan
+
+    def update(self, value) -> float:
+        raw = float(value)
+        total = self._summation.update(raw)
+        recompute = not self._window or self.length <= 1
+        if recompute:
+            self._window.clear()
+            self._count = 0
+        elif len(self._window) == self.length:
+            old = self._window.popleft()
+            self._count -= old == old
+            self._remove(_prep(old))
+        self._window.append(raw)
+        self._count += raw == raw
+        if not recompute:
+            self._add(_prep(raw))
+        if recompute or self._unstable:
+            self._nobs, self._mean, self._ssqdm, self._comp_add, self._comp_remove = 0.0, 0.0, 0.0, 0.0, 0.0
+            for old in self._window:
+                self._add(_prep(old))
+            self._unstable = False
+        self._n += 1
+
+        if self._n < self.length:
+            self._value = 0.0
+            return self._value
+        count = float(self._count)
+        if count > 0:
+            var = self._ssqdm / self._nobs if self._nobs >= 1 else math.nan
+            diff = total / count - total / self.length
+            sum_squared_diff = var * count + count * (diff * diff)
+        else:
+            sum_squared_diff = 0.0
+        if self.divisor:
+            self._value = sum_squared_diff / self.divisor
+        else:
+            # 周期为1的样本方差：与数组除以0的结果一致
+            self._value = math.copysign(math.inf, sum_squared_diff) if sum_squared_diff > 0 else math.nan
+        return self._value
+
+    def _add(self, value: float):
+        if value != value:
+            return
+        prev_m2 = self._ssqdm
+        self._nobs += 1
+        prev_mean = self._mean - self._comp_add
+        y = value - self._comp_add
+        t = y - self._mean
+        self._comp_add = t + self._mean - y
+        self._mean = self._mean + t / self._nobs
+        self._ssqdm = self._ssqdm + (value - prev_mean) * (value - self._mean)
+        if prev_m2 * _INV_COND_TOL > self._ssqdm:
+            self._unstable = True
+
+    def _remove(self, value: float):
+        if value != value:
+            return
+        prev_m2 = self._ssqdm
+        self._nobs -= 1
+        if self._nobs:
+            prev_mean = self._mean - self._comp_remove
+            y = value - self._comp_remove
+            t = y - self._mean
+            self._comp_remove = t + self._mean - y
+            self._mean = self._mean - t / self._nobs
+            self._ssqdm = self._ssqdm - (value - prev_mean) * (value - self._mean)
+            if prev_m2 * _INV_COND_TOL > self._ssqdm:
+                self._unstable = True
+        else:
+            self._mean = 0.0
+            self._ssqdm = 0.0
+            self._unstable = False
+
+
+class LiveStandardDev(LiveIndicator):
+    """
+    标准差，对应 StandardDev
+
+    参数:
+        length (int): 计算周期
+        data_type (int): 1-总体标准差, 2-样本标准差
+    """
+    def __init__(self, length: int, data_type: int = 1):
+        self._variance = LiveVariancePS(length, data_type)
+        self._value = math.nan
+
+    def update(self, value) -> float:
+        var_ps = self._variance.update(value)
+        self._value = math.sqrt(var_ps) if var_ps > 0 else 0.0
+        return self._value
+
+
+class LiveCum(LiveIndicator):
+    """
+    累计值，对应 Cum，NaN不参与累计且该位置结果为NaN
+
+    累计保持输入的数值类型，与批量版本一致
+    """
+    def __init__(self):
+        self._total = 0
+        self._value = math.nan
+
+    def update(self, value):
+        if value != value:
+            self._value = math.nan
+        else:
+            self._total = self._total + value
+            self._value = self._total
+        return self._value
+
+
+def _prep(value) -> float:
+    """转为float，inf按NaN处理(与pandas滚动窗口的预处理一致)"""
+    value = float(value)
+    return math.nan if math.isinf(value) else value
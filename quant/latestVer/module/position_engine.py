@@ -0,0 +1,241 @@
+'''
+单仓位状态机
+
+多数策略的 generate_signals 都是同一个逐Bar循环：空仓时满足入场条件则开仓，记录入场价、
+持仓Bar数，持仓时依次检查止盈、止损和出场条件。这里把循环本身写成一个公共的内核，
+策略只需按数组预先算好各Bar的入场条件、出场条件和止损价，由内核逐Bar推进仓位。
+内核与indicators中的递推内核一样经_njit包装：安装numba(可选依赖)时编译执行，
+否则按Python循环执行，结果相同。
+
+同一时间最多持有一个仓位；出场的Bar不会重新入场。入场条件可以是整数数组，取值k>0
+表示以第k类规则入场，此时出场条件、止损价和止损距离可以按类别分别给出(第k行对应第k类)，
+用于入场方式不同、出场方式也不同的策略。
+'''
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .indicators import _njit, _as_array
+
+
+# 出场原因
+EXIT_SIGNAL = 1     # 出场条件
+EXIT_STOP = 2       # 止损
+EXIT_TARGET = 3     # 止盈
+EXIT_TIME = 4       # 持仓达到最大Bar数
+
+
+@_njit
+def _position_kernel(high, low, entries, entry_price, exits, stops, stop_offsets, entry_stop, entry_target,
+                     side, min_bars, max_bars, tradable, start, position, bars_out, price_out, reason_out):
+    """各数组的第一维为腿，side、min_bars、max_bars、start为各腿的取值；每根Bar依次推进各腿"""
+    legs = entries.shape[0]
+    pos = np.zeros(legs, dtype=np.int64)
+    bars = np.zeros(legs, dtype=np.int64)
+    row = np.zeros(legs, dtype=np.int64)
+    price = entry_price[:, 0].copy()
+    fixed_stop = price.copy()
+    fixed_target = price.copy()
+    for i in range(start.min(), len(high)):
+        for k in range(legs):
+            if i < start[k]:
+                continue
+            p = pos[k]
+            if p == 0:
+                kind = entries[k, i]
+                if kind > 0:
+                    p = pos[k] = side[k]
+                    bars[k] = 0
+                    row[k] = kind - 1
+                    price[k] = entry_price[k, i]
+                    fixed_stop[k] = entry_stop[k, i]
+                    fixed_target[k] = entry_target[k, i]
+            else:
+                held = bars[k] = bars[k] + 1
+                if held >= min_bars[k] and tradable[k, i]:
+                    reason = 0
+                    r = row[k]
+                    if p > 0:
+                        if high[i] >= fixed_target[k]:
+                            reason = EXIT_TARGET
+                        elif (low[i] <= fixed_stop[k] or low[i] <= stops[k, r, i]
+                              or low[i] <= price[k] - stop_offsets[k, r, i]):
+                            reason = EXIT_STOP
+                    else:
+                        if low[i] <= fixed_target[k]:
+                            reason = EXIT_TARGET
+                        elif (high[i] >= fixed_stop[k] or high[i] >= stops[k, r, i]
+                              or high[i] >= price[k] + stop_offsets[k, r, i]):
+                            reason = EXIT_STOP
+                    if reason == 0 and exits[k, r, i]:
+                        reason = EXIT_SIGNAL
+                    if reason == 0 and 0 < max_bars[k] <= held:
+                        reason = EXIT_TIME
+                    if reason > 0:
+                        p = pos[k] = 0
+                        reason_out[k, i] = reason
+                        bars_out[k, i] = held
+                        price_out[k, i] = price[k]
+            if p != 0:
+                position[k, i] = p
+                bars_out[k, i] = bars[k]
+                price_out[k, i] = price[k]
+
+def run_positions(high, low, entries, entry_price=None, exits=None, stops=None, stop_offsets=None,
+                  entry_stop=None, entry_target=None, side: int = 1, min_bars: int = 1,
+                  max_bars: Optional[int] = None, tradable=None, start: int = 0) -> pd.DataFrame:
+    """
+    逐Bar推进单个仓位
+
+    空仓时entries为真(或k>0)的Bar入场；持仓满min_bars根Bar后，在可交易的Bar上依次检查：
+    止盈(最高价达到entry_target，空头为最低价)、止损(最低价触及entry_stop、stops或
+    入场价 - stop_offsets，空头方向相反)、出场条件exits、持仓Bar数达到max_bars。
+    价格比较遵循逐Bar标量比较的规则，NaN的止损价、止盈价不会触发出场
+
+    参数:
+        high (pd.Series): 最高价序列
+        low (pd.Series): 最低价序列
+        entries (pd.Series): 入场条件，布尔数组或入场类别(0表示不入场)
+        entry_price (pd.Series): 入场价，取入场Bar的值，None表示不记录
+        exits (pd.Series | Sequence): 出场条件(布尔)，或按入场类别给出的多行
+        stops (pd.Series | Sequence): 各Bar的止损价，或按入场类别给出的多行
+        stop_offsets (pd.Series | Sequence): 相对入场价的止损距离，或按入场类别给出的多行
+        entry_stop (pd.Series): 固定止损价，取入场Bar的值
+        entry_target (pd.Series): 固定止盈价，取入场Bar的值
+        side (int): 1-多头, -1-空头
+        min_bars (int): 入场后至少持有的Bar数
+        max_bars (int): 最多持有的Bar数，None表示不限制
+        tradable (pd.Series): 布尔序列，只有为True的Bar才能出场(如成交量大于0)，None表示全部可以
+        start (int): 从第start根Bar开始推进
+
+    返回:
+        pd.DataFrame: Position(每根Bar结束时的仓位，出场Bar为0)、BarsSinceEntry、
+            EntryPrice(持仓及出场Bar上的入场价)、ExitReason(出场Bar的出场原因)
+    """
+    return run_position_legs(high, low, [dict(
+        entries=entries, entry_price=entry_price, exits=exits, stops=stops, stop_offsets=stop_offsets,
+        entry_stop=entry_stop, entry_target=entry_target, side=side, min_bars=min_bars,
+        max_bars=max_bars, tradable=tradable, start=start)])[0]
+
+
+def run_position_legs(high, low, legs: List[Dict]) -> List[pd.DataFrame]:
+    """
+    在同一次逐Bar循环中推进多条互不影响的仓位(如同一系统的多头和空头)
+
+    每根Bar依次推进各腿，各腿的结果与分别调用run_positions相同；各腿的价格统一转为
+    所有腿的输入中精度最高的浮点类型
+
+    参数:
+        high (pd.Series): 最高价序列
+        low (pd.Series): 最低价序列
+        legs (List[Dict]): 每条腿传给run_positions的参数(entries及出场规则，不含high、low)
+
+    返回:
+        List[pd.DataFrame]: 每条腿的结果，列同run_positions
+    """
+    n = len(high)
+    legs = [dict(_LEG_DEFAULTS, **leg) for leg in legs]
+    for leg in legs:
+        if leg['side'] not in (1, -1):
+            raise ValueError(f"side必须是1(多头)或-1(空头)，而不是{leg['side']}")
+    kinds = [_entry_kinds(leg['entries']) for leg in legs]
+    # 入场类别数取按类别给出的行数，与实际出现的最大类别中的较大者
+    rows = max(max([int(k.max()) if n else 0, 1,
+                    *[len(leg[name]) for name in ('exits', 'stops', 'stop_offsets')
+                      if isinstance(leg[name], (list, tuple))]]) for k, leg in zip(kinds, legs))
+
+    # 价格统一转为所有输入中精度最高的浮点类型，与逐Bar标量运算的类型提升一致
+    level_rows = [v for leg in legs for rule in (leg['stops'], leg['stop_offsets']) if rule is not None
+                  for v in (rule if isinstance(rule, (list, tuple)) else [rule]) if v is not None]
+    prices = [leg[name] for leg in legs for name in ('entry_price', 'entry_stop', 'entry_target')]
+    dtype = np.result_type(*[_as_array(v).dtype for v in (high, low, *prices, *level_rows) if v is not None],
+                           np.float32)
+    h, l = _float_arrays(n, dtype, high, low)
+    price, fixed_stop, target = (np.stack([_float_arrays(n, dtype, leg[name])[0] for leg in legs])
+                                 for name in ('entry_price', 'entry_stop', 'entry_target'))
+    stop_rows = np.stack([_kind_rows(leg['stops'], rows, n, dtype, np.nan) for leg in legs])
+    offset_rows = np.stack([_kind_rows(leg['stop_offsets'], rows, n, dtype, np.nan) for leg in legs])
+    exit_rows = np.stack([_kind_rows(leg['exits'], rows, n, bool, False) for leg in legs])
+    can_exit = np.stack([np.ones(n, dtype=bool) if leg['tradable'] is None else _as_array(leg['tradable']).astype(bool)
+                         for leg in legs])
+
+    shape = (len(legs), n)
+    position = np.zeros(shape, dtype=np.int8)
+    bars = np.zeros(shape, dtype=np.int64)
+    entry_prices = np.full(shape, np.nan, dtype=dtype)
+    reasons = np.zeros(shape, dtype=np.int8)
+    if n:
+        _position_kernel(h, l, np.stack(kinds), price, exit_rows, stop_rows, offset_rows, fixed_stop, target,
+                         *(np.array([int(leg[name] or 0) for leg in legs], dtype=np.int64)
+                           for name in ('side', 'min_bars', 'max_bars')),
+                         can_exit, np.array([int(leg['start']) for leg in legs], dtype=np.int64),
+                         position, bars, entry_prices, reasons)
+    index = high.index if isinstance(high, pd.Series) else None
+    return [pd.DataFrame({
+        'Position': position[k], 'BarsSinceEntry': bars[k], 'EntryPrice': entry_prices[k], 'ExitReason': reasons[k],
+    }, index=index) for k in range(len(legs))]
+
+
+# run_positions中出场规则的默认值
+_LEG_DEFAULTS = dict(entry_price=None, exits=None, stops=None, stop_offsets=None, entry_stop=None,
+                     entry_target=None, side=1, min_bars=1, max_bars=None, tradable=None, start=0)
+
+
+def _entry_kinds(entries) -> np.ndarray:
+    """入场条件转为入场类别(int64)，布尔值True为第1类"""
+    kinds = _as_array(entries)
+    return kinds.astype(np.int64) if kinds.dtype.kind in 'iu' else kinds.astype(bool).astype(np.int64)
+
+
+def position_calls(position, exit_reason=None, exit_call: float = 0,
+                   silent_exits: Iterable[int] = (), close_at_end: bool = True) -> np.ndarray:
+    """
+    由逐Bar仓位得到信号矩阵的call列
+
+    仓位变为非零值(开仓或反手)的Bar记为新仓位，变为0的Bar记为exit_call，其余为NaN；
+    最后一根Bar仍有持仓时强制平仓
+
+    参数:
+        position (pd.Series | np.ndarray): 每根Bar结束时的仓位
+        exit_reason (pd.Series | np.ndarray): 出场原因，与silent_exits配合使用
+        exit_call (float): 平仓信号的取值
+        silent_exits (Iterable[int]): 这些原因的出场只改变仓位，不产生信号
+        close_at_end (bool): 是否在最后一根Bar强制平仓
+
+    返回:
+        np.ndarray: call列(float64)
+    """
+    position = _as_array(position).astype(np.int64)
+    calls = np.full(len(position), np.nan)
+    if not len(position):
+        return calls
+    prev = np.concatenate(([0], position[:-1]))
+    opened = (position != prev) & (position != 0)
+    closed = (position != prev) & (position == 0)
+    if exit_reason is not None and silent_exits:
+        closed &= ~np.isin(_as_array(exit_reason), list(silent_exits))
+    calls[opened] = position[opened]
+    calls[closed] = exit_call
+    if close_at_end and position[-1] != 0:
+        calls[-1] = exit_call
+    return calls
+
+
+def _float_arrays(n: int, dtype, *arrays):
+    """转为dtype类型的数组，None转为全NaN"""
+    return [np.full(n, np.nan, dtype=dtype) if x is None else _as_array(x).astype(dtype, copy=False)
+            for x in arrays]
+
+
+def _kind_rows(values, rows: int, n: int, dtype, fill) -> np.ndarray:
+    """整理为 (入场类别 × Bar) 的二维数组，一维输入对所有类别通用"""
+    if values is None:
+        return np.full((rows, n), fill, dtype=dtype)
+    if isinstance(values, (list, tuple)):
+        if len(values) != rows:
+            raise ValueError(f"按入场类别给出的数组有{len(values)}行，入场类别有{rows}种")
+        return np.stack([np.full(n, fill, dtype=dtype) if v is None else _as_array(v).astype(dtype)
+                         for v in values])
+    return np.broadcast_to(_as_array(values).astype(dtype), (rows, n))
@@ -0,0 +1,112 @@
+'''
+由最细级别(min5)K线合成粗级别K线
+
+按交易时段合成：分钟级别K线以每个连续交易时段(含夜盘)的开盘时间为锚点切分，
+不会跨越午休、小节休息或日夜盘之间的间隔；日线按交易日合成，夜盘归属下一个交易日。
+
+与行情软件直接提供的min30/min60K线不逐根一致：常见软件按交易分钟累计切分，K线会跨过
+小节休息(如min30的10:00-10:45)；这里在休息处截断，时段末尾会出现不足一个周期的短K线
+(如min30、min60的10:00-10:15，min60的14:30-15:00)。基于合成K线的回测结果与使用软件
+K线的结果因此会有差异，日线不受影响。
+'''
+
+from typing import Dict
+import numpy as np
+import pandas as pd
+
+
+BASE_LEVEL = 'min5'
+
+LEVEL_MINUTES = {
+    'min5': 5,
+    'min15': 15,
+    'min30': 30,
+    'min60': 60,
+}
+
+# 夜盘(21:00起，最晚次日02:30)加上该偏移后落入下一个自然日，再顺延到工作日即为所属交易日
+NIGHT_SESSION_SHIFT = pd.Timedelta(hours=6)
+
+# 各字段的合成方式：开盘取首个、最高取最大、最低取最小、收盘取末个、成交量求和
+AGGREGATIONS = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'vol': 'sum',
+}
+
+
+def trading_days(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    计算每根K线所属的交易日
+
+    夜盘K线归属下一个交易日，周五夜盘(含跨过零点的部分)归属下周一
+
+    参数:
+        index (pd.DatetimeIndex): K线时间索引
+
+    返回:
+        np.ndarray: datetime64[D] 交易日数组
+    """
+    shifted = np.asarray(index + NIGHT_SESSION_SHIFT, dtype='datetime64[D]')
+    return np.busday_offset(shifted, 0, roll='forward')
+
+
+def session_bar_keys(index: pd.DatetimeIndex, minutes: int) -> np.ndarray:
+    """
+    计算每根基础K线所属的粗级别K线起始时间
+
+    相邻K线间隔超过基础周期的1.5倍视为新的交易时段，在时段内从开盘时间起
+    每minutes分钟切分一根K线，时段末尾不足minutes分钟的部分单独成为一根K线
+
+    参数:
+        index (pd.DatetimeIndex): 基础K线时间索引(升序)
+        minutes (int): 目标周期分钟数
+
+    返回:
+        np.ndarray: datetime64[ns] 分组键
+    """
+    stamps = np.asarray(index, dtype='datetime64[ns]').view(np.int64)
+    if len(stamps) == 0:
+        return stamps.view('datetime64[ns]')
+    gaps = np.diff(stamps)
+    base_step = np.median(gaps) if len(gaps) else 0
+    new_session = np.concatenate(([True], gaps > 1.5 * base_step))
+    # 每根K线所在时段的开盘时间
+    session_start = stamps[np.flatnonzero(new_session)][np.cumsum(new_session) - 1]
+    step = np.int64(minutes) * 60 * 10**9
+    keys = session_start + (stamps - session_start) // step * step
+    return keys.view('datetime64[ns]')
+
+
+def resample_bars(frames: Dict[str, pd.DataFrame], level: str) -> Dict[str, pd.DataFrame]:
+    """
+    将基础级别的宽表合成为目标级别
+
+    参数:
+        frames (Dict[str, pd.DataFrame]): 字段名 -> (时间 × 品种) 基础级别宽表，时间轴一致
+        level (str): 目标级别，min15/min30/min60/day
+
+    返回:
+        Dict[str, pd.DataFrame]: 字段名 -> 目标级别宽表
+    """
+    index = frames['open'].index
+    if level == 'day':
+        keys = trading_days(index).astype('datetime64[ns]')
+    elif level in LEVEL_MINUTES:
+        keys = session_bar_keys(index, LEVEL_MINUTES[level])
+    else:
+        raise ValueError(f"不支持的级别: {level}")
+
+    keys = pd.DatetimeIndex(keys, name=index.name)
+    resampled = {}
+    for field, df in frames.items():
+        grouped = df.groupby(keys, sort=False)
+        if AGGREGATIONS[field] == 'sum':
+            # 整根K线全部缺失时保持NaN，而不是0
+            out = grouped.sum(min_count=1)
+        else:
+            out = getattr(grouped, AGGREGATIONS[field])()
+        resampled[field] = out.astype(np.float32)
+    return resampled
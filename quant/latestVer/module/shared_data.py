@@ -0,0 +1,84 @@
+'''
+多进程共享内存数据发布
+
+主进程把数组一次性写入 multiprocessing.shared_memory，子进程只接收
+(名称, 形状, 数据类型) 描述符并按需映射，避免Pool.map逐个任务序列化大数组。
+'''
+
+from typing import Dict, List, Tuple
+from multiprocessing import shared_memory
+import numpy as np
+
+
+# 共享数组描述符：(共享内存名称, 形状, 数据类型字符串)
+SharedArraySpec = Tuple[str, Tuple[int, ...], str]
+
+
+class SharedArrays:
+    """
+    一组共享内存数组的发布者
+
+    用法:
+        with SharedArrays() as shared:
+            specs = {'close': shared.publish(close)}
+            pool.map(worker, [(specs, ...)])
+
+    退出上下文时释放全部共享内存。
+    """
+    def __init__(self):
+        self._blocks: List[shared_memory.SharedMemory] = []
+
+    def publish(self, arr: np.ndarray) -> SharedArraySpec:
+        """将数组复制到新的共享内存块，返回描述符"""
+        arr = np.ascontiguousarray(arr)
+        spec, view = self._allocate(arr.shape, arr.dtype)
+        view[...] = arr
+        return spec
+
+    def allocate(self, shape: Tuple[int, ...], dtype, fill_value=0) -> Tuple[SharedArraySpec, np.ndarray]:
+        """分配新的共享内存数组(用于子进程写回结果)，返回描述符和主进程中的视图"""
+        spec, view = self._allocate(tuple(shape), np.dtype(dtype))
+        view[...] = fill_value
+        return spec, view
+
+    def _allocate(self, shape, dtype) -> Tuple[SharedArraySpec, np.ndarray]:
+        nbytes = max(1, int(np.prod(shape)) * dtype.itemsize)
+        block = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._blocks.append(block)
+        view = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        return (block.name, tuple(int(n) for n in shape), dtype.str), view
+
+    def close(self):
+        """释放全部共享内存块"""
+        for block in self._blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def attach_arrays(specs: Dict[str, SharedArraySpec]) -> Tuple[Dict[str, np.ndarray], List[shared_memory.SharedMemory]]:
+    """
+    在子进程中按描述符映射共享内存数组
+
+    参数:
+        specs (Dict[str, SharedArraySpec]): 名称 -> 描述符
+
+    返回:
+        Tuple[Dict[str, np.ndarray], List[SharedMemory]]: 数组视图及对应的共享内存句柄，
+        使用完毕后需对句柄调用close()
+    """
+    arrays, blocks = {}, []
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return arrays, blocks
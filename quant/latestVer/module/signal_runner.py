@@ -0,0 +1,130 @@
+'''
+多品种信号并行计算
+
+各品种的指标与信号互不依赖，按品种分发到进程池计算。品种的计算量大致与K线数成正比，
+min5等长序列的品种如果和其他品种随意分组，最后会只剩一两个进程在跑；这里先按K线数从大到小
+把品种分配到当前负载最小的任务组(LPT)，任务组数取进程数的若干倍，再按负载从大到小提交，
+长序列品种最先开始，短序列品种填补其余进程的空闲。
+'''
+
+from typing import Dict, List, Optional, Tuple
+import heapq
+import logging
+import os
+from multiprocessing import Pool
+
+import pandas as pd
+
+from .data_loader import trim_warmup
+
+
+# 每个进程平均分到的任务组数，大于1时进程池可以动态平衡各组耗时的误差
+CHUNKS_PER_PROCESS = 4
+
+
+def _symbol_signals(strategy, data: pd.DataFrame, start_date: Optional[str]) -> Optional[pd.DataFrame]:
+    """计算单个品种的信号，无有效信号时返回None"""
+    data_with_indicators = strategy.calculate_indicators(data)
+    signals = strategy.generate_signals(data_with_indicators)
+    if start_date is not None and isinstance(signals, pd.DataFrame) and len(signals) > 0:
+        signals = trim_warmup(signals, start_date)
+    if isinstance(signals, pd.DataFrame) and len(signals) > 0:
+        return signals
+    return None
+
+
+def _empty_reason(strategy, data: pd.DataFrame, start_date: Optional[str]) -> str:
+    """品种没有有效信号的原因，用于日志"""
+    if len(data) == 0:
+        return "没有行情数据"
+    if start_date is not None and data.index[-1] < pd.Timestamp(start_date):
+        return f"全部K线早于起始日期{start_date}"
+    lookback = strategy.get_lookback()
+    if len(data) <= lookback:
+        return f"K线数{len(data)}不超过指标回溯{lookback}"
+    return "策略在该品种上没有产生信号"
+
+
+def _signal_chunk(args) -> List[Tuple[str, Optional[pd.DataFrame], Optional[str]]]:
+    """子进程处理一个任务组，返回 (品种, 信号, 错误信息) 列表"""
+    strategy, tasks, start_date = args
+    results = []
+    for code, data in tasks:
+        try:
+            results.append((code, _symbol_signals(strategy, data, start_date), None))
+        except Exception as e:
+            results.append((code, None, str(e)))
+    return results
+
+
+def balance_chunks(costs: Dict[str, float], n_chunks: int) -> List[List[str]]:
+    """
+    按计算量把品种分为负载均衡的任务组
+
+    参数:
+        costs (Dict[str, float]): 品种 -> 计算量(如K线数)
+        n_chunks (int): 任务组数
+
+    返回:
+        List[List[str]]: 按总计算量从大到小排列的任务组，组内品种按计算量从大到小排列
+    """
+    n_chunks = max(1, min(n_chunks, len(costs)))
+    heap = [(0.0, i) for i in range(n_chunks)]
+    chunks: List[List[str]] = [[] for _ in range(n_chunks)]
+    loads = [0.0] * n_chunks
+    for code in sorted(costs, key=lambda c: -costs[c]):
+        load, i = heapq.heappop(heap)
+        chunks[i].append(code)
+        loads[i] = load + costs[code]
+        heapq.heappush(heap, (loads[i], i))
+    order = sorted(range(n_chunks), key=lambda i: -loads[i])
+    return [chunks[i] for i in order if chunks[i]]
+
+
+def compute_signals(strategy, data_dict: Dict[str, pd.DataFrame], logger: logging.Logger,
+                    start_date: Optional[str] = None, use_multiprocessing: bool = True,
+                    processes: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    计算所有品种的信号
+
+    单个品种出错时记录日志并跳过，不影响其他品种；没有有效信号(数据过短、全部早于
+    start_date等)的品种记录警告及原因后跳过
+
+    参数:
+        strategy (StrategyBase): 策略实例，多进程时会复制到各子进程
+        data_dict (Dict[str, pd.DataFrame]): 品种 -> 行情数据
+        logger (logging.Logger): 日志记录器
+        start_date (str): 给出时剔除信号中该日期之前的预热K线
+        use_multiprocessing (bool): 是否使用进程池
+        processes (int): 进程数，默认为CPU核数
+
+    返回:
+        Dict[str, pd.DataFrame]: 品种 -> 信号矩阵，按data_dict的品种顺序排列，
+        不含出错或没有有效信号的品种
+    """
+    processes = processes or os.cpu_count() or 1
+    if use_multiprocessing and processes > 1 and len(data_dict) > 1:
+        costs = {code: len(data) for code, data in data_dict.items()}
+        chunks = balance_chunks(costs, processes * CHUNKS_PER_PROCESS)
+        logger.info(f"开始并行计算{len(data_dict)}个品种的信号，共{len(chunks)}个任务组")
+        with Pool(min(processes, len(chunks))) as pool:
+            results = [item for chunk in pool.imap_unordered(
+                           _signal_chunk,
+                           [(strategy, [(code, data_dict[code]) for code in chunk], start_date) for chunk in chunks])
+                       for item in chunk]
+    else:
+        results = _signal_chunk((strategy, list(data_dict.items()), start_date))
+
+    by_code = {code: (signals, error) for code, signals, error in results}
+    signals_dict = {}
+    for code, data in data_dict.items():
+        signals, error = by_code[code]
+        if error is not None:
+            logger.error(f"计算{code}信号时出错: {error}")
+        elif signals is None:
+            logger.warning(f"{code}没有有效信号，不参与回测: {_empty_reason(strategy, data, start_date)}")
+        else:
+            signals_dict[code] = signals
+    if len(signals_dict) < len(data_dict):
+        logger.info(f"共{len(data_dict)}个品种，{len(signals_dict)}个品种得到有效信号")
+    return signals_dict
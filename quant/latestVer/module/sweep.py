@@ -0,0 +1,236 @@
+'''
+参数扫描
+
+对一个策略类按参数网格或随机抽样得到的多组参数，在多个品种上分别计算信号和盈亏，
+逐组输出结果表。
+
+- 各品种的行情数据按列拼接后一次性发布到共享内存，子进程按偏移量取出所需品种，
+  不随任务重复序列化
+- 任务按 (品种, 一段连续的参数组) 划分，同一子进程内连续计算同一品种的多组参数；
+  子进程开启指标缓存，不随被扫描参数变化的指标(相同函数、参数和输入)只计算一次，
+  提供磁盘缓存目录时后续扫描还可以复用。每个任务把品种数据登记到indicator_inputs，
+  缓存键中的输入摘要按数组只计算一次，命中的开销约为重新计算Average等简单指标的1/4
+- 任务按计算量(K线数 × 参数组数)从大到小提交，完成一个任务即写出其结果
+'''
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import itertools
+import logging
+import math
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from .backtest import Backtester
+from .config import FUTURES_PARAMS
+from .data_loader import trim_warmup
+from .indicators import enable_indicator_cache, indicator_cache_scope, indicator_inputs
+from .shared_data import SharedArrays, attach_arrays
+from .signal_runner import CHUNKS_PER_PROCESS
+
+
+# 每组参数在每个品种上的结果指标
+SWEEP_METRICS = ['pnl', 'trades', 'max_drawdown', 'exposure']
+
+
+def param_grid(grid: Dict[str, Iterable]) -> List[Dict]:
+    """
+    参数网格的全部组合
+
+    参数:
+        grid (Dict[str, Iterable]): 参数名 -> 候选值
+
+    返回:
+        List[Dict]: 参数组列表，最后一个参数变化最快
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(list(grid[k]) for k in keys))]
+
+
+def param_sample(space: Dict[str, Any], n: int, seed: Optional[int] = None) -> List[Dict]:
+    """
+    随机抽样参数组
+
+    参数:
+        space (Dict[str, Any]): 参数名 -> 取值范围；list/range 表示从候选值中等概率抽取，
+            (low, high) 元组表示区间内均匀抽取(两端均为整数时抽取整数，包含high)
+        n (int): 参数组数，可能的组合不足n个时全部返回
+        seed (int): 随机种子
+
+    返回:
+        List[Dict]: 互不相同的参数组列表
+    """
+    rng = np.random.default_rng(seed)
+
+    def draw(spec):
+        if isinstance(spec, tuple):
+            low, high = spec
+            if isinstance(low, (int, np.integer)) and isinstance(high, (int, np.integer)):
+                return int(rng.integers(low, high + 1))
+            return float(rng.uniform(low, high))
+        values = list(spec)
+        return values[int(rng.integers(len(values)))]
+
+    samples, seen = [], set()
+    for _ in range(n * 20):
+        params = {key: draw(spec) for key, spec in space.items()}
+        key = tuple(params.items())
+        if key not in seen:
+            seen.add(key)
+            samples.append(params)
+            if len(samples) == n:
+                break
+    return samples
+
+
+def _run_metrics(call: np.ndarray, open_arr: np.ndarray, close_arr: np.ndarray,
+                 contract_multiplier: float) -> Dict[str, float]:
+    """由信号计算单次运行的盈亏指标，盈亏规则与Backtester一致"""
+    pnl = Backtester._pnl_from_arrays(call, open_arr, close_arr, contract_multiplier)
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0)) if len(equity) else equity
+    position = pd.Series(call).ffill().fillna(0).to_numpy()
+    prev = np.concatenate(([0.0], position[:-1]))
+    return {
+        'pnl': float(equity[-1]) if len(equity) else 0.0,
+        'trades': int(np.count_nonzero((position != prev) & (position != 0))),
+        'max_drawdown': float(np.max(peak - equity)) if len(equity) else 0.0,
+        'exposure': float(np.mean(position != 0)) if len(position) else 0.0,
+    }
+
+
+def _sweep_symbol(strategy_cls, code: str, data: pd.DataFrame, runs: List[Tuple[int, Dict]],
+                  start_date: Optional[str]) -> List[Tuple[int, str, Optional[Dict], Optional[str]]]:
+    """在一个品种上依次运行多组参数，返回 (序号, 品种, 指标, 错误信息) 列表"""
+    market = trim_warmup(data, start_date) if start_date is not None else data
+    open_arr = market['open'].to_numpy(dtype=np.float64)
+    close_arr = market['close'].to_numpy(dtype=np.float64)
+    multiplier = FUTURES_PARAMS[code]['contract_multiplier']
+    results = []
+    with indicator_inputs(data):
+        for run, params in runs:
+            try:
+                strategy = strategy_cls(dict(params))
+                signals = strategy.generate_signals(strategy.calculate_indicators(data))
+                if isinstance(signals, pd.DataFrame) and 'call' in signals and len(signals) > 0:
+                    if start_date is not None:
+                        signals = trim_warmup(signals, start_date)
+                    call = signals['call'].reindex(market.index).to_numpy(dtype=np.float64)
+                else:
+                    call = np.full(len(market), np.nan)
+                results.append((run, code, _run_metrics(call, open_arr, close_arr, multiplier), None))
+            except Exception as e:
+                results.append((run, code, None, str(e)))
+    return results
+
+
+def _sweep_task(args):
+    """子进程任务：从共享内存取出品种数据后运行一段参数组"""
+    strategy_cls, code, pos, runs, specs, columns, start_date = args
+    arrays, blocks = attach_arrays(specs)
+    try:
+        lo, hi = int(arrays['offsets'][pos]), int(arrays['offsets'][pos + 1])
+        data = pd.DataFrame({c: arrays[f'col:{c}'][lo:hi].copy() for c in columns},
+                            index=pd.Index(arrays['index'][lo:hi].copy()))
+    finally:
+        arrays = None
+        for block in blocks:
+            block.close()
+    return _sweep_symbol(strategy_cls, code, data, runs, start_date)
+
+
+def _publish_frames(shared: SharedArrays, data_dict: Dict[str, pd.DataFrame], columns: List[str]) -> Dict:
+    """将各品种数据按列拼接后发布到共享内存，offsets[k]:offsets[k+1] 为第k个品种的行"""
+    frames = list(data_dict.values())
+    offsets = np.concatenate(([0], np.cumsum([len(df) for df in frames]))).astype(np.int64)
+    specs = {
+        'offsets': shared.publish(offsets),
+        'index': shared.publish(np.concatenate([df.index.to_numpy() for df in frames])),
+    }
+    for c in columns:
+        specs[f'col:{c}'] = shared.publish(np.concatenate([df[c].to_numpy() for df in frames]))
+    return specs
+
+
+def run_sweep(strategy_cls, param_sets: List[Dict], data_dict: Dict[str, pd.DataFrame],
+              logger: logging.Logger, start_date: Optional[str] = None, output_path: Optional[str] = None,
+              use_multiprocessing: bool = True, processes: Optional[int] = None,
+              cache_memory_mb: float = 256, cache_dir: Optional[str] = None,
+              cache_disk_mb: Optional[float] = 2048) -> pd.DataFrame:
+    """
+    参数扫描
+
+    参数:
+        strategy_cls (type): 策略类，以 strategy_cls(params) 构造
+        param_sets (List[Dict]): 参数组列表，见 param_grid / param_sample
+        data_dict (Dict[str, pd.DataFrame]): 品种 -> 行情数据(应包含最长回溯所需的预热K线)
+        logger (logging.Logger): 日志记录器
+        start_date (str): 给出时剔除该日期之前的预热K线后再统计盈亏
+        output_path (str): 结果CSV路径，每完成一个任务追加写入
+        use_multiprocessing (bool): 是否使用进程池
+        processes (int): 进程数，默认为CPU核数
+        cache_memory_mb (float): 每个进程的指标缓存上限(MB)
+        cache_dir (str): 指标磁盘缓存目录，None表示只使用内存缓存
+        cache_disk_mb (float): 指标磁盘缓存上限(MB)，None表示不限制
+
+    返回:
+        pd.DataFrame: 每组参数在每个品种上一行：run(参数组序号)、code、各参数、
+        pnl(总盈亏)、trades(开仓次数)、max_drawdown(最大回撤)、exposure(持仓K线占比)
+    """
+    missing = [code for code in data_dict if code not in FUTURES_PARAMS]
+    if missing:
+        logger.error(f"以下品种没有合约参数，不参与扫描: {missing}")
+    data_dict = {code: data for code, data in data_dict.items() if code not in missing}
+    codes = list(data_dict)
+    param_keys = list(dict.fromkeys(key for params in param_sets for key in params))
+    columns = ['run', 'code'] + param_keys + SWEEP_METRICS
+    runs = list(enumerate(param_sets))
+    processes = processes or os.cpu_count() or 1
+
+    rows = []
+    written = False
+
+    def collect(results):
+        nonlocal written
+        new_rows = []
+        for run, code, metrics, error in results:
+            if error is not None:
+                logger.error(f"参数组{run}在{code}上运行出错: {error}")
+                continue
+            new_rows.append({'run': run, 'code': code, **param_sets[run], **metrics})
+        if output_path and new_rows:
+            pd.DataFrame(new_rows, columns=columns).to_csv(output_path, mode='a' if written else 'w',
+                                                           header=not written, index=False)
+            written = True
+        rows.extend(new_rows)
+
+    if not codes or not runs:
+        return pd.DataFrame(columns=columns)
+
+    logger.info(f"开始参数扫描: {len(runs)}组参数 × {len(codes)}个品种")
+    if use_multiprocessing and processes > 1:
+        # 每个品种的参数组切成若干段，使任务数约为进程数的CHUNKS_PER_PROCESS倍
+        parts = max(1, min(len(runs), math.ceil(processes * CHUNKS_PER_PROCESS / len(codes))))
+        size = math.ceil(len(runs) / parts)
+        frame_columns = list(data_dict[codes[0]].columns)
+        with SharedArrays() as shared:
+            specs = _publish_frames(shared, data_dict, frame_columns)
+            tasks = [(strategy_cls, code, pos, runs[i:i + size], specs, frame_columns, start_date)
+                     for pos, code in enumerate(codes) for i in range(0, len(runs), size)]
+            tasks.sort(key=lambda task: -len(data_dict[task[1]]) * len(task[3]))
+            with Pool(min(processes, len(tasks)), initializer=enable_indicator_cache,
+                      initargs=(cache_memory_mb, cache_dir, cache_disk_mb)) as pool:
+                for done, results in enumerate(pool.imap_unordered(_sweep_task, tasks), 1):
+                    collect(results)
+                    if done % max(1, len(tasks) // 10) == 0 or done == len(tasks):
+                        logger.info(f"参数扫描进度: {done}/{len(tasks)}")
+    else:
+        with indicator_cache_scope(cache_memory_mb, cache_dir, cache_disk_mb):
+            for code in codes:
+                collect(_sweep_symbol(strategy_cls, code, data_dict[code], runs, start_date))
+
+    order = {code: i for i, code in enumerate(codes)}
+    rows.sort(key=lambda row: (row['run'], order[row['code']]))
+    return pd.DataFrame(rows, columns=columns)
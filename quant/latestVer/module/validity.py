@@ -0,0 +1,218 @@
+'''
+品种有效性索引
+
+在数据写入存储时一次性记录每个品种的首根/末根有效K线、中间缺失段以及按位压缩的
+有效性位图，之后筛选品种、按日期区间取有效K线和计算预热起点都只需访问该品种的
+位图，不必在整个 (时间 × 品种) 矩阵上重复做isnan扫描。
+'''
+
+import os
+from typing import Tuple
+import numpy as np
+
+
+# 分块构建索引时每块的行数(须为8的倍数)
+VALIDITY_BLOCK_ROWS = 1 << 16
+
+# 每个字节中置位的个数
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+class ValidityIndex:
+    """
+    (时间 × 品种) 有效性索引
+
+    属性:
+        n_rows: 已索引的行数
+        bits: (品种 × ceil(行数/8)) uint8，每个品种沿时间轴按位压缩的有效性位图
+        first/last: 每个品种首根/末根有效K线所在行，没有有效K线时为-1
+        count: 每个品种的有效K线数
+        gap_ptr/gap_start/gap_stop: 按CSR排列的中间缺失段 [gap_start, gap_stop)，
+            只记录首末有效K线之间的缺失，品种s的缺失段位于 gap_ptr[s]:gap_ptr[s+1]
+    """
+    def __init__(self, n_rows: int, bits: np.ndarray, first: np.ndarray, last: np.ndarray,
+                 count: np.ndarray, gap_ptr: np.ndarray, gap_start: np.ndarray, gap_stop: np.ndarray):
+        self.n_rows = int(n_rows)
+        self.bits = bits
+        self.first = first
+        self.last = last
+        self.count = count
+        self.gap_ptr = gap_ptr
+        self.gap_start = gap_start
+        self.gap_stop = gap_stop
+
+    @property
+    def n_symbols(self) -> int:
+        return len(self.first)
+
+    # ------------------------------------------------------------------
+    # 构建与持久化
+    # ------------------------------------------------------------------
+    @classmethod
+    def empty(cls, n_symbols: int) -> 'ValidityIndex':
+        """没有任何行的索引"""
+        return cls(
+            0,
+            np.zeros((n_symbols, 0), dtype=np.uint8),
+            np.full(n_symbols, -1, dtype=np.int64),
+            np.full(n_symbols, -1, dtype=np.int64),
+            np.zeros(n_symbols, dtype=np.int64),
+            np.zeros(n_symbols + 1, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> 'ValidityIndex':
+        """
+        由 (时间 × 品种) 数据建立索引，NaN表示无效K线
+
+        按行分块处理，可以直接传入内存映射数组而不把整个字段载入内存
+        """
+        index = cls.empty(values.shape[1])
+        for start in range(0, values.shape[0], VALIDITY_BLOCK_ROWS):
+            index.extend(~np.isnan(values[start:start + VALIDITY_BLOCK_ROWS]))
+        return index
+
+    def extend(self, mask: np.ndarray):
+        """
+        在索引末尾追加新的行
+
+        参数:
+            mask (np.ndarray): (新增行数 × 品种) 布尔数组，True表示有效K线
+        """
+        n_new, n_symbols = mask.shape
+        if n_symbols != self.n_symbols:
+            raise ValueError(f"品种数不一致: 索引为{self.n_symbols}，新增数据为{n_symbols}")
+        if n_new == 0:
+            return
+        old_rows = self.n_rows
+
+        # 位图：上一次末尾不满一个字节的位与新数据合并后重新压缩
+        tail = old_rows % 8
+        if tail:
+            carried = np.unpackbits(self.bits[:, -1:], axis=1)[:, :tail].astype(bool)
+            packed = np.packbits(np.concatenate([carried, mask.T], axis=1), axis=1)
+            self.bits = np.concatenate([self.bits[:, :-1], packed], axis=1)
+        else:
+            self.bits = np.concatenate([self.bits, np.packbits(mask.T, axis=1)], axis=1)
+
+        has_new = mask.any(axis=0)
+        first_new = np.argmax(mask, axis=0)
+        last_new = n_new - 1 - np.argmax(mask[::-1], axis=0)
+
+        # 缺失段：保留原有的，加上上次末根有效K线到本次首根有效K线之间的缺失和新数据内部的缺失
+        starts, stops, sizes = [], [], np.zeros(n_symbols, dtype=np.int64)
+        for s in range(n_symbols):
+            lo, hi = self.gap_ptr[s], self.gap_ptr[s + 1]
+            parts_start, parts_stop = [self.gap_start[lo:hi]], [self.gap_stop[lo:hi]]
+            if has_new[s]:
+                begin = old_rows + int(first_new[s])
+                if self.last[s] >= 0 and begin > self.last[s] + 1:
+                    parts_start.append(np.array([self.last[s] + 1], dtype=np.int64))
+                    parts_stop.append(np.array([begin], dtype=np.int64))
+                run_start, run_stop = _false_runs(mask[first_new[s]:last_new[s] + 1, s])
+                parts_start.append(run_start + begin)
+                parts_stop.append(run_stop + begin)
+            sizes[s] = sum(len(part) for part in parts_start)
+            starts.extend(parts_start)
+            stops.extend(parts_stop)
+        self.gap_ptr = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.gap_start = np.concatenate(starts).astype(np.int64)
+        self.gap_stop = np.concatenate(stops).astype(np.int64)
+
+        self.first = np.where((self.first < 0) & has_new, old_rows + first_new, self.first)
+        self.last = np.where(has_new, old_rows + last_new, self.last)
+        self.count = self.count + mask.sum(axis=0)
+        self.n_rows = old_rows + n_new
+
+    def save(self, path: str):
+        """写入npz文件(先写临时文件再替换)"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, n_rows=np.int64(self.n_rows), bits=self.bits, first=self.first, last=self.last,
+                     count=self.count, gap_ptr=self.gap_ptr, gap_start=self.gap_start, gap_stop=self.gap_stop)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'ValidityIndex':
+        """从npz文件读取"""
+        with np.load(path) as data:
+            return cls(int(data['n_rows']), data['bits'], data['first'], data['last'], data['count'],
+                       data['gap_ptr'], data['gap_start'], data['gap_stop'])
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def valid_mask(self, col: int, start: int = 0, stop: int = None) -> np.ndarray:
+        """品种在行区间 [start, stop) 上的有效性布尔数组，只解压该区间对应的字节"""
+        stop = self.n_rows if stop is None else stop
+        if stop <= start:
+            return np.zeros(0, dtype=bool)
+        lo = start // 8
+        bits = np.unpackbits(self.bits[col, lo:(stop + 7) // 8])
+        return bits[start - lo * 8:stop - lo * 8].astype(bool)
+
+    def valid_rows(self, col: int, start: int = 0, stop: int = None) -> np.ndarray:
+        """品种在行区间 [start, stop) 上有效K线的行号"""
+        return np.flatnonzero(self.valid_mask(col, start, stop)) + start
+
+    def gaps(self, col: int) -> Tuple[np.ndarray, np.ndarray]:
+        """品种首末有效K线之间的缺失段 (起始行, 结束行)，结束行不含"""
+        lo, hi = self.gap_ptr[col], self.gap_ptr[col + 1]
+        return self.gap_start[lo:hi], self.gap_stop[lo:hi]
+
+    def has_valid(self, col: int, start: int = 0, stop: int = None) -> bool:
+        """
+        品种在行区间 [start, stop) 上是否有有效K线
+
+        只用首末有效行和缺失段判断：区间与 [first, last] 的交集不被单个缺失段完全覆盖即有效
+        """
+        stop = self.n_rows if stop is None else stop
+        first, last = self.first[col], self.last[col]
+        lo, hi = max(start, first), min(stop - 1, last)
+        if first < 0 or lo > hi:
+            return False
+        gap_start, gap_stop = self.gaps(col)
+        pos = int(np.searchsorted(gap_start, lo, side='right')) - 1
+        return not (pos >= 0 and gap_stop[pos] > hi)
+
+    def warmup_start(self, col: int, start_row: int, lookback: int) -> int:
+        """
+        从start_row向前查找，使 [返回行, start_row) 内恰好包含lookback根有效K线
+
+        按字节统计位图中的有效K线数，不访问行情数据
+
+        参数:
+            col (int): 品种列号
+            start_row (int): 正式区间的起始行
+            lookback (int): 需要的预热K线数
+
+        返回:
+            int: 预热区间的起始行，历史不足时返回最早的有效K线所在行
+        """
+        first = self.first[col]
+        if lookback <= 0 or first < 0 or first >= start_row:
+            return start_row
+        # start_row所在字节中位于其之前的部分
+        full_bytes = start_row // 8
+        head = self.valid_rows(col, full_bytes * 8, start_row)
+        if len(head) >= lookback:
+            return int(head[-lookback])
+        needed = lookback - len(head)
+        # 从后往前累计每个完整字节的有效K线数
+        counts = np.cumsum(_POPCOUNT[self.bits[col, full_bytes - 1::-1]]) if full_bytes else np.zeros(0)
+        k = int(np.searchsorted(counts, needed, side='left'))
+        if k >= len(counts):
+            return int(first)
+        byte = full_bytes - 1 - k
+        remaining = needed - (int(counts[k - 1]) if k > 0 else 0)
+        return int(self.valid_rows(col, byte * 8, byte * 8 + 8)[-remaining])
+
+
+def _false_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """首尾均为True的一维布尔数组中连续False段的 (起始, 结束) 位置，结束位置不含"""
+    if len(mask) < 3:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    edges = np.diff(mask.astype(np.int8))
+    return np.flatnonzero(edges == -1).astype(np.int64) + 1, np.flatnonzero(edges == 1).astype(np.int64) + 1
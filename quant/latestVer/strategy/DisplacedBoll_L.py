@@ -49,6 +49,10 @@ class DisplacedBoll_L(StrategyBase):
         super().__init__(params)
         self.params = {**default_params, **(params or {})}
 
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['AvgLen'] + self.params['Disp'], self.params['SDLen'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算策略指标"""
         df = data.copy()
@@ -144,18 +148,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = DisplacedBoll_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
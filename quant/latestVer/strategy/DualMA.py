@@ -14,7 +14,7 @@ from typing import Dict
 import pandas as pd
 import numpy as np
 from module import *
-from strategy.base import StrategyBase
+from strategy.base import StrategyBase, BarArrays
 
 
 class DualMA(StrategyBase):
@@ -32,6 +32,10 @@ class DualMA(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
     
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['FastLength'], self.params['SlowLength'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
@@ -48,32 +52,27 @@ class DualMA(StrategyBase):
         min_length = max(self.params['FastLength'], self.params['SlowLength'])
         if len(data) < min_length:
             return pd.DataFrame()
-            
-        # 初始化信号矩阵
-        signals = pd.DataFrame(index=data.index)
-        signals['call'] = np.nan
+        return super().generate_signals(data)
+
+    def generate_positions(self, arrays: BarArrays) -> np.ndarray:
+        """生成每根Bar结束时的仓位"""
+        avg1, avg2 = arrays.AvgValue1, arrays.AvgValue2
+        position = np.zeros(len(arrays), dtype=np.int8)
         
         current_position = 0  # 当前持仓状态: 1多头, -1空头, 0空仓
         
-        # 生成交易信号
-        for i in range(1, len(data)):
+        for i in range(1, len(arrays)):
             # 多头信号
-            if (current_position != 1 and 
-                data['AvgValue1'].iloc[i-1] > data['AvgValue2'].iloc[i-1]):
-                signals.loc[signals.index[i], 'call'] = 1
+            if current_position != 1 and avg1[i-1] > avg2[i-1]:
                 current_position = 1
                 
             # 空头信号    
-            elif (current_position != -1 and 
-                  data['AvgValue1'].iloc[i-1] < data['AvgValue2'].iloc[i-1]):
-                signals.loc[signals.index[i], 'call'] = -1
+            elif current_position != -1 and avg1[i-1] < avg2[i-1]:
                 current_position = -1
-                
-        # 在最后一根K线强制平仓
-        if current_position != 0:
-            signals.loc[signals.index[-1], 'call'] = 0
             
-        return signals
+            position[i] = current_position
+            
+        return position
 
 
 #########################主函数#########################
@@ -115,18 +114,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = DualMA()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -49,6 +49,10 @@ class DynamicBreakOutII_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
 
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return 30 + self.params['ceilingAmt']
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
@@ -68,34 +72,24 @@ class DynamicBreakOutII_L(StrategyBase):
         df['deltaVolatility'] = df['deltaVolatility'].fillna(0)  # 填充NaN值
         df['deltaVolatility'] = df['deltaVolatility'].clip(-1, 1)  # 限制变动率在 -100% 到 100% 之间
         
-        # 初始化自适应参数
-        lookback_days = pd.Series(20, index=df.index, dtype=float)  # 使用float类型
-        
-        # 计算自适应参数
+        # 计算自适应参数：逐根递推，在Python列表上计算避免逐个访问Series
+        delta_volatility = df['deltaVolatility'].tolist()
+        lookback_days = [20.0] * len(df)
         for i in range(1, len(df)):
-            lookback_days.iloc[i] = lookback_days.iloc[i-1] * (1 + df['deltaVolatility'].iloc[i])
-            lookback_days.iloc[i] = int(round(lookback_days.iloc[i]))  # 确保转为整数
-            lookback_days.iloc[i] = min(lookback_days.iloc[i], self.params['ceilingAmt'])
-            lookback_days.iloc[i] = max(lookback_days.iloc[i], self.params['floorAmt'])
+            days = int(round(lookback_days[i-1] * (1 + delta_volatility[i])))  # 确保转为整数
+            days = min(days, self.params['ceilingAmt'])
+            lookback_days[i] = float(max(days, self.params['floorAmt']))
         
         df['lookBackDays'] = lookback_days
         
-        # 初始化列以避免NaN问题
-        df['MidLine'] = np.nan
-        df['Band'] = np.nan
-        df['buyPoint'] = np.nan
-        df['sellPoint'] = np.nan
-        
-        # 计算动态指标
-        for i in range(len(df)):
-            period = int(df['lookBackDays'].iloc[i])
-            if i >= period - 1:
-                df.loc[df.index[i], 'MidLine'] = Average(df['close'].iloc[max(0, i-period+1):i+1], period).iloc[-1]
-                df.loc[df.index[i], 'Band'] = StandardDev(df['close'].iloc[max(0, i-period+1):i+1], period, 2).iloc[-1]
-                
-                # 计算自适应唐奇安通道
-                df.loc[df.index[i], 'buyPoint'] = HighestFC(df['high'].iloc[max(0, i-period+1):i+1], period).iloc[-1]
-                df.loc[df.index[i], 'sellPoint'] = LowestFC(df['low'].iloc[max(0, i-period+1):i+1], period).iloc[-1]
+        # 计算动态指标：窗口长度逐根不同，窗口不足周期的K线为NaN
+        periods = df['lookBackDays'].to_numpy(dtype=np.int64)
+        df['MidLine'] = AdaptiveAverage(df['close'], periods)
+        df['Band'] = AdaptiveStandardDev(df['close'], periods, 2)
+        
+        # 计算自适应唐奇安通道
+        df['buyPoint'] = AdaptiveHighest(df['high'], periods)
+        df['sellPoint'] = AdaptiveLowest(df['low'], periods)
         
         # 计算布林带
         df['upBand'] = df['MidLine'] + self.params['bolBandTrig'] * df['Band']
@@ -202,18 +196,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = DynamicBreakOutII_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -27,7 +27,7 @@ from typing import Dict
 import pandas as pd
 import numpy as np
 from module import *
-from strategy.base import StrategyBase
+from strategy.base import StrategyBase, BarArrays
 
 
 class FourSetofMACrossoverSys_L(StrategyBase):
@@ -49,6 +49,10 @@ class FourSetofMACrossoverSys_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
 
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['LEFast'], self.params['LESlow'], self.params['LXFast'], self.params['LXSlow'], self.params['SEFast'], self.params['SESlow'], self.params['SXFast'], self.params['SXSlow'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算策略指标"""
         df = data.copy()
@@ -65,59 +69,46 @@ class FourSetofMACrossoverSys_L(StrategyBase):
         
         return df
 
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """生成交易信号矩阵"""
+    def generate_positions(self, arrays: BarArrays) -> np.ndarray:
+        """生成每根Bar结束时的仓位"""
         # 数据验证
         min_length = max(self.params['LESlow'], self.params['SESlow'])
-        if len(data) < min_length:
+        if len(arrays) < min_length:
             raise ValueError('数据长度不足')
         
-        signals = pd.DataFrame(index=data.index)
-        signals['call'] = np.nan
+        high, low, vol = arrays.high, arrays.low, arrays.vol
+        male_fast, male_slow = arrays.MALEFast, arrays.MALESlow
+        malx_fast, malx_slow = arrays.MALXFast, arrays.MALXSlow
+        mase_fast, mase_slow = arrays.MASEFast, arrays.MASESlow
+        masx_fast, masx_slow = arrays.MASXFast, arrays.MASXSlow
+        position = np.zeros(len(arrays), dtype=np.int8)
         
         current_position = 0  # 当前持仓状态
         
-        for i in range(100, len(data)):  # 从第100根K线开始交易
-            # 提取当前值
-            high = data['high'].iloc[i]
-            low = data['low'].iloc[i]
-            open_ = data['open'].iloc[i]
-            high_prev = data['high'].iloc[i-1]
-            low_prev = data['low'].iloc[i-1]
-            vol = data['vol'].iloc[i]
-            
+        for i in range(100, len(arrays)):  # 从第100根K线开始交易
             # 入场条件
             if (current_position == 0 and
-                data['MALEFast'].iloc[i-1] > data['MALESlow'].iloc[i-1] and
-                data['MALXFast'].iloc[i-1] > data['MALXSlow'].iloc[i-1] and
-                high >= high_prev and
-                vol > 0):
-                
-                entry_price = max(open_, high_prev)
-                signals.iloc[i] = [1]
+                male_fast[i-1] > male_slow[i-1] and
+                malx_fast[i-1] > malx_slow[i-1] and
+                high[i] >= high[i-1] and
+                vol[i] > 0):
                 current_position = 1
             
             # 出场条件
-            elif current_position == 1 and vol > 0:
+            elif current_position == 1 and vol[i] > 0:
                 # 小周期多头均线组合成空头排列出场
-                if data['MALXFast'].iloc[i-1] < data['MALXSlow'].iloc[i-1]:
-                    signals.iloc[i] = [0]
+                if malx_fast[i-1] < malx_slow[i-1]:
                     current_position = 0
                 
                 # 两组均线分别空头排列且低于上根BAR最低价出场
-                elif (data['MASEFast'].iloc[i-1] < data['MASESlow'].iloc[i-1] and
-                      data['MASXFast'].iloc[i-1] < data['MASXSlow'].iloc[i-1] and
-                      low <= low_prev):
-                    
-                    exit_price = min(open_, low_prev)
-                    signals.iloc[i] = [0]
+                elif (mase_fast[i-1] < mase_slow[i-1] and
+                      masx_fast[i-1] < masx_slow[i-1] and
+                      low[i] <= low[i-1]):
                     current_position = 0
-        
-        # 在最后一根K线强制平仓
-        if current_position == 1:
-            signals.iloc[-1] = [0]
             
-        return signals
+            position[i] = current_position
+            
+        return position
 
 
 #########################主函数#########################
@@ -159,18 +150,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = FourSetofMACrossoverSys_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
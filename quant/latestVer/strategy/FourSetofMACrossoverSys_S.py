@@ -27,7 +27,7 @@ from typing import Dict
 import pandas as pd
 import numpy as np
 from module import *
-from strategy.base import StrategyBase
+from strategy.base import StrategyBase, BarArrays
 
 
 class FourSetofMACrossoverSys_S(StrategyBase):
@@ -51,6 +51,10 @@ class FourSetofMACrossoverSys_S(StrategyBase):
             
         super().__init__(default_params)
         
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['LEFast'], self.params['LESlow'], self.params['LXFast'], self.params['LXSlow'], self.params['SEFast'], self.params['SESlow'], self.params['SXFast'], self.params['SXSlow'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算策略指标"""
         df = data.copy()
@@ -67,67 +71,45 @@ class FourSetofMACrossoverSys_S(StrategyBase):
         
         return df
         
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """生成交易信号矩阵"""
+    def generate_positions(self, arrays: BarArrays) -> np.ndarray:
+        """生成每根Bar结束时的仓位"""
         # 数据验证
         min_length = max(self.params['LESlow'], self.params['SESlow'])
-        if len(data) < min_length:
+        if len(arrays) < min_length:
             raise ValueError('数据长度不足')
         
-        signals = pd.DataFrame(index=data.index)
-        signals['call'] = np.nan
+        high, low, vol = arrays.high, arrays.low, arrays.vol
+        male_fast, male_slow = arrays.MALEFast, arrays.MALESlow
+        mase_fast, mase_slow = arrays.MASEFast, arrays.MASESlow
+        masx_fast, masx_slow = arrays.MASXFast, arrays.MASXSlow
+        position = np.zeros(len(arrays), dtype=np.int8)
         
         current_position = 0  # 当前持仓状态
         
-        for i in range(100, len(data)):  # 从第100根K线开始交易
-            # 获取当前值
-            low = data['low'].iloc[i]
-            high = data['high'].iloc[i]
-            open_ = data['open'].iloc[i]
-            vol = data['vol'].iloc[i]
-            
-            # 获取前一根K线的均线值和价格
-            mase_fast_prev = data['MASEFast'].iloc[i-1]
-            mase_slow_prev = data['MASESlow'].iloc[i-1]
-            masx_fast_prev = data['MASXFast'].iloc[i-1]
-            masx_slow_prev = data['MASXSlow'].iloc[i-1]
-            male_fast_prev = data['MALEFast'].iloc[i-1]
-            male_slow_prev = data['MALESlow'].iloc[i-1]
-            low_prev = data['low'].iloc[i-1]
-            high_prev = data['high'].iloc[i-1]
-            
+        for i in range(100, len(arrays)):  # 从第100根K线开始交易
             # 入场信号
             if (current_position == 0 and
-                mase_fast_prev < mase_slow_prev and
-                masx_fast_prev < masx_slow_prev and
-                low <= low_prev and
-                vol > 0):
-                
-                entry_price = min(open_, low_prev)
-                signals.iloc[i] = [-1]
+                mase_fast[i-1] < mase_slow[i-1] and
+                masx_fast[i-1] < masx_slow[i-1] and
+                low[i] <= low[i-1] and
+                vol[i] > 0):
                 current_position = -1
                 
             # 出场信号
-            elif current_position == -1 and vol > 0:
+            elif current_position == -1 and vol[i] > 0:
                 # 小周期空头均线组合成多头排列出场
-                if masx_fast_prev > masx_slow_prev:
-                    signals.iloc[i] = [0]
+                if masx_fast[i-1] > masx_slow[i-1]:
                     current_position = 0
                     
                 # 两组均线分别多头排列且高于上根BAR最高价出场
-                elif (male_fast_prev > male_slow_prev and
-                      masx_fast_prev > masx_slow_prev and
-                      high >= high_prev):
-                    
-                    exit_price = max(open_, high_prev)
-                    signals.iloc[i] = [0]
+                elif (male_fast[i-1] > male_slow[i-1] and
+                      masx_fast[i-1] > masx_slow[i-1] and
+                      high[i] >= high[i-1]):
                     current_position = 0
-        
-        # 在最后一根K线强制平仓
-        if current_position == -1:
-            signals.iloc[-1] = [0]
             
-        return signals
+            position[i] = current_position
+            
+        return position
 
 
 #########################主函数#########################
@@ -169,18 +151,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = FourSetofMACrossoverSys_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -49,6 +49,10 @@ class GhostTrader_L(StrategyBase):
         }
         self.params = {**self.default_params, **(params or {})}
 
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.EMA_WARMUP_FACTOR * max(self.params['FastLength'], self.params['SlowLength'], self.params['Length']), 20)
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标，完全复制TradeBlazor的计算方法"""
         df = data.copy()
@@ -58,40 +62,11 @@ class GhostTrader_L(StrategyBase):
         df['AvgValue2'] = df['close'].ewm(span=self.params['SlowLength'], adjust=False).mean()
         
         # 计算RSI (使用TradeBlazor的方法)
-        df['NetChgAvg'] = 0.0
-        df['TotChgAvg'] = 0.0
-        df['RSIValue'] = 0.0
-        
-        length = self.params['Length']
-        for i in range(len(df)):
-            if i <= length - 1:
-                # 初始期间的计算
-                if i >= length:  # 确保有足够的数据
-                    df.loc[df.index[i], 'NetChgAvg'] = (
-                        df['close'].iloc[i] - df['close'].iloc[i-length]
-                    ) / length
-                    df.loc[df.index[i], 'TotChgAvg'] = (
-                        abs(df['close'].diff()).iloc[i-length+1:i+1].mean()
-                    )
-            else:
-                # 后续期间的计算
-                sf = 1/length
-                change = df['close'].iloc[i] - df['close'].iloc[i-1]
-                df.loc[df.index[i], 'NetChgAvg'] = (
-                    df['NetChgAvg'].iloc[i-1] + 
-                    sf * (change - df['NetChgAvg'].iloc[i-1])
-                )
-                df.loc[df.index[i], 'TotChgAvg'] = (
-                    df['TotChgAvg'].iloc[i-1] + 
-                    sf * (abs(change) - df['TotChgAvg'].iloc[i-1])
-                )
-            
-            # 计算RSI值
-            if df['TotChgAvg'].iloc[i] != 0:
-                chg_ratio = df['NetChgAvg'].iloc[i] / df['TotChgAvg'].iloc[i]
-            else:
-                chg_ratio = 0
-            df.loc[df.index[i], 'RSIValue'] = 50 * (chg_ratio + 1)
+        # 前Length根平均变化取0，之后Wilder平滑
+        rsi = RSI(df['close'], self.params['Length'], zero_seed=True)
+        df['NetChgAvg'] = rsi['NetChgAvg'].to_numpy()
+        df['TotChgAvg'] = rsi['TotChgAvg'].to_numpy()
+        df['RSIValue'] = rsi['RSIValue'].to_numpy()
         
         # 计算唐奇安通道
         df['ExitHiBand'] = Highest(df['high'], 20)  # 唐奇安通道上轨
@@ -181,18 +156,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = GhostTrader_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
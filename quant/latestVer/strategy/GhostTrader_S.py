@@ -49,6 +49,10 @@ class GhostTrader_S(StrategyBase):
         }
         self.params = {**self.default_params, **(params or {})}
         
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.EMA_WARMUP_FACTOR * max(self.params['FastLength'], self.params['SlowLength'], self.params['Length']), 20)
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算策略指标"""
         # 计算短期和长期指数平均线
@@ -56,31 +60,11 @@ class GhostTrader_S(StrategyBase):
         data['AvgValue2'] = XAverage(data['close'], self.params['SlowLength'])
         
         # 计算RSI (严格按照TB的方法)
-        length = self.params['Length']
-        data['NetChgAvg'] = np.nan
-        data['TotChgAvg'] = np.nan
-        data['ChgRatio'] = np.nan
-        data['RSIValue'] = np.nan
-        
-        for i in range(length, len(data)):
-            if i == length:  # 第一个值的计算
-                data.loc[data.index[i], 'NetChgAvg'] = (data['close'].iloc[i] - data['close'].iloc[0]) / length
-                data.loc[data.index[i], 'TotChgAvg'] = data['close'].diff().abs().iloc[1:i+1].mean()
-            else:  # 后续值使用Wilder平滑
-                sf = 1/length
-                change = data['close'].iloc[i] - data['close'].iloc[i-1]
-                data.loc[data.index[i], 'NetChgAvg'] = (data['NetChgAvg'].iloc[i-1] + 
-                    sf * (change - data['NetChgAvg'].iloc[i-1]))
-                data.loc[data.index[i], 'TotChgAvg'] = (data['TotChgAvg'].iloc[i-1] + 
-                    sf * (abs(change) - data['TotChgAvg'].iloc[i-1]))
-            
-            # 计算RSI值
-            if data['TotChgAvg'].iloc[i] != 0:
-                data.loc[data.index[i], 'ChgRatio'] = data['NetChgAvg'].iloc[i] / data['TotChgAvg'].iloc[i]
-            else:
-                data.loc[data.index[i], 'ChgRatio'] = 0
-            
-            data.loc[data.index[i], 'RSIValue'] = 50 * (data['ChgRatio'].iloc[i] + 1)
+        rsi = RSI(data['close'], self.params['Length'])
+        data['NetChgAvg'] = rsi['NetChgAvg'].to_numpy()
+        data['TotChgAvg'] = rsi['TotChgAvg'].to_numpy()
+        data['ChgRatio'] = rsi['ChgRatio'].to_numpy()
+        data['RSIValue'] = rsi['RSIValue'].to_numpy()
         
         # 计算唐奇安通道
         data['ExitHiBand'] = Highest(data['high'], 20)
@@ -182,18 +166,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = GhostTrader_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -47,6 +47,10 @@ class Going_in_Style_S(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
         
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return self.params['Length'] + 1
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
@@ -71,70 +75,19 @@ class Going_in_Style_S(StrategyBase):
         signals = pd.DataFrame(index=data.index)
         signals['call'] = np.nan
         
-        current_position = 0
-        position_bars = 0
-        stop_price = None
-        prev_stop_price = None  # 添加上一个stop_price的记录
-        low_value = None
-        prev_low_value = None
-        af = self.params['Acceleration']
-        
-        for i in range(1, len(data)):
-            # 更新持仓天数
-            if current_position != 0:
-                position_bars += 1
-                
-            # 空头入场条件判断
-            if (data['Condition2'].iloc[i-1] and  # 上一根Bar创新低
-                data['low'].iloc[i] <= data['close'].iloc[i-1] - data['ATR'].iloc[i-1] * self.params['Trigger'] and
-                data['vol'].iloc[i] > 0):  # 添加成交量判断
-                
-                # 空头入场
-                if current_position == 0:
-                    entry_price = min(data['open'].iloc[i], 
-                                    data['close'].iloc[i-1] - data['ATR'].iloc[i-1] * self.params['Trigger'])
-                    signals.loc[signals.index[i], 'call'] = -1
-                    current_position = -1
-                    position_bars = 0
-                    
-                    # 设置初始止损价和峰值价
-                    stop_price = data['high'].iloc[i] + data['StopATR'].iloc[i] * self.params['FirstBarMultp']
-                    low_value = data['low'].iloc[i]
-                    prev_low_value = low_value
-                    af = self.params['Acceleration']
-                    
-            # 更新跟踪止损价和峰值价
-            elif current_position == -1:
-                if position_bars == 0:  # 入场当天
-                    stop_price = data['high'].iloc[i] + data['StopATR'].iloc[i] * self.params['FirstBarMultp']
-                    prev_stop_price = stop_price  # 初始化prev_stop_price
-                    low_value = data['low'].iloc[i]
-                    prev_low_value = low_value
-                    af = self.params['Acceleration']
-                elif position_bars > 0:  # 入场后的交易日
-                    prev_stop_price = stop_price  # 保存上一个stop_price
-                    prev_low_value = low_value
-                    if data['low'].iloc[i] < low_value:
-                        low_value = data['low'].iloc[i]
-                        if low_value < prev_low_value and af < 0.2:
-                            af = af + min(self.params['Acceleration'], 0.2 - af)
-                    stop_price = stop_price - af * (stop_price - low_value)
-                    
-                    # 检查止损出场条件 (使用上一根bar的止损价)
-                    if data['high'].iloc[i] >= prev_stop_price and data['vol'].iloc[i] > 0:
-                        exit_price = max(data['open'].iloc[i], prev_stop_price)  # 确保以不低于止损价的价格出场
-                        signals.loc[signals.index[i], 'call'] = 0
-                        current_position = 0
-                        position_bars = 0
-                        stop_price = None
-                        prev_stop_price = None
-                        low_value = None
-                        prev_low_value = None
-                        af = self.params['Acceleration']
-        
-        # 在最后一根K线强制平仓
-        if current_position == -1:
-            signals.loc[signals.index[-1], 'call'] = 0
+        # 空头入场条件：上一根Bar创新低，当前Bar最低价跌破 昨收 - ATR × Trigger，且有成交量
+        entries = (data['Condition2'].shift(1, fill_value=False) &
+                   (data['low'] <= data['close'].shift(1) - data['ATR'].shift(1) * self.params['Trigger']) &
+                   (data['vol'] > 0))
+        
+        # 抛物线跟踪止损：入场Bar止损价为 最高价 + 3日真实波幅均值 × FirstBarMultp；
+        # 持仓中再次满足入场条件的Bar不更新止损，成交量为0的Bar不止损出场
+        stops = ParabolicStop(data['high'], data['low'], entries,
+                              data['high'] + data['StopATR'] * self.params['FirstBarMultp'],
+                              self.params['Acceleration'], 0.2, side=-1,
+                              hold=entries, tradable=data['vol'] > 0)
+        # 开平仓信号，最后一根K线仍有持仓时强制平仓
+        signals['call'] = position_calls(stops['Position'], close_at_end=True)
             
         return signals
 
@@ -178,18 +131,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = Going_in_Style_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -25,7 +25,7 @@ from typing import Dict
 import pandas as pd
 import numpy as np
 from module import *
-from strategy.base import StrategyBase
+from strategy.base import StrategyBase, BarArrays
 
 
 class JailBreakSys_L(StrategyBase):
@@ -43,6 +43,10 @@ class JailBreakSys_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
         
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['Length1'], self.params['Length2'], self.params['AtrVal'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
@@ -62,53 +66,42 @@ class JailBreakSys_L(StrategyBase):
         
         return df
     
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """生成交易信号矩阵"""
+    def generate_positions(self, arrays: BarArrays) -> np.ndarray:
+        """生成每根Bar结束时的仓位"""
         # 数据验证
         min_length = max(self.params['Length1'], self.params['Length2'])
-        if len(data) < min_length:
+        if len(arrays) < min_length:
             raise ValueError('数据长度不足')
         
-        signals = pd.DataFrame(index=data.index)
-        signals['call'] = np.nan
+        high, low, open_, vol = arrays.high, arrays.low, arrays.open, arrays.vol
+        upperband, exitlong, atr = arrays.Upperband, arrays.Exitlong, arrays.ATR
+        position = np.zeros(len(arrays), dtype=np.int8)
         
         current_position = 0  # 当前持仓状态
         protect_stop = None   # 保护性止损价格
         
-        for i in range(1, len(data)):
+        for i in range(1, len(arrays)):
             if current_position == 0:  # 空仓状态
                 # 价格大于长周期最高价区间入场做多
-                if (data['high'].iloc[i] >= data['Upperband'].iloc[i-1] and 
-                    data['vol'].iloc[i] > 0):
-                    
-                    entry_price = max(data['open'].iloc[i], data['Upperband'].iloc[i-1])
-                    signals.iloc[i] = [1]
+                if high[i] >= upperband[i-1] and vol[i] > 0:
+                    entry_price = max(open_[i], upperband[i-1])
                     current_position = 1
-                    protect_stop = entry_price - self.params['IPS'] * data['ATR'].iloc[i-1]
+                    protect_stop = entry_price - self.params['IPS'] * atr[i-1]
             
             elif current_position == 1:  # 持有多仓
                 # 价格低于入场价以下一定ATR幅度止损
-                if (data['low'].iloc[i] <= protect_stop and 
-                    protect_stop >= data['Exitlong'].iloc[i-1] and 
-                    data['vol'].iloc[i] > 0):
-                    
-                    exit_price = min(data['open'].iloc[i], protect_stop)
-                    signals.iloc[i] = [0]
+                if low[i] <= protect_stop and protect_stop >= exitlong[i-1] and vol[i] > 0:
                     current_position = 0
                     protect_stop = None
                 
                 # 价格低于短周期最低价区间出场
-                elif data['low'].iloc[i] <= data['Exitlong'].iloc[i-1]:
-                    exit_price = min(data['open'].iloc[i], data['Exitlong'].iloc[i-1])
-                    signals.iloc[i] = [0]
+                elif low[i] <= exitlong[i-1]:
                     current_position = 0
                     protect_stop = None
+            
+            position[i] = current_position
         
-        # 在最后一根K线强制平仓
-        if current_position == 1:  # 如果还持有多仓
-            signals.iloc[-1] = [0]
-        
-        return signals
+        return position
 
 
 #########################主函数#########################
@@ -150,18 +143,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = JailBreakSys_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -52,85 +52,65 @@ class KeltnerChannel_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
 
-    def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
-        """计算策略指标"""
-        df = data.copy()
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return self.params['Length'] + 1
+
+    def shared_key(self):
+        """多空两边的通道只取决于Length和Constt"""
+        return ('KeltnerChannel', self.params['Length'], self.params['Constt'])
+
+    def shared_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
+        """计算凯特纳通道"""
+        df = pd.DataFrame(index=data.index)
         
         # 计算关键价格
-        df['Price'] = df['close']
+        df['Price'] = data['close']
         
         # 计算均线和ATR
         df['AvgVal'] = Average(df['Price'], self.params['Length'])
-        df['AvgRange'] = Average(TrueRange(df['high'], df['low'], df['close']), self.params['Length'])
+        df['AvgRange'] = Average(TrueRange(data['high'], data['low'], data['close']), self.params['Length'])
         
         # 计算通道
         df['KCU'] = df['AvgVal'] + df['AvgRange'] * self.params['Constt']
         df['KCL'] = df['AvgVal'] - df['AvgRange'] * self.params['Constt']
         df['ChanRng'] = (df['KCU'] - df['KCL']) / 2
         
-        # 初始化计数器和触发条件
-        df['CountL'] = 0
-        df['SetBar'] = np.nan
-        df['hh'] = np.nan
-        
-        # 处理上穿上轨信号
-        current_count = 0
-        for i in range(1, len(df)):
-            if CrossOver(df['Price'], df['KCU']).iloc[i]:
-                df.loc[df.index[i], 'SetBar'] = df['high'].iloc[i]
-                current_count = 0
-                df.loc[df.index[i], 'hh'] = (df['SetBar'].iloc[i] + 
-                                            df['ChanRng'].iloc[i] * self.params['ChanPcnt'])
-            else:
-                current_count += 1
-            df.loc[df.index[i], 'CountL'] = current_count
+        return df
+
+    def calculate_indicators(self, data: pd.DataFrame, shared: pd.DataFrame = None) -> pd.DataFrame:
+        """计算策略指标，shared为LongShortPair传入的共用通道"""
+        df = data.join(self.shared_indicators(data) if shared is None else shared)
+        
+        # 处理上穿上轨信号(第0根Bar不检查)：CountL为距最近一次上穿的Bar数，SetBar、hh只在上穿的Bar上有值
+        cross_up = CrossOver(df['Price'], df['KCU']).to_numpy().astype(bool)
+        cross_up[:1] = False
+        bar = np.arange(len(df))
+        df['CountL'] = bar - np.maximum.accumulate(np.where(cross_up, bar, 0))
+        df['SetBar'] = np.where(cross_up, df['high'], np.nan)
+        df['hh'] = df['SetBar'] + df['ChanRng'] * self.params['ChanPcnt']
             
         # 计算止损线
         df['Lstopline'] = Lowest(df['low'], self.params['stopN'])
         
         return df
         
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """生成交易信号矩阵"""
+    def position_rules(self, data: pd.DataFrame) -> Dict:
+        """入场条件及出场规则"""
         # 数据验证
         min_length = max(self.params['Length'], self.params['stopN'])
         if len(data) < min_length:
             raise ValueError('数据长度不足')
         
-        signals = pd.DataFrame(index=data.index)
-        signals['call'] = np.nan
+        # 开多仓条件：前一根Bar收于上轨之上，上穿后不超过buyN根Bar，最高价突破前一根Bar的触发价，成交量大于0
+        entries = ((data['Price'].shift(1) > data['KCU'].shift(1)) &
+                   (data['CountL'] <= self.params['buyN']) &
+                   (data['high'] >= data['hh'].shift(1)) &
+                   (data['vol'] > 0))
         
-        current_position = 0
-        
-        for i in range(1, len(data)):
-            # 开多仓条件
-            if (current_position == 0 and
-                data['Price'].iloc[i-1] > data['KCU'].iloc[i-1] and
-                data['CountL'].iloc[i] <= self.params['buyN'] and
-                data['high'].iloc[i] >= data['hh'].iloc[i-1] and
-                data['vol'].iloc[i] > 0):
-                
-                entry_price = max(data['open'].iloc[i], data['hh'].iloc[i-1])
-                signals.iloc[i] = [1]
-                current_position = 1
-            
-            # 平多仓条件
-            elif current_position == 1:
-                # 价格下穿轨道中轨或低于止损线
-                if ((CrossUnder(data['close'], data['AvgVal']).iloc[i] or
-                     data['low'].iloc[i] <= data['Lstopline'].iloc[i-1]) and
-                    data['vol'].iloc[i] > 0):
-                    
-                    exit_price = min(data['open'].iloc[i], data['Lstopline'].iloc[i-1])
-                    signals.iloc[i] = [0]
-                    current_position = 0
-        
-        # 在最后一个bar强制平仓
-        if current_position == 1:
-            last_idx = signals.index[-1]
-            signals.loc[last_idx] = [0]
-        
-        return signals 
+        # 平多仓条件：价格下穿轨道中轨或最低价低于前一根Bar的止损线，成交量大于0
+        return dict(entries=entries, side=1, exits=CrossUnder(data['close'], data['AvgVal']),
+                    stops=data['Lstopline'].shift(1), tradable=data['vol'] > 0, start=1)
 
 
 #########################主函数#########################
@@ -172,18 +152,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = KeltnerChannel_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
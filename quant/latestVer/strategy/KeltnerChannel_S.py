@@ -52,16 +52,24 @@ class KeltnerChannel_S(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
     
-    def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
-        """计算策略指标"""
-        df = data.copy()
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return self.params['Length'] + 1
+
+    def shared_key(self):
+        """多空两边的通道只取决于Length和Constt"""
+        return ('KeltnerChannel', self.params['Length'], self.params['Constt'])
+
+    def shared_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
+        """计算凯特纳通道"""
+        df = pd.DataFrame(index=data.index)
         
         # 计算关键价格和均线
-        df['Price'] = df['close']
+        df['Price'] = data['close']
         df['AvgVal'] = Average(df['Price'], self.params['Length'])
         
         # 计算真实波动均值(ATR)
-        df['AvgRange'] = Average(TrueRange(df['high'], df['low'], df['close']), 
+        df['AvgRange'] = Average(TrueRange(data['high'], data['low'], data['close']), 
                                 self.params['Length'])
         
         # 计算通道
@@ -69,76 +77,44 @@ class KeltnerChannel_S(StrategyBase):
         df['KCL'] = df['AvgVal'] - df['AvgRange'] * self.params['Constt']
         df['ChanRng'] = (df['KCU'] - df['KCL']) / 2
         
+        return df
+
+    def calculate_indicators(self, data: pd.DataFrame, shared: pd.DataFrame = None) -> pd.DataFrame:
+        """计算策略指标，shared为LongShortPair传入的共用通道"""
+        df = data.join(self.shared_indicators(data) if shared is None else shared)
+        
         # 计算下穿下轨信号
         df['CrossDown'] = CrossUnder(df['Price'], df['KCL'])
         
-        # 初始化计数器和触发价格
-        df['CountS'] = 0
-        df['ll'] = np.nan
-        
-        # 更新计数器和触发价格
-        current_count = 0
-        for i in range(len(df)):
-            if df['CrossDown'].iloc[i]:
-                current_count = 0
-                df.loc[df.index[i], 'll'] = (df['low'].iloc[i] - 
-                                            df['ChanRng'].iloc[i] * self.params['ChanPcnt'])
-            else:
-                current_count += 1
-            df.loc[df.index[i], 'CountS'] = current_count
+        # 计数器为距最近一次下穿的Bar数(之前没有下穿时从1开始计)，触发价格只在下穿的Bar上有值
+        cross_down = df['CrossDown'].to_numpy().astype(bool)
+        bar = np.arange(len(df))
+        df['CountS'] = bar - np.maximum.accumulate(np.where(cross_down, bar, -1))
+        df['ll'] = np.where(cross_down, df['low'] - df['ChanRng'] * self.params['ChanPcnt'], np.nan)
             
         # 计算止损线
         df['Sstopline'] = Highest(df['high'], self.params['stopN'])
         
         return df
     
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """生成交易信号矩阵"""
+    def position_rules(self, data: pd.DataFrame) -> Dict:
+        """入场条件及出场规则"""
         # 数据验证
         min_length = max(self.params['Length'], self.params['stopN'])
         if len(data) < min_length:
             raise ValueError('数据长度不足')
         
-        signals = pd.DataFrame(index=data.index)
-        signals['call'] = np.nan
-        
-        current_position = 0
-        
-        for i in range(1, len(data)):
-            # 空仓且满足开仓条件
-            if (current_position == 0 and
-                data['Price'].iloc[i-1] < data['KCL'].iloc[i-1] and
-                data['CountS'].iloc[i] <= self.params['sellN'] and
-                data['low'].iloc[i] <= data['ll'].iloc[i-1] and
-                data['vol'].iloc[i] > 0):
-                
-                entry_price = min(data['open'].iloc[i], data['ll'].iloc[i-1])
-                signals.iloc[i] = [-1]
-                current_position = -1
-            
-            # 持有空仓时的平仓条件
-            elif current_position == -1:
-                # 价格上穿均线
-                if (CrossOver(data['close'], data['AvgVal']).iloc[i-1] and
-                    data['vol'].iloc[i] > 0):
-                    
-                    signals.iloc[i] = [0]
-                    current_position = 0
-                
-                # 价格突破止损线
-                elif (data['high'].iloc[i] >= data['Sstopline'].iloc[i-1] and
-                      data['vol'].iloc[i] > 0):
-                    
-                    exit_price = max(data['Sstopline'].iloc[i-1], data['open'].iloc[i])
-                    signals.iloc[i] = [0]
-                    current_position = 0
-        
-        # 在最后一个bar强制平仓
-        if current_position == -1:
-            last_idx = signals.index[-1]
-            signals.loc[last_idx] = [0]
-        
-        return signals 
+        # 开空仓条件：前一根Bar收于下轨之下，下穿后不超过sellN根Bar，最低价跌破前一根Bar的触发价，成交量大于0
+        entries = ((data['Price'].shift(1) < data['KCL'].shift(1)) &
+                   (data['CountS'] <= self.params['sellN']) &
+                   (data['low'] <= data['ll'].shift(1)) &
+                   (data['vol'] > 0))
+        
+        # 平空仓条件：前一根Bar价格上穿均线，或最高价突破前一根Bar的止损线，成交量大于0
+        exits = CrossOver(data['close'], data['AvgVal']).to_numpy().astype(bool)
+        exits = np.concatenate(([False], exits[:-1]))
+        return dict(entries=entries, side=-1, exits=exits, stops=data['Sstopline'].shift(1),
+                    tradable=data['vol'] > 0, start=1)
 
 
 #########################主函数#########################
@@ -180,18 +156,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = KeltnerChannel_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -46,85 +46,55 @@ class KingKeltner_S(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
     
-    def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
-        """计算策略指标"""
-        df = data.copy()
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['avgLength'], self.params['atrLength'])
+
+    def shared_key(self):
+        """多空两边的三价均线和ATR只取决于avgLength和atrLength"""
+        return ('KingKeltner', self.params['avgLength'], self.params['atrLength'])
+
+    def shared_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
+        """计算三价均线和ATR"""
+        df = pd.DataFrame(index=data.index)
         
         # 计算三价均线
-        df['TypicalPrice'] = (df['high'] + df['low'] + df['close']) / 3
+        df['TypicalPrice'] = (data['high'] + data['low'] + data['close']) / 3
         df['movAvgVal'] = Average(df['TypicalPrice'], self.params['avgLength'])
         
-        # 计算ATR通道
-        df['ATR'] = AvgTrueRange(self.params['atrLength'], df['high'], df['low'], df['close'])
-        df['dnBand'] = df['movAvgVal'] - df['ATR']
+        # 计算ATR
+        df['ATR'] = AvgTrueRange(self.params['atrLength'], data['high'], data['low'], data['close'])
         
         # 出场条件线
         df['liquidPoint'] = df['movAvgVal']
         
         return df
+
+    def calculate_indicators(self, data: pd.DataFrame, shared: pd.DataFrame = None) -> pd.DataFrame:
+        """计算技术指标，shared为LongShortPair传入的共用指标"""
+        df = data.join(self.shared_indicators(data) if shared is None else shared)
+        
+        # 计算ATR通道
+        df['dnBand'] = df['movAvgVal'] - df['ATR']
+        
+        return df
     
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """生成交易信号矩阵"""
+    def position_rules(self, data: pd.DataFrame) -> Dict:
+        """入场条件及出场规则"""
         # 数据验证
         min_length = max(self.params['avgLength'], self.params['atrLength'])
         if len(data) < min_length:
             raise ValueError('数据长度不足')
         
-        signals = pd.DataFrame(index=data.index)
-        signals['call'] = np.nan
-        
-        current_position = 0  # 当前持仓状态：0表示空仓，-1表示空头
-        position_bars = 0     # 持仓天数
-        
-        # 获取需要的数据列
+        # 开空仓条件：三价均线向下，最低价下破前一根Bar的通道下轨，成交量大于0
         mov_avg = data['movAvgVal']
-        dn_band = data['dnBand']
-        liquid_point = data['liquidPoint']
-        high = data['high']
-        low = data['low']
-        open_ = data['open']
-        vol = data['vol']
+        entries = ((mov_avg.shift(1) < mov_avg.shift(2)) &
+                   (data['low'] <= data['dnBand'].shift(1)) &
+                   (data['vol'] > 0))
         
-        for i in range(2, len(data)):
-            # 更新持仓天数
-            if current_position != 0:
-                position_bars += 1
-            
-            # 开空条件：
-            # 1. 当前空仓
-            # 2. 三价均线向下
-            # 3. 最低价下破通道下轨
-            # 4. 成交量大于0
-            if (current_position == 0 and
-                mov_avg.iloc[i-1] < mov_avg.iloc[i-2] and
-                low.iloc[i] <= dn_band.iloc[i-1] and
-                vol.iloc[i] > 0):
-                
-                entry_price = min(open_.iloc[i], dn_band.iloc[i-1])
-                signals.iloc[i] = [-1]
-                current_position = -1
-                position_bars = 0
-            
-            # 平空条件：
-            # 1. 持仓时间大于等于1根K线
-            # 2. 最高价上破三价均线
-            # 3. 成交量大于0
-            elif (current_position == -1 and
-                  position_bars >= 1 and
-                  high.iloc[i] >= liquid_point.iloc[i-1] and
-                  vol.iloc[i] > 0):
-                
-                exit_price = max(open_.iloc[i], liquid_point.iloc[i-1])
-                signals.iloc[i] = [0]
-                current_position = 0
-                position_bars = 0
-        
-        # 在最后一个bar强制平仓
-        if current_position == -1:
-            last_idx = signals.index[-1]
-            signals.loc[last_idx] = [0]
-        
-        return signals
+        # 平空仓条件：持仓超过1个bar，最高价上破前一根Bar的三价均线，成交量大于0
+        return dict(entries=entries, side=-1, stops=data['liquidPoint'].shift(1),
+                    tradable=data['vol'] > 0, start=2)
 
 
 #########################主函数#########################
@@ -166,18 +136,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = KingKeltner_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -53,6 +53,10 @@ class NoHurrySystem_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
     
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['ChanLength'] + self.params['ChanDelay'], self.params['ATRLength'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
@@ -80,47 +84,18 @@ class NoHurrySystem_L(StrategyBase):
         signals = pd.DataFrame(index=df.index)
         signals['call'] = np.nan # 信号列
 
-        # 状态变量
-        current_position = 0  # 当前持仓状态，1为多头，-1为空头，0为无仓位
-        position_bars = 0     # 持仓Bar计数
-        PosHigh = 0           # 开仓后最高价
-        stopline = None       # 止损线
-
         # 向量化计算 con 条件
         con = (df['high'] >= df['UpperChan'].shift(self.params['ChanDelay'] + 1)) & (df['high'].shift(1) < df['UpperChan'].shift(self.params['ChanDelay'] + 1))
         minpoint = 1 # 假设值
+        entries = con & (np.arange(len(df)) >= min_length)
 
-        open_ = df['open'].values
-        high_ = df['high'].values
-        low_ = df['low'].values
-        UpperChan_shifted = df['UpperChan'].shift(self.params['ChanDelay'] + 1).values
-        LowerChan_shifted = df['LowerChan'].shift(self.params['ChanDelay'] + 1).values
-        ATRVal_shifted = df['ATRVal'].shift(1).values
-
-        for i in range(min_length, len(df)):
-            # 系统入场
-            if current_position == 0:
-                if con.iloc[i]:
-                    signals.iloc[i, signals.columns.get_loc('call')] = 1  # Buy signal
-                    current_position = 1
-                    PosHigh = high_[i]
-                    position_bars = 0
-
-            # 系统出场
-            elif current_position == 1:
-                position_bars += 1
-                PosHigh = max(PosHigh, high_[i])
-
-                stopline = max(PosHigh - ATRVal_shifted[i], LowerChan_shifted[i] - minpoint)
-                if low_[i] <= stopline:
-                    signals.iloc[i, signals.columns.get_loc('call')] = 0  # Sell signal
-                    current_position = 0
-                    position_bars = 0
-                    stopline = None
-
-        # 在最后一根K线强制平仓
-        if current_position == 1:
-            signals.iloc[-1, signals.columns.get_loc('call')] = 0 # Sell signal
+        # 系统出场：开仓后最高价 - 前一根Bar的ATR跟踪距离，不低于平移后的LowerChan - minpoint
+        stops = ChandelierStop(df['high'], df['low'], entries,
+                               df['ATRVal'].shift(1),
+                               df['LowerChan'].shift(self.params['ChanDelay'] + 1) - minpoint,
+                               side=1)
+        # 开平仓信号，最后一根K线仍有持仓时强制平仓
+        signals['call'] = position_calls(stops['Position'], close_at_end=True)
 
         return signals
 
@@ -164,18 +139,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = NoHurrySystem_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
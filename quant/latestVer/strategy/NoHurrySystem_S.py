@@ -51,6 +51,10 @@ class NoHurrySystem_S(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
     
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['ChanLength'] + self.params['ChanDelay'], self.params['ATRLength'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
@@ -73,48 +77,21 @@ class NoHurrySystem_S(StrategyBase):
         signals = pd.DataFrame(index=data.index)
         signals['call'] = np.nan
 
-        current_position = 0  # // 当前持仓状态：0-空仓，-1-空头
-        PosLow = None  # // 记录开仓后低点
-        stopline = None
-        bars_since_entry = 0 # // 记录开仓后的K线数量
+        # // 系统入场
+        # // 价格向下突破ChanDelay周期前的LowerChan，开空仓
+        lower_chan = data['LowerChan'].shift(self.params['ChanDelay'] + 1)
+        con = (data['low'] <= lower_chan) & (data['low'].shift(1) > lower_chan.shift(1))
+        entries = con & (np.arange(len(data)) >= self.params['ChanLength'] + self.params['ChanDelay'])
 
-        for i in range(self.params['ChanLength'] + self.params['ChanDelay'], len(data)):
-            # // 系统入场
-            # // 价格向下突破ChanDelay周期前的LowerChan，开空仓
-            con = data['low'].iloc[i] <= data['LowerChan'].shift(self.params['ChanDelay'] + 1).iloc[i] and \
-                  data['low'].iloc[i-1] > data['LowerChan'].shift(self.params['ChanDelay'] + 1).iloc[i-1]
-            
-            if current_position == 0:
-                if con:
-                    signals.loc[data.index[i], 'call'] = -1
-                    current_position = -1
-                    PosLow = data['low'].iloc[i]
-                    bars_since_entry = 0 # // 重置开仓后的K线数量
+        # // 系统出场
+        # // ATR跟踪止损(开仓后低点 + 前一根Bar的ATR跟踪距离)，通道止损(平移后的UpperChan + minpoint)
+        stops = ChandelierStop(data['high'], data['low'], entries,
+                               data['ATRVal'].shift(1),
+                               data['UpperChan'].shift(self.params['ChanDelay'] + 1) + data['minpoint'],
+                               side=-1)
+        # // 开平仓信号，最后一根K线仍有持仓时强制平仓
+        signals['call'] = position_calls(stops['Position'], exit_call=1, close_at_end=True)
             
-            # // 系统出场
-            # // PosLow记录开仓低点
-            elif current_position == -1:
-                bars_since_entry += 1 # // 更新开仓后的K线数量
-                if bars_since_entry == 0:  # //TradeBlazer中此条件恒为false，因为上面一行代码已经+1
-                    PosLow = data['low'].iloc[i]
-                elif data['low'].iloc[i] < PosLow:
-                    PosLow = data['low'].iloc[i]
-                
-                # // ATR跟踪止损,通道止损
-                if bars_since_entry > 0:
-                  stopline = min(PosLow + data['ATRVal'].shift(1).iloc[i],
-                                data['UpperChan'].shift(self.params['ChanDelay'] + 1).iloc[i] + data['minpoint'].iloc[i])
-                
-                  if data['high'].iloc[i] >= stopline:
-                      signals.loc[data.index[i], 'call'] = 1
-                      current_position = 0
-                      PosLow = None
-                      stopline = None
-
-            # // 在最后一根K线强制平仓
-        if current_position == -1:
-            signals.loc[data.index[-1], 'call'] = 1
-
         return signals
 
 
@@ -157,18 +134,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = NoHurrySystem_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -51,6 +51,10 @@ class SupermanSystem_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
     
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['Length'] + 1, self.params['Stop_Len'], 8)
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算策略所需的技术指标"""
         df = data.copy()
@@ -90,52 +94,30 @@ class SupermanSystem_L(StrategyBase):
         signals = pd.DataFrame(index=data.index)
         signals['call'] = np.nan
         
-        current_position = 0
-        stop_loss = np.nan
-        profit_target = np.nan
-        entry_price = np.nan
-        
-        for i in range(8, len(data)):  # 从第9根K线开始（因为需要8根K线的历史数据）
-            if current_position == 0:  # 空仓状态
-                # 开多仓条件
-                if (data['MarketStrength'].iloc[i-1] >= self.params['EntryStrength'] and
-                    data['Momentum1'].iloc[i-1] >= 0 and
-                    data['Momentum2'].iloc[i-1] < 0 and
-                    data['high'].iloc[i] >= data['HH'].iloc[i-1] and
-                    data['vol'].iloc[i] > 0):
-                    
-                    entry_price = max(data['open'].iloc[i], data['HH'].iloc[i-1])
-                    stop_loss = data['LL2'].iloc[i]
-                    profit_target = entry_price + (entry_price - stop_loss) * self.params['ProfitFactor']
-                    
-                    signals.iloc[i] = [1]
-                    current_position = 1
-            
-            elif current_position == 1:  # 持有多仓
-                if data['vol'].iloc[i] > 0:
-                    # 止盈
-                    if data['high'].iloc[i] >= profit_target:
-                        signals.iloc[i] = [0]
-                        current_position = 0
-                    
-                    # 止损
-                    elif data['low'].iloc[i] <= stop_loss:
-                        signals.iloc[i] = [0]
-                        current_position = 0
-                    
-                    # 反向出场
-                    elif (data['MarketStrength'].iloc[i-1] <= -1 * self.params['EntryStrength'] and
-                          data['Momentum1'].iloc[i-1] < 0 and
-                          data['Momentum2'].iloc[i-1] >= 0 and
-                          data['low'].iloc[i] <= data['LL1'].iloc[i-1]):
-                        signals.iloc[i] = [0]
-                    current_position = 0
-        
-        # 循环结束时强制平仓
-        if current_position == 1:
-            signals.iloc[i] = [0]
-        
-        return signals 
+        # 开多仓条件：市场强势，短期动量转正，最高价突破前一根Bar的Length周期高点，成交量大于0
+        hh = data['HH'].shift(1)
+        entries = ((data['MarketStrength'].shift(1) >= self.params['EntryStrength']) &
+                   (data['Momentum1'].shift(1) >= 0) &
+                   (data['Momentum2'].shift(1) < 0) &
+                   (data['high'] >= hh) &
+                   (data['vol'] > 0))
+        
+        # 入场价不低于通道高点；止损为入场Bar的Stop_Len周期低点，止盈为入场价加上ProfitFactor倍的止损距离
+        entry_price = np.where(hh > data['open'], hh, data['open'])
+        stop_loss = data['LL2'].to_numpy()
+        profit_target = entry_price + (entry_price - stop_loss) * self.params['ProfitFactor']
+        
+        # 反向出场：市场弱势，短期动量转负，最低价跌破前一根Bar的Length周期低点
+        exits = ((data['MarketStrength'].shift(1) <= -1 * self.params['EntryStrength']) &
+                 (data['Momentum1'].shift(1) < 0) &
+                 (data['Momentum2'].shift(1) >= 0) &
+                 (data['low'] <= data['LL1'].shift(1)))
+        
+        # 持仓后第一根有成交量的Bar无论是否触发出场条件都结束持仓，未触发时不产生平仓信号
+        return self.position_signals(data, entries, side=1, entry_price=entry_price, exits=exits,
+                                     entry_stop=stop_loss, entry_target=profit_target,
+                                     max_bars=1, tradable=data['vol'] > 0, start=8,
+                                     silent_exits=(EXIT_TIME,))
 
 
 #########################主函数#########################
@@ -177,18 +159,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = SupermanSystem_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
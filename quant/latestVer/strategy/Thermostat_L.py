@@ -55,6 +55,10 @@ class Thermostat_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
 
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(30, self.params['bollingerLengths'], self.params['trendLiqLength'], self.params['atrLength'] + 1)
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         try:
@@ -125,62 +129,29 @@ class Thermostat_L(StrategyBase):
     def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
         """生成交易信号矩阵"""
         try:
-            signals = pd.DataFrame(index=data.index)
-            signals['call'] = np.nan
-            
-            current_position = 0
-            swing_entry = False
-            position_bars = 0
-            entry_price = 0  # 记录入场价格
-            
-            for i in range(1, len(data)):
-                if current_position == 0:  # 无持仓
-                    # 震荡市做多: 当价格突破swingBuyPt时开多
-                    if data['cmiVal'].iloc[i-1] < self.params['swingTrendSwitch']:
-                        if data['high'].iloc[i] >= data['swingBuyPt'].iloc[i]:
-                            signals.iloc[i] = 1  # 做多信号
-                            current_position = 1
-                            swing_entry = True
-                            position_bars = 0
-                            entry_price = data['swingBuyPt'].iloc[i]  # 记录入场价格
-                    # 趋势市做多: 当价格突破布林上轨时开多
-                    elif not swing_entry and data['high'].iloc[i] >= data['trendBuyPt'].iloc[i-1]:
-                        signals.iloc[i] = 1  # 做多信号
-                        current_position = 1
-                        position_bars = 0
-                        entry_price = data['trendBuyPt'].iloc[i-1]  # 记录入场价格
-                        
-                elif current_position == 1:  # 持有多仓
-                    position_bars += 1
-                    # 震荡市平仓: 当价格跌破swingSellPt时平多
-                    if data['cmiVal'].iloc[i-1] < self.params['swingTrendSwitch']:
-                        if position_bars >= 1 and data['low'].iloc[i] <= data['swingSellPt'].iloc[i]:
-                            signals.iloc[i] = 0  # 平多信号
-                            current_position = 0
-                            swing_entry = False
-                            position_bars = 0
-                    # 趋势市
-                    else:
-                        if swing_entry:  # 震荡市进场的多单在趋势市平仓: 当价格跌破ATR止损线时平多
-                            if (position_bars >= 1 and 
-                                data['low'].iloc[i] <= (entry_price - data['swingProtStop'].iloc[i-1])):
-                                signals.iloc[i] = 0  # 平多信号
-                                current_position = 0
-                                swing_entry = False
-                                position_bars = 0
-                        else:  # 趋势市平仓: 当价格跌破布林下轨或均线时平多
-                            if (position_bars >= 1 and 
-                                data['low'].iloc[i] <= max(data['trendSellPt'].iloc[i-1], 
-                                                         data['trendProtStop'].iloc[i-1])):
-                                signals.iloc[i] = 0  # 平多信号
-                                current_position = 0
-                                position_bars = 0
-
-            # 最后一根K线强制平多仓
-            if current_position == 1:
-                signals.iloc[-1] = 0  # 平多信号
-                
-            return signals
+            # 前一根Bar的潮汐指数低于阈值为震荡市，否则为趋势市
+            swing_market = (data['cmiVal'].shift(1) < self.params['swingTrendSwitch']).to_numpy()
+            
+            # 震荡市做多(类别1): 当价格突破swingBuyPt时开多，以swingBuyPt入场
+            # 趋势市做多(类别2): 当价格突破前一根Bar的布林上轨时开多，以该上轨入场
+            trend_buy_pt = data['trendBuyPt'].shift(1)
+            swing_long = swing_market & (data['high'] >= data['swingBuyPt']).to_numpy()
+            trend_long = ~swing_market & (data['high'] >= trend_buy_pt).to_numpy()
+            entries = np.where(swing_long, 1, np.where(trend_long, 2, 0))
+            entry_price = np.where(swing_long, data['swingBuyPt'], trend_buy_pt)
+            
+            # 出场：震荡市中价格跌破swingSellPt时平多；趋势市中震荡市进场的多单跌破
+            # 入场价 - ATR止损距离时平多，趋势市进场的多单跌破布林下轨与均线中较高者时平多
+            trend_sell_pt = data['trendSellPt'].shift(1).to_numpy()
+            trend_prot_stop = data['trendProtStop'].shift(1).to_numpy()
+            trend_stop = np.where(trend_prot_stop > trend_sell_pt, trend_prot_stop, trend_sell_pt)
+            swing_sell_pt = data['swingSellPt'].to_numpy()
+            stops = [np.where(swing_market, swing_sell_pt, np.nan),
+                     np.where(swing_market, swing_sell_pt, trend_stop)]
+            stop_offsets = [np.where(swing_market, np.nan, data['swingProtStop'].shift(1)), None]
+            
+            return self.position_signals(data, entries, side=1, entry_price=entry_price,
+                                         stops=stops, stop_offsets=stop_offsets, start=1)
             
         except Exception as e:
             raise
@@ -225,18 +196,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = Thermostat_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -51,6 +51,10 @@ class Trading_Range_Breakout_S(StrategyBase):
             'Lots': 1         # 交易手数
         })
     
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return 2 * self.params['RangeLen'] + 1
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         # 计算7周期高低点
@@ -174,18 +178,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = Trading_Range_Breakout_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
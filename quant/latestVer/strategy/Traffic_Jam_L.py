@@ -53,114 +53,31 @@ class Traffic_Jam_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
 
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.EMA_WARMUP_FACTOR * self.params['DMI_N'] + self.params['DMI_M'], self.params['ATRLength'], self.params['ConsecBars'] + 1)
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
         
-        # Initialize DMI components
-        df['DMI_Plus'] = np.nan
-        df['DMI_Minus'] = np.nan
-        df['ADX'] = np.nan
-        df['ADXR'] = np.nan
-        df['Volty'] = np.nan
-        
-        # Calculate True Range
-        tr = TrueRange(df['high'], df['low'], df['close'])
-        
         # DMI calculation following TradeBlazer logic
-        sf = 1/self.params['DMI_N']
-        sum_plus_dm = 0
-        sum_minus_dm = 0
-        sum_tr = 0
-        avg_plus_dm = 0
-        avg_minus_dm = 0
-        s_volty = 0
-        
-        # Initialize cumulative DMI for ADX calculation
-        cumm_dmi = 0
-        
-        for i in range(len(df)):
-            if i == 0:
-                continue
-            
-            # Calculate moves exactly as TradeBlazer
-            upper_move = df['high'].iloc[i] - df['high'].iloc[i-1]
-            lower_move = df['low'].iloc[i-1] - df['low'].iloc[i]
-            
-            plus_dm = 0
-            minus_dm = 0
-            
-            if upper_move > lower_move and upper_move > 0:
-                plus_dm = upper_move
-            elif lower_move > upper_move and lower_move > 0:
-                minus_dm = lower_move
-            
-            if i == self.params['DMI_N']:
-                # Initial calculation at DMI_N period - matches TradeBlazer
-                for j in range(self.params['DMI_N']):
-                    idx = i - j
-                    upper_move_init = df['high'].iloc[idx] - df['high'].iloc[idx-1]
-                    lower_move_init = df['low'].iloc[idx-1] - df['low'].iloc[idx]
-                    
-                    plus_dm_init = 0
-                    minus_dm_init = 0
-                    
-                    if upper_move_init > lower_move_init and upper_move_init > 0:
-                        plus_dm_init = upper_move_init
-                    elif lower_move_init > upper_move_init and lower_move_init > 0:
-                        minus_dm_init = lower_move_init
-                    
-                    sum_plus_dm += plus_dm_init
-                    sum_minus_dm += minus_dm_init
-                    sum_tr += tr.iloc[idx]
-                
-                avg_plus_dm = sum_plus_dm / self.params['DMI_N']
-                avg_minus_dm = sum_minus_dm / self.params['DMI_N']
-                s_volty = sum_tr / self.params['DMI_N']
-                
-            elif i > self.params['DMI_N']:
-                # Subsequent calculations using smoothing - matches TradeBlazer
-                avg_plus_dm = avg_plus_dm + sf * (plus_dm - avg_plus_dm)
-                avg_minus_dm = avg_minus_dm + sf * (minus_dm - avg_minus_dm)
-                s_volty = s_volty + sf * (tr.iloc[i] - s_volty)
-            
-            if s_volty > 0:
-                df.loc[df.index[i], 'DMI_Plus'] = 100 * avg_plus_dm / s_volty
-                df.loc[df.index[i], 'DMI_Minus'] = 100 * avg_minus_dm / s_volty
-            else:
-                df.loc[df.index[i], 'DMI_Plus'] = 0
-                df.loc[df.index[i], 'DMI_Minus'] = 0
-            
-            # Calculate DMI and ADX exactly as TradeBlazer
-            divisor = df['DMI_Plus'].iloc[i] + df['DMI_Minus'].iloc[i]
-            if divisor > 0:
-                dmi = 100 * abs(df['DMI_Plus'].iloc[i] - df['DMI_Minus'].iloc[i]) / divisor
-            else:
-                dmi = 0
-            
-            cumm_dmi += dmi
-            
-            if i > 0:
-                if i <= self.params['DMI_N']:
-                    df.loc[df.index[i], 'ADX'] = cumm_dmi / i if i > 0 else dmi
-                    df.loc[df.index[i], 'ADXR'] = (df['ADX'].iloc[i] + df['ADX'].iloc[i-1]) * 0.5
-                else:
-                    df.loc[df.index[i], 'ADX'] = df['ADX'].iloc[i-1] + sf * (dmi - df['ADX'].iloc[i-1])
-                    df.loc[df.index[i], 'ADXR'] = (df['ADX'].iloc[i] + df['ADX'].iloc[i-self.params['DMI_M']]) * 0.5
+        # 第DMI_N根之前DI为0、ADX取DX的累计均值，方向移动和波幅按输入精度平滑
+        dmi = DMI(df['high'], df['low'], df['close'], self.params['DMI_N'], self.params['DMI_M'])
+        df['DMI_Plus'] = dmi['DMIPlus'].to_numpy()
+        df['DMI_Minus'] = dmi['DMIMinus'].to_numpy()
+        df['ADX'] = dmi['ADX'].to_numpy()
+        df['ADXR'] = dmi['ADXR'].to_numpy()
+        df['Volty'] = np.nan
         
         # Calculate ATR
         df['ATR'] = AvgTrueRange(self.params['ATRLength'], df['high'], df['low'], df['close'])
         
         # Calculate consecutive down bars exactly as TradeBlazer's CountIf
-        df['ConsecBarsCount'] = 0
-        for i in range(len(df)):
-            if i < self.params['ConsecBars']:
-                continue
-            count = 0
-            for j in range(self.params['ConsecBars']):
-                if df['close'].iloc[i-j] < df['close'].iloc[i-j-1]:
-                    count += 1
-            df.loc[df.index[i], 'ConsecBarsCount'] = count
+        # 最近ConsecBars根中收盘低于前根的个数，前ConsecBars根为0
+        consec_bars = CountIf(df['close'] < df['close'].shift(1), self.params['ConsecBars']).to_numpy().astype(np.int64)
+        consec_bars[:self.params['ConsecBars']] = 0
+        df['ConsecBarsCount'] = consec_bars
         
         # Calculate protection stop level
         df['ProtectStopL'] = df['low'] - self.params['ProtectStopATRMulti'] * df['ATR']
@@ -256,18 +173,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = Traffic_Jam_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
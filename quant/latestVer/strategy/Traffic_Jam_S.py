@@ -53,86 +53,26 @@ class Traffic_Jam_S(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
 
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.EMA_WARMUP_FACTOR * self.params['DMI_N'] + self.params['DMI_M'], self.params['ATRLength'], self.params['ConsecBars'] + 1)
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
-        n = self.params['DMI_N']
-        
-        # Calculate True Range
-        tr = TrueRange(df['high'], df['low'], df['close'])
         
-        # Initialize DMI variables
-        df['DMI_plus'] = pd.Series(np.nan, index=df.index)
-        df['DMI_minus'] = pd.Series(np.nan, index=df.index)
-        df['DMI'] = pd.Series(np.nan, index=df.index)
-        df['ADX'] = pd.Series(np.nan, index=df.index)
-        df['ADXR'] = pd.Series(np.nan, index=df.index)
-        df['Volty'] = pd.Series(np.nan, index=df.index)
-        df['avg_plus_dm'] = pd.Series(np.nan, index=df.index)
-        df['avg_minus_dm'] = pd.Series(np.nan, index=df.index)
-        
-        # Smoothing factor
-        sf = 1.0 / n
-        
-        # Initial calculation at bar N
-        for i in range(n, len(df)):
-            if i == n:
-                # Calculate initial sums exactly as TradeBlazor
-                sum_plus_dm = 0
-                sum_minus_dm = 0
-                sum_tr = 0
-                
-                for j in range(n):
-                    upper_move = df['high'].iloc[i-j] - df['high'].iloc[i-j-1]
-                    lower_move = df['low'].iloc[i-j-1] - df['low'].iloc[i-j]
-                    
-                    plus_dm = upper_move if (upper_move > lower_move and upper_move > 0) else 0
-                    minus_dm = lower_move if (lower_move > upper_move and lower_move > 0) else 0
-                    
-                    sum_plus_dm += plus_dm
-                    sum_minus_dm += minus_dm
-                    sum_tr += tr.iloc[i-j]
-                
-                df.loc[df.index[i], 'avg_plus_dm'] = sum_plus_dm / n
-                df.loc[df.index[i], 'avg_minus_dm'] = sum_minus_dm / n
-                df.loc[df.index[i], 'Volty'] = sum_tr / n
-                
-            elif i > n:
-                # Calculate smoothed values exactly as TradeBlazor
-                upper_move = df['high'].iloc[i] - df['high'].iloc[i-1]
-                lower_move = df['low'].iloc[i-1] - df['low'].iloc[i]
-                
-                plus_dm = upper_move if (upper_move > lower_move and upper_move > 0) else 0
-                minus_dm = lower_move if (lower_move > upper_move and lower_move > 0) else 0
-                
-                df.loc[df.index[i], 'avg_plus_dm'] = df['avg_plus_dm'].iloc[i-1] + sf * (plus_dm - df['avg_plus_dm'].iloc[i-1])
-                df.loc[df.index[i], 'avg_minus_dm'] = df['avg_minus_dm'].iloc[i-1] + sf * (minus_dm - df['avg_minus_dm'].iloc[i-1])
-                df.loc[df.index[i], 'Volty'] = df['Volty'].iloc[i-1] + sf * (tr.iloc[i] - df['Volty'].iloc[i-1])
-            
-            # Calculate DMI values
-            if df['Volty'].iloc[i] > 0:
-                df.loc[df.index[i], 'DMI_plus'] = 100 * df['avg_plus_dm'].iloc[i] / df['Volty'].iloc[i]
-                df.loc[df.index[i], 'DMI_minus'] = 100 * df['avg_minus_dm'].iloc[i] / df['Volty'].iloc[i]
-            else:
-                df.loc[df.index[i], 'DMI_plus'] = 0
-                df.loc[df.index[i], 'DMI_minus'] = 0
-            
-            # Calculate DX and DMI
-            divisor = df['DMI_plus'].iloc[i] + df['DMI_minus'].iloc[i]
-            if divisor > 0:
-                dx = 100 * abs(df['DMI_plus'].iloc[i] - df['DMI_minus'].iloc[i]) / divisor
-            else:
-                dx = 0
-            df.loc[df.index[i], 'DMI'] = dx
-            
-            # Calculate ADX exactly as TradeBlazor
-            if i > 0:
-                if i <= n:
-                    df.loc[df.index[i], 'ADX'] = df['DMI'].iloc[:i+1].sum() / (i + 1)
-                    df.loc[df.index[i], 'ADXR'] = (df['ADX'].iloc[i] + df['ADX'].iloc[i-1]) * 0.5
-                else:
-                    df.loc[df.index[i], 'ADX'] = df['ADX'].iloc[i-1] + sf * (dx - df['ADX'].iloc[i-1])
-                    df.loc[df.index[i], 'ADXR'] = (df['ADX'].iloc[i] + df['ADX'].iloc[i-self.params['DMI_M']]) * 0.5
+        # DMI calculation exactly as TradeBlazor
+        # 从第DMI_N根起计算，ADX以DX/(DMI_N+1)为初值，平滑按float64计算
+        dmi = DMI(df['high'], df['low'], df['close'], self.params['DMI_N'], self.params['DMI_M'],
+                  smooth_dtype=np.float64, running_adx=False)
+        df['DMI_plus'] = dmi['DMIPlus'].to_numpy()
+        df['DMI_minus'] = dmi['DMIMinus'].to_numpy()
+        df['DMI'] = dmi['DX'].to_numpy()
+        df['ADX'] = dmi['ADX'].to_numpy()
+        df['ADXR'] = dmi['ADXR'].to_numpy()
+        df['Volty'] = dmi['Volty'].to_numpy()
+        df['avg_plus_dm'] = dmi['AvgPlusDM'].to_numpy()
+        df['avg_minus_dm'] = dmi['AvgMinusDM'].to_numpy()
         
         # Calculate ATR
         df['ATR'] = AvgTrueRange(self.params['ATRLength'], df['high'], df['low'], df['close'])
@@ -231,18 +171,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = Traffic_Jam_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -52,21 +52,19 @@ class TrendScore_L(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
         
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['LookBack'] + self.params['MALength'], self.params['ATRLength'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
         
-        # 计算趋势得分
-        df['TrendScore'] = 0
-        for i in range(len(df)):
-            temp = 0
-            for j in range(1, self.params['LookBack'] + 1):
-                if i - j >= 0:  # 确保索引有效
-                    if df['close'].iloc[i] >= df['close'].iloc[i-j]:
-                        temp += 1
-                    else:
-                        temp -= 1
-            df.loc[df.index[i], 'TrendScore'] = temp
+        # 计算趋势得分：与前LookBack根K线(开头不足时为已有的K线)逐一比较收盘价，
+        # 不低于该K线记+1，否则记-1
+        lookback = self.params['LookBack']
+        compared = np.minimum(np.arange(len(df)), lookback)
+        df['TrendScore'] = 2 * RankCount(df['close'], lookback).to_numpy() - compared
             
         # 计算均线和ATR
         df['MA'] = Average(df['close'], self.params['MALength'])
@@ -89,50 +87,22 @@ class TrendScore_L(StrategyBase):
         signals = pd.DataFrame(index=data.index)
         signals['call'] = np.nan
         
-        current_position = 0
-        entry_price = 0
-        position_bars = 0
-        high_after_entry = 0
-        protect_stop = 0
-        
-        for i in range(1, len(data)):
-            if current_position == 0:  # 未持仓
-                # 入场条件检查
-                if (data['close'].iloc[i-1] >= data['MA'].iloc[i-1] and 
-                    data['TrendScore'].iloc[i-1] >= data['TrendScoreMA'].iloc[i-1]):
-                    signals.iloc[i] = [1]
-                    current_position = 1
-                    entry_price = data['open'].iloc[i]
-                    high_after_entry = data['high'].iloc[i]
-                    protect_stop = (data['low'].iloc[i-1] - 
-                                  self.params['ProtectStopATRMulti'] * data['ATR'].iloc[i-1])
-                    position_bars = 0
-                    
-            elif current_position == 1:  # 持有多仓
-                position_bars += 1
-                high_after_entry = max(high_after_entry, data['high'].iloc[i])
-                
-                # 计算各种止损价位
-                trail_stop = (high_after_entry - 
-                            self.params['TrailStopATRMulti'] * data['ATR'].iloc[i-1])
-                break_even_stop = entry_price
-                
-                # 确定出场线
-                if high_after_entry >= (entry_price + 
-                                      self.params['BreakEvenStopATRMulti'] * data['ATR'].iloc[i-1]):
-                    exit_line = max(trail_stop, break_even_stop)
-                else:
-                    exit_line = max(trail_stop, protect_stop)
-                
-                # 检查是否触发止损
-                if data['low'].iloc[i] <= exit_line:
-                    signals.iloc[i] = [0]
-                    current_position = 0
-                    position_bars = 0
+        # 入场条件：前一根Bar收盘价不低于均线，且趋势得分不低于其均线
+        entries = ((data['close'].shift(1) >= data['MA'].shift(1)) &
+                   (data['TrendScore'].shift(1) >= data['TrendScoreMA'].shift(1)))
         
-        # 在最后一根K线强制平仓
-        if current_position == 1:
-            signals.iloc[-1] = [0]
+        # 出场线：跟踪止损(入场后最高价 - TrailStopATRMulti × ATR)与保护性止损
+        # (入场前一根Bar最低价 - ProtectStopATRMulti × ATR)取较高者；入场后最高价达到
+        # 入场价 + BreakEvenStopATRMulti × ATR时，保护性止损改为保本止损(入场价)
+        atr = data['ATR'].shift(1)
+        stops = BreakevenStop(data['high'], data['low'], entries,
+                              entry_price=data['open'],
+                              trigger=self.params['BreakEvenStopATRMulti'] * atr,
+                              initial_stop=data['low'].shift(1) - self.params['ProtectStopATRMulti'] * atr,
+                              trail_offset=self.params['TrailStopATRMulti'] * atr,
+                              side=1)
+        # 开平仓信号，最后一根K线仍有持仓时强制平仓
+        signals['call'] = position_calls(stops['Position'], close_at_end=True)
             
         return signals
 
@@ -177,18 +147,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = TrendScore_L()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -52,21 +52,19 @@ class TrendScore_S(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
         
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['LookBack'] + self.params['MALength'], self.params['ATRLength'])
+
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标"""
         df = data.copy()
         
-        # K线打分计算
-        df['TrendScore'] = 0
-        for i in range(len(df)):
-            temp = 0
-            if i >= self.params['LookBack']:
-                for j in range(1, self.params['LookBack'] + 1):
-                    if df['close'].iloc[i] >= df['close'].iloc[i-j]:
-                        temp += 1
-                    else:
-                        temp -= 1
-                df.loc[df.index[i], 'TrendScore'] = temp
+        # K线打分计算：与前LookBack根K线逐一比较收盘价，不低于该K线记+1，否则记-1；
+        # 不足LookBack根K线时为0
+        lookback = self.params['LookBack']
+        score = 2 * RankCount(df['close'], lookback).to_numpy() - lookback
+        df['TrendScore'] = np.where(np.arange(len(df)) >= lookback, score, 0)
                 
         # 均线和ATR计算
         df['MA'] = Average(df['close'], self.params['MALength'])
@@ -86,48 +84,22 @@ class TrendScore_S(StrategyBase):
         signals = pd.DataFrame(index=data.index)
         signals['call'] = np.nan
         
-        current_position = 0
-        entry_price = 0
-        position_bars = 0
-        low_after_entry = float('inf')
-        protect_stop = 0
+        # 入场条件：前一根Bar收盘价不高于均线，且趋势得分不高于其均线
+        entries = ((data['close'].shift(1) <= data['MA'].shift(1)) &
+                   (data['TrendScore'].shift(1) <= data['TrendScoreMA'].shift(1)))
         
-        for i in range(1, len(data)):
-            if current_position == 0:  # 空仓
-                # 入场条件检查
-                if (data['close'].iloc[i-1] <= data['MA'].iloc[i-1] and 
-                    data['TrendScore'].iloc[i-1] <= data['TrendScoreMA'].iloc[i-1]):
-                    signals.iloc[i] = [-1]
-                    current_position = -1
-                    entry_price = data['open'].iloc[i]
-                    position_bars = 0
-                    low_after_entry = data['low'].iloc[i]
-                    protect_stop = data['high'].iloc[i-1] + self.params['ProtectStopATRMulti'] * data['ATR'].iloc[i-1]
-                    
-            elif current_position == -1:  # 持有空仓
-                position_bars += 1
-                low_after_entry = min(low_after_entry, data['low'].iloc[i])
-                
-                # 计算各种止损价位
-                trail_stop = low_after_entry + self.params['TrailStopATRMulti'] * data['ATR'].iloc[i-1]
-                break_even_stop = entry_price
-                
-                # 确定出场线
-                if low_after_entry <= (break_even_stop - self.params['BreakEvenStopATRMulti'] * data['ATR'].iloc[i-1]):
-                    exit_line = min(trail_stop, break_even_stop)
-                else:
-                    exit_line = min(trail_stop, protect_stop)
-                
-                # 检查出场条件
-                if data['high'].iloc[i] >= exit_line:
-                    exit_price = max(data['open'].iloc[i], exit_line)
-                    signals.iloc[i] = [0]
-                    current_position = 0
-                    position_bars = 0
-                    
-        # 在最后一根K线强制平仓
-        if current_position == -1:
-            signals.iloc[-1] = [0]
+        # 出场线：跟踪止损(入场后最低价 + TrailStopATRMulti × ATR)与保护性止损
+        # (入场前一根Bar最高价 + ProtectStopATRMulti × ATR)取较低者；入场后最低价达到
+        # 入场价 - BreakEvenStopATRMulti × ATR时，保护性止损改为保本止损(入场价)
+        atr = data['ATR'].shift(1)
+        stops = BreakevenStop(data['high'], data['low'], entries,
+                              entry_price=data['open'],
+                              trigger=self.params['BreakEvenStopATRMulti'] * atr,
+                              initial_stop=data['high'].shift(1) + self.params['ProtectStopATRMulti'] * atr,
+                              trail_offset=self.params['TrailStopATRMulti'] * atr,
+                              side=-1)
+        # 开平仓信号，最后一根K线仍有持仓时强制平仓
+        signals['call'] = position_calls(stops['Position'], close_at_end=True)
             
         return signals
 
@@ -172,18 +144,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = TrendScore_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
@@ -58,20 +58,34 @@ class VWM_S(StrategyBase):
             default_params.update(params)
         super().__init__(default_params)
     
-    def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
-        """计算策略所需的技术指标"""
-        df = data.copy()
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.params['MomLen'] + self.EMA_WARMUP_FACTOR * self.params['AvgLen'], self.params['ATRLen'])
+
+    def shared_key(self):
+        """多空两边的VWM和ATR只取决于MomLen、AvgLen和ATRLen"""
+        return ('VWM', self.params['MomLen'], self.params['AvgLen'], self.params['ATRLen'])
+
+    def shared_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
+        """计算VWM、ATR及VWM穿越零轴的信号"""
+        df = pd.DataFrame(index=data.index)
         
         # 计算基础指标
-        df['Momentum'] = Momentum(df['close'], self.params['MomLen'])
-        df['VWM'] = XAverage(df['vol'] * df['Momentum'], self.params['AvgLen'])
-        df['AATR'] = AvgTrueRange(self.params['ATRLen'], df['high'], df['low'], df['close'])
+        df['Momentum'] = Momentum(data['close'], self.params['MomLen'])
+        df['VWM'] = XAverage(data['vol'] * df['Momentum'], self.params['AvgLen'])
+        df['AATR'] = AvgTrueRange(self.params['ATRLen'], data['high'], data['low'], data['close'])
         
         # 生成交易信号
         zero_series = pd.Series(0, index=df.index)
         df['BullSetup'] = CrossOver(df['VWM'], zero_series)  # VWM上穿0
         df['BearSetup'] = CrossUnder(df['VWM'], zero_series)  # VWM下穿0
         
+        return df
+
+    def calculate_indicators(self, data: pd.DataFrame, shared: pd.DataFrame = None) -> pd.DataFrame:
+        """计算策略所需的技术指标，shared为LongShortPair传入的共用指标"""
+        df = data.join(self.shared_indicators(data) if shared is None else shared)
+        
         # 计算做空设置
         df['SSetup'] = np.where(df['BearSetup'], 0, np.nan)  # 初始化做空计数器
         df['SEPrice'] = np.where(df['BearSetup'], df['close'], np.nan)  # 记录触发价格
@@ -80,57 +94,23 @@ class VWM_S(StrategyBase):
         
         return df
     
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """生成交易信号矩阵"""
+    def position_rules(self, data: pd.DataFrame) -> Dict:
+        """入场条件及出场规则"""
         # 数据验证
         if len(data) < self.params['AvgLen']:
             raise ValueError('数据长度不足')
         
-        signals = pd.DataFrame(index=data.index)
-        signals['call'] = np.nan
+        # 开空仓条件：最低价跌破 触发价 - ATRPcnt × ATR，触发后不超过SetupLen根Bar，成交量大于0
+        entries = ((data['low'] <= data['SEPrice'].shift(1) - self.params['ATRPcnt'] * data['AATR'].shift(1)) &
+                   (data['SSetup'].shift(1) <= self.params['SetupLen']) &
+                   (data['SSetup'] >= 1) &
+                   (data['vol'] > 0))
         
-        # 使用.values提高性能
-        low = data['low'].values
-        open_ = data['open'].values
-        vol = data['vol'].values
-        se_price = data['SEPrice'].values
-        atr = data['AATR'].values
-        s_setup = data['SSetup'].values
-        bull_setup = data['BullSetup'].values
+        # 平空仓条件：前一根Bar VWM上穿0，成交量大于0
+        bull_setup = data['BullSetup'].to_numpy().astype(bool)
+        exits = np.concatenate(([False], bull_setup[:-1]))
         
-        current_position = 0
-        position_bars = 0
-        
-        for i in range(self.params['AvgLen'], len(data)):
-            if current_position != 0:
-                position_bars += 1
-            
-            # 开空仓条件
-            if (current_position == 0 and
-                low[i] <= se_price[i-1] - (self.params['ATRPcnt'] * atr[i-1]) and 
-                s_setup[i-1] <= self.params['SetupLen'] and
-                s_setup[i] >= 1 and
-                vol[i] > 0):
-                
-                signals.iloc[i] = [-1]
-                current_position = -1
-                position_bars = 0
-            
-            # 平空仓条件
-            elif (current_position == -1 and
-                  bull_setup[i-1] and
-                  vol[i] > 0 and
-                  position_bars > 0):
-                
-                signals.iloc[i] = [0]
-                current_position = 0
-                position_bars = 0
-        
-        # 循环结束时强制平仓
-        if current_position == -1:
-            signals.iloc[i] = [0]
-        
-        return signals
+        return dict(entries=entries, side=-1, exits=exits, tradable=data['vol'] > 0, start=self.params['AvgLen'])
 
 
 #########################主函数#########################
@@ -172,18 +152,7 @@ def main():
 
         # 先计算所有品种的信号
         strategy = VWM_S()
-        signals_dict = {}
-        
-        for code, data in data_dict.items():
-            try:
-                # 计算指标和信号
-                data_with_indicators = strategy.calculate_indicators(data)
-                signals = strategy.generate_signals(data_with_indicators)
-                if isinstance(signals, pd.DataFrame) and len(signals) > 0:
-                    signals_dict[code] = signals
-            except Exception as e:
-                logger.error(f"计算{code}信号时出错: {e}")
-                continue
+        signals_dict = compute_signals(strategy, data_dict, logger)
         
         # 将信号字典传入回测器
         backtester = Backtester(
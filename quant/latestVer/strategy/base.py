@@ -1,16 +1,169 @@
-from typing import Dict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 
+
+class BarArrays:
+    """
+    行情与指标数据的数组视图
+
+    把DataFrame的每一列(open、high、low、close、vol及各指标列)转为连续的NumPy数组，
+    可以按属性(arrays.close)或列名(arrays['close'])访问，逐Bar循环中按下标取值不经过pandas
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], index: pd.Index = None):
+        self._columns = columns
+        self.index = index
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> 'BarArrays':
+        """
+        由行情及指标数据构造
+
+        参数:
+            data (pd.DataFrame): calculate_indicators返回的数据
+
+        返回:
+            BarArrays: 各列保持原有数据类型的连续数组
+        """
+        columns = {str(c): np.ascontiguousarray(data[c].to_numpy()) for c in data.columns}
+        return cls(columns, data.index)
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.__dict__['_columns'][name]
+        except KeyError:
+            raise AttributeError(f"数据中没有{name}列") from None
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __len__(self) -> int:
+        return len(self.index) if self.index is not None else len(next(iter(self._columns.values()), ()))
+
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+
 class StrategyBase:
     """策略基类"""
+    # EMA等递归平滑指标的预热倍数：经过3倍周期后初始值的权重已不足0.3%
+    EMA_WARMUP_FACTOR = 3
+
     def __init__(self, params: Dict = None):
         self.params = params or {}
 
         # 添加默认交易数量
         self.default_quantity = 1
     
+    def get_lookback(self) -> int:
+        """
+        指标计算所需的最大回溯K线数
+
+        加载数据时会在起始日期之前多取这么多根K线用于指标预热，子类按自身参数覆盖
+        """
+        return 0
+    
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         raise NotImplementedError("子类必须实现calculate_indicators方法")
+
+    def shared_key(self) -> Optional[Tuple]:
+        """
+        与另一方向策略共用的指标的标识
+
+        同一系统的多空两边(如 KeltnerChannel_L 和 KeltnerChannel_S)在参数相同时计算出相同的
+        指标列。返回值相等的两个策略由 LongShortPair 只调用一次shared_indicators，
+        结果以calculate_indicators(data, shared)传给两边。None表示没有可共用的指标
+        """
+        return None
+
+    def shared_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        计算可与另一方向策略共用的指标列
+
+        参数:
+            data (pd.DataFrame): 行情数据
+
+        返回:
+            pd.DataFrame: 只含共用指标列，索引与data相同
+        """
+        raise NotImplementedError("实现shared_key的子类必须实现shared_indicators方法")
     
     def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        raise NotImplementedError("子类必须实现generate_signals方法")
\ No newline at end of file
+        """
+        生成交易信号矩阵
+
+        子类可以直接实现本方法，也可以只实现position_rules(由单仓位状态机生成信号)，
+        或generate_positions：此时把数据转为BarArrays，由逐Bar仓位得到call列
+        (仓位变为非零值的Bar为新仓位，变为0的Bar为0，最后一根Bar强制平仓)
+        """
+        if type(self).position_rules is not StrategyBase.position_rules:
+            return self.position_signals(data, **self.position_rules(data))
+        if type(self).generate_positions is StrategyBase.generate_positions:
+            raise NotImplementedError("子类必须实现generate_signals方法")
+        # module.backtest 引用了本模块，在此处导入以避免循环导入
+        from module.position_engine import position_calls
+
+        position = np.asarray(self.generate_positions(BarArrays.from_frame(data)))
+        if position.shape != (len(data),):
+            raise ValueError(f"generate_positions返回的仓位长度为{position.shape}，数据长度为{len(data)}")
+        signals = pd.DataFrame(index=data.index)
+        signals['call'] = position_calls(position.astype(np.int8, copy=False))
+        return signals
+
+    def generate_positions(self, arrays: BarArrays) -> np.ndarray:
+        """
+        由数组生成每根Bar结束时的仓位
+
+        参数:
+            arrays (BarArrays): calculate_indicators返回数据的数组视图
+
+        返回:
+            np.ndarray: 每根Bar结束时的仓位(int8)，1-多头, -1-空头, 0-空仓
+        """
+        raise NotImplementedError("子类必须实现generate_positions方法")
+
+    def position_rules(self, data: pd.DataFrame) -> Dict:
+        """
+        给出单仓位状态机的入场条件及出场规则
+
+        实现本方法的策略由generate_signals调用position_signals生成信号；LongShortPair
+        组合两个实现了本方法的策略时，在同一次run_position_legs中推进两边的仓位
+
+        参数:
+            data (pd.DataFrame): calculate_indicators返回的数据
+
+        返回:
+            Dict: position_signals除data以外的参数(entries、side、exit_call、silent_exits及出场规则)
+        """
+        raise NotImplementedError("子类必须实现position_rules方法")
+
+    def position_signals(self, data: pd.DataFrame, entries, side: int = 1, exit_call: float = 0,
+                         silent_exits: Iterable[int] = (), **rules) -> pd.DataFrame:
+        """
+        用单仓位状态机生成信号矩阵
+
+        策略按数组给出入场条件及出场规则(见 module.position_engine.run_positions)，
+        开仓Bar的call为side，平仓Bar为exit_call，最后一根Bar仍有持仓时强制平仓
+
+        参数:
+            data (pd.DataFrame): 含high、low列的行情及指标数据
+            entries: 入场条件，布尔数组或入场类别
+            side (int): 1-多头, -1-空头
+            exit_call (float): 平仓信号的取值
+            silent_exits (Iterable[int]): 这些原因的出场只改变仓位，不产生信号
+            **rules: 传给run_positions的出场规则
+
+        返回:
+            pd.DataFrame: 信号矩阵
+        """
+        # module.backtest 引用了本模块，在此处导入以避免循环导入
+        from module.position_engine import run_positions, position_calls
+        
+        state = run_positions(data['high'], data['low'], entries, side=side, **rules)
+        signals = pd.DataFrame(index=data.index)
+        signals['call'] = position_calls(state['Position'], state['ExitReason'], exit_call, silent_exits)
+        return signals
@@ -0,0 +1,109 @@
+'''
+多空组合策略
+
+每个交易系统分为 _L(多头)和 _S(空头)两个策略类。LongShortPair把一对策略作为一个
+策略运行：两边的信号分别转为逐Bar仓位后相加，得到净仓位，回测时两边在同一品种上的
+持仓相互抵消。
+
+两边的shared_key相等时(KeltnerChannel、KingKeltner、VWM在多空参数相同时)，共用的
+指标列只计算一次并传给两边；两边都实现了position_rules时，两边的仓位在同一次
+run_position_legs中推进。其余系统的两边仍各自计算指标和信号。
+'''
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import Dict, List
+import importlib
+import numpy as np
+import pandas as pd
+from module.position_engine import run_position_legs, position_calls
+from strategy.base import StrategyBase
+
+
+class LongShortPair(StrategyBase):
+    """
+    多空组合策略
+
+    calculate_indicators返回两层列名的数据('long'、'short'两组)，generate_signals返回的
+    信号矩阵中call为净仓位的信号，另有long_position、short_position和position
+    (各自及合计的逐Bar仓位)三列
+    """
+    def __init__(self, long_strategy: StrategyBase, short_strategy: StrategyBase):
+        self.long_strategy = long_strategy
+        self.short_strategy = short_strategy
+        super().__init__({'long': long_strategy.params, 'short': short_strategy.params})
+
+    @classmethod
+    def from_name(cls, name: str, params: Dict = None) -> 'LongShortPair':
+        """
+        按系统名称构造，如 from_name('KeltnerChannel') 组合 KeltnerChannel_L 和 KeltnerChannel_S
+
+        参数:
+            name (str): 系统名称(不含_L/_S后缀)
+            params (Dict): 两边共用的参数，各策略只使用自己需要的参数
+
+        返回:
+            LongShortPair: 组合策略
+        """
+        legs = []
+        for suffix in ('_L', '_S'):
+            strategy_cls = getattr(importlib.import_module(f'strategy.{name}{suffix}'), name + suffix)
+            legs.append(strategy_cls(dict(params)) if params else strategy_cls())
+        return cls(*legs)
+
+    def get_lookback(self) -> int:
+        """指标预热所需的回溯K线数"""
+        return max(self.long_strategy.get_lookback(), self.short_strategy.get_lookback())
+
+    def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
+        """计算两边的技术指标，可共用的指标列只计算一次"""
+        key = self.long_strategy.shared_key()
+        if key is not None and key == self.short_strategy.shared_key():
+            shared = self.long_strategy.shared_indicators(data)
+            long_data = self.long_strategy.calculate_indicators(data, shared)
+            short_data = self.short_strategy.calculate_indicators(data, shared)
+        else:
+            long_data = self.long_strategy.calculate_indicators(data)
+            short_data = self.short_strategy.calculate_indicators(data)
+        return pd.concat({'long': long_data, 'short': short_data}, axis=1)
+
+    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+        """生成各自及合计的仓位，call列为净仓位的信号"""
+        legs = (self.long_strategy, self.short_strategy)
+        if all(type(leg).position_rules is not StrategyBase.position_rules for leg in legs):
+            long_signals, short_signals = self._rule_signals(data)
+        else:
+            long_signals = self.long_strategy.generate_signals(data['long'])
+            short_signals = self.short_strategy.generate_signals(data['short'])
+        long_position = self._leg_position(long_signals, data.index)
+        short_position = self._leg_position(short_signals, data.index)
+        position = long_position + short_position
+
+        signals = pd.DataFrame(index=data.index)
+        signals['call'] = position_calls(position)
+        signals['long_position'] = long_position
+        signals['short_position'] = short_position
+        signals['position'] = position
+        return signals
+
+    def _rule_signals(self, data: pd.DataFrame) -> List[pd.DataFrame]:
+        """两边的position_rules在同一次run_position_legs中推进，各自按position_signals的规则得到信号"""
+        rules = [self.long_strategy.position_rules(data['long']), self.short_strategy.position_rules(data['short'])]
+        calls = [(rule.pop('exit_call', 0), rule.pop('silent_exits', ())) for rule in rules]
+        states = run_position_legs(data['long']['high'], data['long']['low'], rules)
+        signals = []
+        for state, (exit_call, silent_exits) in zip(states, calls):
+            leg = pd.DataFrame(index=data.index)
+            leg['call'] = position_calls(state['Position'], state['ExitReason'], exit_call, silent_exits)
+            signals.append(leg)
+        return signals
+
+    @staticmethod
+    def _leg_position(signals: pd.DataFrame, index: pd.Index) -> np.ndarray:
+        """按回测的规则由call列得到逐Bar仓位：前向填充，首个信号之前为空仓"""
+        if not isinstance(signals, pd.DataFrame) or 'call' not in signals or len(signals) == 0:
+            return np.zeros(len(index), dtype=np.int64)
+        call = signals['call'].reindex(index).ffill().fillna(0)
+        return call.to_numpy(dtype=np.float64).astype(np.int64)
@@ -0,0 +1,38 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from module.indicators import AdaptiveAverage, AdaptiveStandardDev
+
+
+def _trending_series(n: int = 4000) -> np.ndarray:
+    """强趋势、小波动的序列：整段累加的量级远大于窗口内的离散程度"""
+    rng = np.random.default_rng(0)
+    return np.linspace(1e3, 5e6, n) + rng.normal(0, 1, n)
+
+
+def test_standard_dev_keeps_precision_on_trending_series():
+    values = _trending_series()
+    lengths = np.random.default_rng(1).integers(20, 61, len(values))
+    result = AdaptiveStandardDev(values, lengths)
+    for t in range(60, len(values)):
+        expected = np.std(values[t - lengths[t] + 1:t + 1])
+        assert abs(result[t] - expected) <= 1e-9 * expected
+
+
+def test_average_and_standard_dev_match_per_window_with_gaps():
+    values = _trending_series(600)
+    values[::7] = np.nan
+    lengths = np.random.default_rng(2).integers(5, 30, len(values))
+    average = AdaptiveAverage(values, lengths)
+    std = AdaptiveStandardDev(values, lengths, data_type=2)
+    for t in range(len(values)):
+        if t < lengths[t] - 1:
+            assert np.isnan(average[t]) and np.isnan(std[t])
+            continue
+        window = values[t - lengths[t] + 1:t + 1]
+        valid = window[~np.isnan(window)]
+        mean = valid.sum() / lengths[t]
+        assert np.isclose(average[t], mean, rtol=1e-12)
+        assert np.isclose(std[t], np.sqrt(((valid - mean) ** 2).sum() / (lengths[t] - 1)), rtol=1e-9)
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import numpy as np
+import pandas as pd
+from module.data_loader import load_level_data
+
+
+FIELDS = ['open', 'close', 'high', 'low', 'vol']
+
+
+def _write_min5(root, high_values):
+    """写入两个交易日上午时段的min5源文件，high列取给定值，其余字段取常数"""
+    index = pd.DatetimeIndex(
+        [f"2024-01-0{day} 09:{m:02d}" for day in (2, 3) for m in range(0, 60, 5)], name='datetime'
+    )
+    paths = {}
+    for field in FIELDS:
+        values = np.asarray(high_values, dtype=np.float32) if field == 'high' else np.full(len(index), 100.0)
+        path = os.path.join(root, f"{field}.csv")
+        pd.DataFrame({'AP': values}, index=index).to_csv(path)
+        paths[field] = path
+    return paths
+
+
+def test_corrected_history_rebuilds_derived_level(tmp_path):
+    logger = logging.getLogger(__name__)
+    cache_dir = str(tmp_path / 'cache')
+    highs = [200.0 + i for i in range(24)]
+    paths = _write_min5(str(tmp_path), highs)
+
+    day = load_level_data(paths, logger, 'day', cache_dir=cache_dir)
+    assert day['high']['AP'].tolist() == [211.0, 223.0]
+
+    # 修正第二个交易日中的一根历史K线，行数和最后时间戳都不变
+    highs[20] = 999.0
+    _write_min5(str(tmp_path), highs)
+
+    base = load_level_data(paths, logger, 'min5', cache_dir=cache_dir)
+    assert base['high']['AP'].iloc[20] == 999.0
+    day = load_level_data(paths, logger, 'day', cache_dir=cache_dir)
+    assert day['high']['AP'].tolist() == [211.0, 999.0]
+
+
+def test_appended_bars_extend_derived_level(tmp_path):
+    logger = logging.getLogger(__name__)
+    cache_dir = str(tmp_path / 'cache')
+    paths = _write_min5(str(tmp_path), [200.0 + i for i in range(24)])
+    load_level_data(paths, logger, 'day', cache_dir=cache_dir)
+
+    with open(paths['high'], 'a') as f:
+        f.write("2024-01-04 09:00:00,500.0\n")
+    for field in FIELDS[:2] + FIELDS[3:]:
+        with open(paths[field], 'a') as f:
+            f.write("2024-01-04 09:00:00,100.0\n")
+
+    day = load_level_data(paths, logger, 'day', cache_dir=cache_dir)
+    assert day['high']['AP'].tolist() == [211.0, 223.0, 500.0]
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import numpy as np
+import pandas as pd
+from module.cache_manager import CacheManager
+from module.data_loader import load_all_data
+
+
+FIELDS = ['open', 'close', 'high', 'low', 'vol']
+
+
+def _write_source(root, values):
+    """写入各字段相同的min5源文件，values为 (K线 × 品种) 数组"""
+    index = pd.date_range('2024-01-02 09:00', periods=len(values), freq='5min', name='datetime')
+    columns = [f"S{i}" for i in range(values.shape[1])]
+    os.makedirs(root, exist_ok=True)
+    paths = {}
+    for field in FIELDS:
+        paths[field] = os.path.join(root, f"{field}.csv")
+        pd.DataFrame(values, index=index, columns=columns).to_csv(paths[field], float_format='%.2f')
+    return paths
+
+
+def test_datasets_sharing_leading_rows_get_separate_entries(tmp_path):
+    logger = logging.getLogger(__name__)
+    cache_dir = str(tmp_path / 'cache')
+    values = np.arange(40 * 2, dtype=np.float64).reshape(40, 2)
+    other = values.copy()
+    other[30:] += 1000
+    paths_a = _write_source(str(tmp_path / 'a'), values)
+    paths_b = _write_source(str(tmp_path / 'b'), other)
+
+    for _ in range(2):
+        assert load_all_data(paths_a, logger, 'min5', cache_dir)['close'].iloc[-1, 0] == values[-1, 0]
+        assert load_all_data(paths_b, logger, 'min5', cache_dir)['close'].iloc[-1, 0] == other[-1, 0]
+    assert CacheManager(cache_dir, logger).stats()['entries'] == 2
+
+
+def test_edit_outside_checked_regions_is_detected(tmp_path):
+    logger = logging.getLogger(__name__)
+    cache_dir = str(tmp_path / 'cache')
+    # 约3MB，改动位于开头1MB和末尾64KB校验区之外
+    values = np.round(np.random.default_rng(0).uniform(1000, 2000, (12000, 20)), 2)
+    paths = _write_source(str(tmp_path / 'src'), values)
+    assert os.path.getsize(paths['close']) > 2 * (1 << 20)
+    load_all_data(paths, logger, 'min5', cache_dir)
+
+    values[6000, 3] = 1099.5  # 与原值同宽，文件大小不变
+    _write_source(str(tmp_path / 'src'), values)
+    data = load_all_data(paths, logger, 'min5', cache_dir)
+    assert data['close'].iloc[6000, 3] == np.float32(1099.5)
+    assert CacheManager(cache_dir, logger).stats()['entries'] == 1
+
+
+def test_appended_rows_reuse_entry(tmp_path):
+    logger = logging.getLogger(__name__)
+    cache_dir = str(tmp_path / 'cache')
+    values = np.arange(30 * 2, dtype=np.float64).reshape(30, 2)
+    paths = _write_source(str(tmp_path / 'src'), values)
+    load_all_data(paths, logger, 'min5', cache_dir)
+
+    for path in paths.values():
+        with open(path, 'a') as f:
+            f.write("2024-01-02 11:30:00,500.00,501.00\n")
+    data = load_all_data(paths, logger, 'min5', cache_dir)
+    assert data['close'].iloc[-1].tolist() == [500.0, 501.0]
+    stats = CacheManager(cache_dir, logger).stats()
+    # 追加只刷新旧条目并改用新键，不全量重建
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 1, 1)
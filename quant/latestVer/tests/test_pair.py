@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+from strategy.pair import LongShortPair
+
+
+def _bars(n: int = 1500, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 3000 + np.cumsum(rng.normal(0, 8, n))
+    open_ = close + rng.normal(0, 3, n)
+    high = np.maximum(open_, close) + rng.random(n) * 6
+    low = np.minimum(open_, close) - rng.random(n) * 6
+    vol = rng.integers(100, 10000, n).astype(float)
+    index = pd.date_range('2021-01-04 09:00', periods=n, freq='h')
+    return pd.DataFrame({'open': open_, 'close': close, 'high': high, 'low': low, 'vol': vol}, index=index)
+
+
+def _leg_position(strategy, data):
+    calls = strategy.generate_signals(strategy.calculate_indicators(data))['call']
+    return calls.ffill().fillna(0).to_numpy(dtype=np.float64).astype(np.int64)
+
+
+@pytest.mark.parametrize('name', ['KeltnerChannel', 'KingKeltner', 'VWM'])
+def test_shared_pair_matches_separate_legs(name, monkeypatch):
+    data = _bars()
+    pair = LongShortPair.from_name(name)
+    assert pair.long_strategy.shared_key() == pair.short_strategy.shared_key()
+
+    # 共用指标只计算一次
+    calls = []
+    long_cls, short_cls = type(pair.long_strategy), type(pair.short_strategy)
+    for cls in (long_cls, short_cls):
+        original = cls.shared_indicators
+        monkeypatch.setattr(cls, 'shared_indicators',
+                            lambda self, data, original=original: calls.append(1) or original(self, data))
+    indicators = pair.calculate_indicators(data)
+    assert len(calls) == 1
+    monkeypatch.undo()
+
+    signals = pair.generate_signals(indicators)
+    long_position = _leg_position(pair.long_strategy, data)
+    short_position = _leg_position(pair.short_strategy, data)
+    np.testing.assert_array_equal(signals['long_position'], long_position)
+    np.testing.assert_array_equal(signals['short_position'], short_position)
+    np.testing.assert_array_equal(signals['position'], long_position + short_position)
+    assert (long_position != 0).any() and (short_position != 0).any()
+
+
+def test_pair_without_shared_key_runs_legs_separately():
+    data = _bars(600)
+    pair = LongShortPair.from_name('KingKeltner', {'avgLength': 20})
+    pair.short_strategy.params['avgLength'] = 30
+    assert pair.long_strategy.shared_key() != pair.short_strategy.shared_key()
+    signals = pair.generate_signals(pair.calculate_indicators(data))
+    np.testing.assert_array_equal(signals['long_position'], _leg_position(pair.long_strategy, data))
+    np.testing.assert_array_equal(signals['short_position'], _leg_position(pair.short_strategy, data))
@@ -0,0 +1,163 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from module.position_engine import (run_positions, run_position_legs, position_calls,
+                                    EXIT_SIGNAL, EXIT_STOP, EXIT_TARGET, EXIT_TIME)
+
+
+NAN = np.nan
+N = 8
+
+
+def _flat_bars(n: int = N):
+    """最高价10.5、最低价9.5的平稳行情，各用例再修改个别Bar"""
+    return pd.Series(np.full(n, 10.5)), pd.Series(np.full(n, 9.5))
+
+
+def _flags(*bars, n: int = N) -> pd.Series:
+    values = np.zeros(n, dtype=bool)
+    values[list(bars)] = True
+    return pd.Series(values)
+
+
+def _column(state, name):
+    return state[name].to_numpy().tolist()
+
+
+def test_signal_exit_records_bars_price_and_reason():
+    high, low = _flat_bars()
+    state = run_positions(high, low, _flags(1), entry_price=pd.Series(np.arange(N) + 100.0), exits=_flags(2, 4))
+    # 入场Bar不检查出场，第2根Bar满足出场条件(持有1根)
+    assert _column(state, 'Position') == [0, 1, 0, 0, 0, 0, 0, 0]
+    assert _column(state, 'BarsSinceEntry') == [0, 0, 1, 0, 0, 0, 0, 0]
+    assert _column(state, 'ExitReason') == [0, 0, EXIT_SIGNAL, 0, 0, 0, 0, 0]
+    np.testing.assert_array_equal(state['EntryPrice'].to_numpy(), [NAN, 101, 101, NAN, NAN, NAN, NAN, NAN])
+
+
+def test_no_reentry_on_exit_bar():
+    high, low = _flat_bars()
+    state = run_positions(high, low, _flags(1, 3, 4), exits=_flags(3))
+    assert _column(state, 'Position') == [0, 1, 1, 0, 1, 1, 1, 1]
+
+
+def test_stop_rules_and_nan_levels():
+    high, low = _flat_bars()
+    low[3] = 8.0
+    entries = _flags(1)
+    price = pd.Series(np.full(N, 10.0))
+    # 逐Bar止损价：NaN不触发，第3根Bar最低价8.0触及8.5
+    stops = pd.Series([NAN, NAN, NAN, 8.5, NAN, NAN, NAN, NAN])
+    state = run_positions(high, low, entries, entry_price=price, stops=stops)
+    assert _column(state, 'ExitReason')[3] == EXIT_STOP
+    # 相对入场价的止损距离：10 - 1.5 = 8.5
+    state = run_positions(high, low, entries, entry_price=price, stop_offsets=pd.Series(np.full(N, 1.5)))
+    assert _column(state, 'ExitReason')[3] == EXIT_STOP
+    # 固定止损取入场Bar的值，之后的变化不影响
+    entry_stop = pd.Series([NAN, 8.5, 9.9, 9.9, 9.9, 9.9, 9.9, 9.9])
+    state = run_positions(high, low, entries, entry_price=price, entry_stop=entry_stop)
+    assert _column(state, 'Position') == [0, 1, 1, 0, 0, 0, 0, 0]
+    assert _column(state, 'ExitReason')[3] == EXIT_STOP
+
+
+def test_target_takes_precedence_over_stop_on_same_bar():
+    high, low = _flat_bars()
+    high[2], low[2] = 12.0, 8.0
+    state = run_positions(high, low, _flags(1), entry_stop=pd.Series(np.full(N, 9.0)),
+                          entry_target=pd.Series(np.full(N, 11.0)))
+    assert _column(state, 'ExitReason') == [0, 0, EXIT_TARGET, 0, 0, 0, 0, 0]
+
+
+def test_stop_takes_precedence_over_exit_signal():
+    high, low = _flat_bars()
+    low[2] = 8.0
+    state = run_positions(high, low, _flags(1), exits=_flags(2), entry_stop=pd.Series(np.full(N, 9.0)))
+    assert _column(state, 'ExitReason')[2] == EXIT_STOP
+
+
+def test_short_side_mirrors_levels():
+    high, low = _flat_bars()
+    low[3] = 8.0
+    high[5] = 12.0
+    target = pd.Series(np.full(N, 9.0))
+    stop = pd.Series(np.full(N, 11.0))
+    state = run_positions(high, low, _flags(1, 4), entry_stop=stop, entry_target=target, side=-1)
+    # 最低价8.0达到止盈9.0；再次入场后最高价12.0触及止损11.0
+    assert _column(state, 'Position') == [0, -1, -1, 0, -1, 0, 0, 0]
+    assert _column(state, 'ExitReason') == [0, 0, 0, EXIT_TARGET, 0, EXIT_STOP, 0, 0]
+
+
+def test_min_bars_delays_every_exit():
+    high, low = _flat_bars()
+    low[2] = 8.0
+    state = run_positions(high, low, _flags(1), exits=_flags(3, 4), entry_stop=pd.Series(np.full(N, 9.0)),
+                          min_bars=3)
+    # 第2根触及止损、第3根满足出场条件都在持有3根之前，第4根才出场
+    assert _column(state, 'Position') == [0, 1, 1, 1, 0, 0, 0, 0]
+    assert _column(state, 'ExitReason')[4] == EXIT_SIGNAL
+    assert _column(state, 'BarsSinceEntry')[4] == 3
+
+
+def test_max_bars_exits_on_time():
+    high, low = _flat_bars()
+    state = run_positions(high, low, _flags(1, 4), max_bars=2)
+    assert _column(state, 'Position') == [0, 1, 1, 0, 1, 1, 0, 0]
+    assert _column(state, 'ExitReason') == [0, 0, 0, EXIT_TIME, 0, 0, EXIT_TIME, 0]
+
+
+def test_untradable_bars_postpone_exit():
+    high, low = _flat_bars()
+    low[2] = 8.0
+    tradable = pd.Series([True, True, False, False, True, True, True, True])
+    state = run_positions(high, low, _flags(1), exits=_flags(3), entry_stop=pd.Series(np.full(N, 9.0)),
+                          tradable=tradable)
+    # 第2、3根不可交易；第4根既未触及止损也不满足出场条件，仓位保持
+    assert _column(state, 'Position') == [0, 1, 1, 1, 1, 1, 1, 1]
+    state = run_positions(high, low, _flags(1), exits=_flags(3, 4), tradable=tradable)
+    assert _column(state, 'ExitReason')[4] == EXIT_SIGNAL
+
+
+def test_start_skips_earlier_bars():
+    high, low = _flat_bars()
+    state = run_positions(high, low, _flags(1, 5), exits=_flags(6), start=3)
+    assert _column(state, 'Position') == [0, 0, 0, 0, 0, 1, 0, 0]
+
+
+def test_entry_kinds_select_exit_rows():
+    high, low = _flat_bars()
+    entries = pd.Series([0, 1, 0, 0, 2, 0, 0, 0])
+    # 第1类按第1行在第3根出场，不受第2行第2根的出场条件影响；第2类按第2行在第5根出场
+    state = run_positions(high, low, entries, exits=[_flags(3), _flags(2, 5)])
+    assert _column(state, 'Position') == [0, 1, 1, 0, 1, 0, 0, 0]
+    assert _column(state, 'ExitReason')[3] == EXIT_SIGNAL
+    assert _column(state, 'ExitReason')[5] == EXIT_SIGNAL
+
+
+def test_position_calls():
+    position = np.array([0, 1, 1, 0, -1, 1, 1])
+    np.testing.assert_array_equal(position_calls(position), [NAN, 1, NAN, 0, -1, 1, 0])
+    np.testing.assert_array_equal(position_calls(position, close_at_end=False), [NAN, 1, NAN, 0, -1, 1, NAN])
+    np.testing.assert_array_equal(position_calls(position, exit_call=1), [NAN, 1, NAN, 1, -1, 1, 1])
+    reasons = np.array([0, 0, 0, EXIT_TIME, 0, 0, 0])
+    np.testing.assert_array_equal(position_calls(position, reasons, silent_exits=[EXIT_TIME]),
+                                  [NAN, 1, NAN, NAN, -1, 1, 0])
+    assert len(position_calls(np.array([], dtype=np.int64))) == 0
+
+
+def test_legs_in_one_pass_match_separate_runs():
+    rng = np.random.default_rng(0)
+    n = 400
+    close = pd.Series(100 + np.cumsum(rng.normal(0, 1, n)))
+    high, low = close + 0.5, close - 0.5
+    long_leg = dict(entries=pd.Series(rng.random(n) < 0.1), exits=pd.Series(rng.random(n) < 0.1),
+                    stops=low.shift(1) - 1, max_bars=6, start=3)
+    short_leg = dict(entries=pd.Series(rng.integers(0, 3, n) * (rng.random(n) < 0.1)), side=-1,
+                     exits=[pd.Series(rng.random(n) < 0.2), pd.Series(rng.random(n) < 0.05)],
+                     entry_price=close, stop_offsets=pd.Series(np.full(n, 1.5)), min_bars=2,
+                     tradable=pd.Series(rng.random(n) < 0.9))
+    states = run_position_legs(high, low, [long_leg, short_leg])
+    for state, leg in zip(states, (long_leg, short_leg)):
+        pd.testing.assert_frame_equal(state, run_positions(high, low, **leg))
+    assert (states[0]['Position'] == 1).any() and (states[1]['Position'] == -1).any()
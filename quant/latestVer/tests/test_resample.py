@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from module.resample import session_bar_keys, resample_bars
+
+
+def _day_session(date: str) -> pd.DatetimeIndex:
+    """一个交易日日盘的min5时间戳：09:00-10:15、10:30-11:30、13:30-15:00"""
+    parts = [pd.date_range(f"{date} {start}", f"{date} {end}", freq='5min', inclusive='left')
+             for start, end in (('09:00', '10:15'), ('10:30', '11:30'), ('13:30', '15:00'))]
+    return parts[0].append(parts[1:])
+
+
+def _bar_starts(index: pd.DatetimeIndex, minutes: int):
+    keys = pd.DatetimeIndex(session_bar_keys(index, minutes))
+    return [ts.strftime('%H:%M') for ts in keys.unique()]
+
+
+def test_min30_splits_at_session_breaks():
+    # 小节休息前的10:00-10:15单独成为一根K线，不与10:30之后合并
+    assert _bar_starts(_day_session('2024-01-02'), 30) == [
+        '09:00', '09:30', '10:00', '10:30', '11:00', '13:30', '14:00', '14:30',
+    ]
+
+
+def test_min60_keeps_short_bars_at_session_ends():
+    assert _bar_starts(_day_session('2024-01-02'), 60) == ['09:00', '10:00', '10:30', '13:30', '14:30']
+
+
+def test_short_bar_aggregates_only_its_own_base_bars():
+    index = _day_session('2024-01-02')
+    frames = {field: pd.DataFrame({'AP': np.arange(len(index), dtype=np.float32)}, index=index)
+              for field in ('open', 'high', 'low', 'close', 'vol')}
+    bars = resample_bars(frames, 'min30')
+    short = bars['vol']['AP'].loc[pd.Timestamp('2024-01-02 10:00')]
+    # 10:00、10:05、10:10三根min5K线(第12-14根)
+    assert short == 12 + 13 + 14
@@ -0,0 +1,130 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from module.indicators import ParabolicStop, ATRTrailingStop, ChandelierStop, BreakevenStop
+
+
+NAN = np.nan
+
+
+def _bars(close, spread=0.5):
+    """以收盘价为中心、上下各spread的最高/最低价"""
+    close = pd.Series(close, dtype=np.float64)
+    return close + spread, close - spread, close
+
+
+def _entry_at(n: int, *bars) -> pd.Series:
+    entries = np.zeros(n, dtype=bool)
+    entries[list(bars)] = True
+    return pd.Series(entries)
+
+
+def _assert_frame(result, position, stop):
+    np.testing.assert_array_equal(result['Position'].to_numpy(), position)
+    np.testing.assert_allclose(result['StopPrice'].to_numpy(), stop, equal_nan=True)
+
+
+def _random_path(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return _bars(100 + np.cumsum(rng.normal(0, 1, n)), spread=0.8)
+
+
+def _holding_spells(position):
+    """各段持仓(不含入场Bar)的行号"""
+    held = position != 0
+    starts = np.flatnonzero(held & ~np.concatenate(([False], held[:-1])))
+    spells = []
+    for start in starts:
+        end = start
+        while end + 1 < len(position) and held[end + 1]:
+            end += 1
+        spells.append(np.arange(start + 1, min(end + 2, len(position))))
+    return spells
+
+
+def test_atr_trailing_stop_on_known_path():
+    high, low, close = _bars([10, 12, 11.5, 13, 12.5, 10.5, 10])
+    result = ATRTrailingStop(high, low, close, _entry_at(7, 0), pd.Series(2.0, index=close.index))
+    # 入场止损8；收盘12后上移到10，收盘回落到11.5时不下移，收盘13后上移到11；最低价10.0触及11出场
+    _assert_frame(result, [1, 1, 1, 1, 1, 0, 0], [NAN, 8, 10, 10, 11, 11, NAN])
+
+
+def test_chandelier_stop_on_known_path_and_floor():
+    high, low, close = _bars([10, 12, 11.5, 13, 11.5, 10.5])
+    offset = pd.Series(2.0, index=close.index)
+    result = ChandelierStop(high, low, _entry_at(6, 0), offset)
+    # 入场以来最高价12.5、12.5、13.5、13.5、13.5减2；最低价11.0触及11.5出场
+    _assert_frame(result, [1, 1, 1, 1, 0, 0], [NAN, 10.5, 10.5, 11.5, 11.5, NAN])
+
+    # 下限高于吊灯价时止损价取下限
+    floor = pd.Series([NAN, 9, 11, 11, 11, 11])
+    result = ChandelierStop(high, low, _entry_at(6, 0), offset, floor)
+    _assert_frame(result, [1, 1, 0, 0, 0, 0], [NAN, 10.5, 11, NAN, NAN, NAN])
+
+
+def test_breakeven_stop_switches_to_entry_price():
+    high, low, close = _bars([10, 10.5, 12, 11, 10])
+    n = len(close)
+    result = BreakevenStop(high, low, _entry_at(n, 0), close, pd.Series(2.0, index=close.index),
+                           pd.Series(8.0, index=close.index))
+    # 最高价11.0未达到10+2时为保护性止损8；12.5达到后止损价为入场价10；最低价9.5触及出场
+    _assert_frame(result, [1, 1, 1, 1, 0], [NAN, 8, 10, 10, 10])
+
+    # 叠加吊灯止损：入场以来最高价 - 1.5 (11 - 1.5、12.5 - 1.5)高于保护性止损和保本价时取吊灯价
+    result = BreakevenStop(high, low, _entry_at(n, 0), close, pd.Series(2.0, index=close.index),
+                           pd.Series(8.0, index=close.index), pd.Series(1.5, index=close.index))
+    _assert_frame(result, [1, 1, 1, 0, 0], [NAN, 9.5, 11, 11, NAN])
+
+
+def test_parabolic_stop_on_known_path():
+    high, low, close = _bars([10, 10.5, 11, 11, 10])
+    result = ParabolicStop(high, low, _entry_at(5, 0), pd.Series(9.0, index=close.index),
+                           acceleration=0.1, max_acceleration=0.2)
+    # 第1根：以9判断，极值11，因子0.2 -> 9 + 0.2*(11-9) = 9.4
+    # 第2根：以9.4判断，极值11.5，因子封顶0.2 -> 9.4 + 0.2*(11.5-9.4) = 9.82
+    # 第3根：以9.82判断，未创新高 -> 9.82 + 0.2*(11.5-9.82) = 10.156
+    # 第4根：最低价9.5触及10.156出场
+    _assert_frame(result, [1, 1, 1, 1, 0], [NAN, 9, 9.4, 9.82, 10.156])
+
+
+def test_trailing_stops_never_loosen():
+    high, low, close = _random_path()
+    n = len(close)
+    entries = pd.Series(np.arange(n) % 7 == 0)
+    offset = pd.Series(2.0, index=close.index)
+    results = {
+        'atr': ATRTrailingStop(high, low, close, entries, offset),
+        'chandelier': ChandelierStop(high, low, entries, offset),
+        'parabolic': ParabolicStop(high, low, entries, low - 1),
+    }
+    for name, result in results.items():
+        position = result['Position'].to_numpy()
+        stop = result['StopPrice'].to_numpy()
+        spells = _holding_spells(position)
+        assert spells, name
+        for rows in spells:
+            assert (np.diff(stop[rows]) >= 0).all(), name
+
+
+def test_short_side_mirrors_long_side():
+    high, low, close = _random_path(seed=1)
+    n = len(close)
+    entries = pd.Series(np.arange(n) % 5 == 0)
+    offset = pd.Series(1.5, index=close.index)
+    pairs = [
+        (ATRTrailingStop(high, low, close, entries, offset),
+         ATRTrailingStop(-low, -high, -close, entries, offset, side=-1)),
+        (ChandelierStop(high, low, entries, offset, low.shift(3)),
+         ChandelierStop(-low, -high, entries, offset, -low.shift(3), side=-1)),
+        (BreakevenStop(high, low, entries, close, offset, low - 2, offset * 2),
+         BreakevenStop(-low, -high, entries, -close, offset, -(low - 2), offset * 2, side=-1)),
+        (ParabolicStop(high, low, entries, low - 1),
+         ParabolicStop(-low, -high, entries, -(low - 1), side=-1)),
+    ]
+    for long_result, short_result in pairs:
+        np.testing.assert_array_equal(short_result['Position'].to_numpy(), -long_result['Position'].to_numpy())
+        np.testing.assert_allclose(short_result['StopPrice'].to_numpy(), -long_result['StopPrice'].to_numpy(),
+                                   equal_nan=True)
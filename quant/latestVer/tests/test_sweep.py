@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import numpy as np
+import pandas as pd
+from module import indicators
+from module.indicators import Average, TrueRange, indicator_cache_scope, indicator_inputs, indicator_cache_stats
+from module.sweep import run_sweep, param_grid
+from strategy.KeltnerChannel_L import KeltnerChannel_L
+
+
+def _bars(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 3000 + np.cumsum(rng.normal(0, 8, n))
+    open_ = close + rng.normal(0, 3, n)
+    high = np.maximum(open_, close) + rng.random(n) * 6
+    low = np.minimum(open_, close) - rng.random(n) * 6
+    vol = rng.integers(100, 10000, n).astype(float)
+    index = pd.date_range('2021-01-04 09:00', periods=n, freq='h')
+    return pd.DataFrame({'open': open_, 'close': close, 'high': high, 'low': low, 'vol': vol}, index=index)
+
+
+def test_serial_and_pool_sweeps_give_same_table():
+    logger = logging.getLogger(__name__)
+    data_dict = {'AP': _bars(800, 0), 'CF': _bars(600, 1)}
+    params = param_grid({'Length': [10, 20], 'Constt': [1.2, 2.0], 'buyN': [3, 5]})
+    serial = run_sweep(KeltnerChannel_L, params, data_dict, logger, start_date='2021-01-06',
+                       use_multiprocessing=False)
+    pool = run_sweep(KeltnerChannel_L, params, data_dict, logger, start_date='2021-01-06',
+                     use_multiprocessing=True, processes=2)
+    assert len(serial) == len(params) * len(data_dict)
+    assert serial['trades'].sum() > 0
+    pd.testing.assert_frame_equal(serial, pool)
+
+
+def test_registered_inputs_keep_cache_keys():
+    data = _bars(500, 2)
+    frame = data.copy()
+    with indicator_cache_scope():
+        expected = Average(TrueRange(frame['high'], frame['low'], frame['close']), 10)
+        misses = indicator_cache_stats()['misses']
+        with indicator_inputs(data):
+            assert indicators._known_arrays
+            # 输入为data的副本及缓存结果的副本，与登记的数组逐字节相同
+            result = Average(TrueRange(frame['high'], frame['low'], frame['close']), 10)
+        stats = indicator_cache_stats()
+    pd.testing.assert_series_equal(result, expected)
+    # 登记前后的缓存键相同，第二次全部命中
+    assert stats['misses'] == misses and stats['hits'] >= 2
+    assert indicators._known_arrays is None